@@ -1,15 +1,48 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import subprocess
 import json
 import os
+import re
+import threading
 import time
+import uuid
 from pathlib import Path
 
+from orchestrator.storage import get_job_store, load_job
+from orchestrator.job_schema import expand_job
+from orchestrator.job_events import follow_events, is_done, publish, read_events, wait_for_events
+
 app = Flask(__name__)
 CORS(app)  # Allow cross-origin requests from Figma plugin
 
+JOB_ID_RE = re.compile(r"^\[IAG\] JOB_ID: (\S+)\s*$", re.M)
+
+
+def _parse_job_id(stdout: str):
+    """Last job id printed by orchestrator/main.py, or None."""
+    ids = JOB_ID_RE.findall(stdout or "")
+    return ids[-1] if ids else None
+
+
+def _run_orchestrator(job_id, env_vars, command=None):
+    """Run orchestrator/main.py (or `command`) for one job; failures are published as a 'failed' job event."""
+    publish(job_id, 'running')
+    result = subprocess.run(
+        command or ['python3', 'orchestrator/main.py'],
+        capture_output=True,
+        text=True,
+        cwd=os.getcwd(),
+        env=env_vars
+    )
+    if result.returncode != 0:
+        print(f"❌ Claims generation failed: {result.stderr}")
+        publish(job_id, 'failed', error=(result.stderr or '')[-2000:])
+    else:
+        print(f"✅ Claims generated successfully: {result.stdout}")
+    return result
+
 @app.route('/generate-claims', methods=['POST'])
 def generate_claims():
     """Generate claims using the existing Python system"""
@@ -19,6 +52,9 @@ def generate_claims():
         claim_count = data.get('claimCount', 8)
         claim_style = data.get('claimStyle', 'mixed-styles')
         template_name = data.get('templateName')  # New: template-specific claims
+        template_names = [t for t in (data.get('templateNames') or []) if t]  # Fan-out: one generation, several templates
+        if template_names and not template_name:
+            template_name = template_names[0]
         template_variation = data.get('templateVariation', '01')  # Default to version 01 if not specified
         knowledge_ad = data.get('knowledgeAdInfluence', 'medium')
         knowledge_brand = data.get('knowledgeBrandInfluence', 'medium')
@@ -26,6 +62,8 @@ def generate_claims():
         print(f"🎯 Generating claims for {brand_file}, count: {claim_count}, style: {claim_style}")
         if template_name:
             print(f"📋 Using template: {template_name}")
+        if len(template_names) > 1:
+            print(f"📋 Fanning out to templates: {', '.join(template_names)}")
         if template_variation:
             print(f"🔄 Using variation: {template_variation}")
         
@@ -43,44 +81,44 @@ def generate_claims():
         # Add template information if provided
         if template_name:
             env_vars['TEMPLATE_NAME'] = template_name
+        if template_names:
+            env_vars['TEMPLATE_NAMES'] = ','.join(template_names)
         if template_variation:
             env_vars['TEMPLATE_VARIATION'] = template_variation
         
+        # The job id is chosen here so clients can subscribe to /jobs/<id>/events right away
+        job_id = str(uuid.uuid4())[:8]
+        env_vars['JOB_ID'] = job_id
+        
+        if data.get('async'):
+            # Return immediately; progress and completion arrive as job events
+            publish(job_id, 'queued', brand=brand_file, template_name=template_name)
+            threading.Thread(target=_run_orchestrator, args=(job_id, env_vars), daemon=True).start()
+            return jsonify({
+                'success': True,
+                'status': 'queued',
+                'job_id': job_id,
+                'events_url': f'/jobs/{job_id}/events'
+            }), 202
+        
         # Run the claims generation system
-        result = subprocess.run(
-            ['python3', 'orchestrator/main.py'],
-            capture_output=True,
-            text=True,
-            cwd=os.getcwd(),
-            env=env_vars
-        )
+        result = _run_orchestrator(job_id, env_vars)
         
         if result.returncode != 0:
-            print(f"❌ Claims generation failed: {result.stderr}")
             return jsonify({
                 'success': False,
                 'error': f'Claims generation failed: {result.stderr}'
             }), 500
         
-        print(f"✅ Claims generated successfully: {result.stdout}")
-        
-        # Look for generated job files in the out/ directory
-        job_files = list(Path('out').glob('*.json'))
-        if not job_files:
+        # The orchestrator reports the job it wrote as "[IAG] JOB_ID: <id>"
+        job_id = _parse_job_id(result.stdout) or job_id
+        job_data = load_job(job_id) if job_id else None
+        if not job_data:
             return jsonify({
                 'success': False,
-                'error': 'No job files generated'
+                'error': 'No job generated'
             }), 500
-        
-        # Get the most recent job file
-        latest_job = max(job_files, key=os.path.getctime)
-        
-        # Extract job ID from filename (e.g., "out/abc123.json" -> "abc123")
-        job_id = latest_job.stem  # This gets the filename without extension
-        
-        # Read the job file to get claims
-        with open(latest_job, 'r') as f:
-            job_data = json.load(f)
+        latest_job = Path('out') / f'{job_id}.json'
         
         # Extract claims from the job data
         claims = []
@@ -109,6 +147,205 @@ def generate_claims():
             'error': str(e)
         }), 500
 
+@app.route('/jobs/<job_id>/retemplate', methods=['POST'])
+def retemplate_job(job_id):
+    """Derive a job for another template from an existing job's claims (only missing fields are generated)"""
+    try:
+        data = request.json or {}
+        template_name = data.get('templateName')
+        template_variation = data.get('templateVariation', '01')
+        if not template_name:
+            return jsonify({
+                'success': False,
+                'error': 'templateName is required'
+            }), 400
+        header = get_job_store().get_header(job_id)
+        if not header:
+            return jsonify({
+                'success': False,
+                'error': f'Job {job_id} not found'
+            }), 404
+        from orchestrator.templates import template_manager
+        if template_manager.get_template(template_name) is None:
+            return jsonify({
+                'success': False,
+                'error': f'Template {template_name} not found'
+            }), 404
+        
+        print(f"🔁 Re-templating job {job_id} -> {template_name} ({template_variation})")
+        derived_id = str(uuid.uuid4())[:8]
+        env_vars = {**os.environ, 'PYTHONPATH': os.getcwd()}
+        command = ['python3', '-m', 'orchestrator.retemplate', job_id, template_name, '--job-id', derived_id]
+        if template_variation:
+            command += ['--variation', template_variation]
+        
+        if data.get('async'):
+            publish(derived_id, 'queued', brand=header.get('brand'), template_name=template_name, derived_from=job_id)
+            threading.Thread(target=_run_orchestrator, args=(derived_id, env_vars, command), daemon=True).start()
+            return jsonify({
+                'success': True,
+                'status': 'queued',
+                'job_id': derived_id,
+                'derived_from': job_id,
+                'events_url': f'/jobs/{derived_id}/events'
+            }), 202
+        
+        result = _run_orchestrator(derived_id, env_vars, command)
+        if result.returncode != 0:
+            return jsonify({
+                'success': False,
+                'error': f'Re-templating failed: {result.stderr}'
+            }), 500
+        
+        derived_id = _parse_job_id(result.stdout) or derived_id
+        summary = get_job_store().get_header(derived_id)
+        if not summary:
+            return jsonify({
+                'success': False,
+                'error': 'No job generated'
+            }), 500
+        return jsonify({
+            'success': True,
+            'job_id': derived_id,
+            'derived_from': job_id,
+            'job_file': str(Path('out') / f'{derived_id}.json'),
+            'job': summary
+        })
+        
+    except Exception as e:
+        print(f"❌ Error re-templating job {job_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_summary(job_id):
+    """Job header (brand assets, typography, template) with variant counts, without the variants"""
+    try:
+        store = get_job_store()
+        summary = store.get_header(job_id)
+        if not summary:
+            return jsonify({
+                'success': False,
+                'error': f'Job {job_id} not found'
+            }), 404
+        summary['variation_counts'] = store.variation_counts(job_id)
+        summary.setdefault('complete', True)
+        return jsonify({
+            'success': True,
+            'job': summary
+        })
+        
+    except Exception as e:
+        print(f"❌ Error getting job {job_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/jobs/<job_id>/variants', methods=['GET'])
+def get_job_variants(job_id):
+    """One page of a job's variants: ?offset=&limit=&template_variation=portrait,square&template_name= (&expand=1 for v1 shape)"""
+    try:
+        store = get_job_store()
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = min(max(1, request.args.get('limit', 50, type=int)), 1000)
+        template_variation = request.args.get('template_variation') or None
+        template_name = request.args.get('template_name') or None  # one template of a fan-out job
+        
+        total = store.count_variants(job_id, template_variation, template_name)
+        variants = store.get_variants(job_id, offset, limit, template_variation, template_name)
+        if not total and not store.get_header(job_id):
+            return jsonify({
+                'success': False,
+                'error': f'Job {job_id} not found'
+            }), 404
+        
+        if request.args.get('expand') in ('1', 'true', 'yes'):
+            header = store.get_header(job_id) or {}
+            variants = expand_job(dict(header, variants=variants))['variants']
+        
+        next_offset = offset + len(variants)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'offset': offset,
+            'limit': limit,
+            'total': total,
+            'variants': variants,
+            'next_offset': next_offset if next_offset < total else None
+        })
+        
+    except Exception as e:
+        print(f"❌ Error getting variants for job {job_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def get_job_events(job_id):
+    """
+    Job progress/completion events after ?after=N (or Last-Event-ID).
+    Long-poll by default (?timeout= seconds, max 60); SSE with Accept: text/event-stream or ?stream=1.
+    """
+    try:
+        after = request.args.get('after', type=int)
+        if after is None:
+            after = int(request.headers.get('Last-Event-ID') or 0)
+        past = read_events(job_id)
+        if not past:
+            # Jobs written before events existed (or with JOB_EVENTS=false): answer from the store
+            header = get_job_store().get_header(job_id)
+            if not header:
+                return jsonify({
+                    'success': False,
+                    'error': f'Job {job_id} not found'
+                }), 404
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'events': [],
+                'next': after,
+                'done': header.get('complete', True) is not False
+            })
+        
+        stream = request.args.get('stream') in ('1', 'true', 'yes') or \
+            'text/event-stream' in (request.headers.get('Accept') or '')
+        if stream:
+            def sse():
+                yield 'retry: 3000\n\n'
+                if is_done(past) and after >= past[-1]['seq']:
+                    return
+                for event in follow_events(job_id, after):
+                    if event is None:
+                        yield ': keep-alive\n\n'
+                        continue
+                    yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            return Response(sse(), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+        if is_done(past) and after >= past[-1]['seq']:
+            events = []
+        else:
+            timeout = min(max(0.0, request.args.get('timeout', 25, type=float)), 60.0)
+            events = wait_for_events(job_id, after, timeout)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'events': events,
+            'next': events[-1]['seq'] if events else after,
+            'done': is_done(past) if not events else is_done(events)
+        })
+        
+    except Exception as e:
+        print(f"❌ Error getting events for job {job_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/templates', methods=['GET'])
 def list_templates():
     """List all available templates"""
@@ -384,6 +621,10 @@ if __name__ == '__main__':
     print("   - GET  /templates/<name>/variations - Get template variations")
     print("   - GET  /templates/<name>/requirements - Get template requirements")
     print("   - POST /templates/refresh - Refresh template cache")
+    print("   - GET  /jobs/<id> - Job summary with variant counts")
+    print("   - GET  /jobs/<id>/variants - Page through a job's variants")
+    print("   - GET  /jobs/<id>/events - Job progress events (long-poll or SSE)")
+    print("   - POST /jobs/<id>/retemplate - Derive a job for another template from existing claims")
     print("   - GET  /health - Health check")
     print("   - Server will run on http://localhost:8002")
     app.run(host='0.0.0.0', port=8002, debug=True)
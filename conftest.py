@@ -0,0 +1,2 @@
+# test_openai.py is a manual connectivity script (it needs a live API key), not a test module
+collect_ignore = ["test_openai.py"]
@@ -838,10 +838,98 @@ async function preloadCommonFonts() {
 }
 
 // ---------------- Helpers ----------------
+// v2 jobs keep logo/palette/typography/template once in the job header; variants
+// only carry overrides. Expand back to the per-variant (v1) shape used below.
+function expandJob(job) {
+  if (!job || !(job.schema_version >= 2)) return job;
+  const assets = job.brand_assets || {};
+  const variants = (job.variants || []).map(v => {
+    const out = Object.assign({}, v);
+    if (out.logo_url === undefined && assets.logo_url !== undefined) out.logo_url = assets.logo_url;
+    if (out.palette === undefined && assets.palette !== undefined) out.palette = assets.palette;
+    if (out.type === undefined && job.typography) out.type = Object.assign({}, job.typography);
+    if (out.template_name === undefined && job.template_name) out.template_name = job.template_name;
+    return out;
+  });
+  return Object.assign({}, job, { variants });
+}
+
 async function fetchJob(jobId) {
-  const res = await fetch(`http://localhost:8001/out/${jobId}.json`);
+  const res = await fetch(`http://localhost:8001/out/${jobId}.json?schema=2`);
   if (!res.ok) throw new Error(`Cannot fetch job: ${res.status}`);
-  return await res.json();
+  return expandJob(await res.json());
+}
+
+// Paged job loading from the claims API (port 8002)
+const API_BASE = "http://localhost:8002";
+const VARIANT_PAGE_SIZE = 50;
+
+async function fetchJobSummary(jobId) {
+  const res = await fetch(`${API_BASE}/jobs/${jobId}`);
+  if (!res.ok) throw new Error(`Cannot fetch job summary: ${res.status}`);
+  const data = await res.json();
+  if (!data.success) throw new Error(data.error || "Job summary failed");
+  return data.job;
+}
+
+async function fetchVariantPage(jobId, offset, limit, types, templateName) {
+  let url = `${API_BASE}/jobs/${jobId}/variants?offset=${offset}&limit=${limit}`;
+  if (types && types.length) url += `&template_variation=${encodeURIComponent(types.join(","))}`;
+  if (templateName) url += `&template_name=${encodeURIComponent(templateName)}`;
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`Cannot fetch variants: ${res.status}`);
+  const data = await res.json();
+  if (!data.success) throw new Error(data.error || "Variant page failed");
+  return data; // { variants, total, next_offset }
+}
+
+// Long-poll a job's events until it completes; rejects if the job failed
+async function waitForJobEvents(jobId, onEvent) {
+  let after = 0;
+  for (;;) {
+    const res = await fetch(`${API_BASE}/jobs/${jobId}/events?after=${after}&timeout=25`);
+    const data = await res.json();
+    if (!data.success) throw new Error(data.error || "Job events failed");
+    for (const event of data.events) {
+      if (event.type === "failed") throw new Error(event.error || "Claims generation failed");
+      onEvent(event);
+    }
+    after = data.next;
+    if (data.done) return;
+  }
+}
+
+// Claims of a finished job, in the shape /generate-claims returns them synchronously
+async function fetchJobClaims(jobId, claimStyle, brandFile) {
+  // A claim has one variant per template variation and per fan-out template; list it once
+  const claims = [];
+  const seen = new Set();
+  let offset = 0;
+  while (offset !== null && offset !== undefined) {
+    const page = await fetchVariantPage(jobId, offset, 1000, null);
+    for (const v of page.variants) {
+      if (!v.claim || seen.has(v.claim)) continue;
+      seen.add(v.claim);
+      claims.push({ text: v.claim, style: claimStyle, angle: 'general' });
+    }
+    offset = page.next_offset;
+  }
+  return { claims, message: `Generated ${claims.length} claims for ${brandFile}` };
+}
+
+// Visit every variant page by page; the next page downloads while the current one renders.
+// With imageSize ({ width, height }) each page's images arrive first in one bundle request.
+async function forEachVariant(jobId, header, types, templateName, firstPage, visit, imageSize) {
+  let page = firstPage;
+  while (page) {
+    const next = (page.next_offset !== null && page.next_offset !== undefined)
+      ? fetchVariantPage(jobId, page.next_offset, VARIANT_PAGE_SIZE, types, templateName)
+      : null;
+    const variants = expandJob(Object.assign({}, header, { variants: page.variants })).variants;
+    if (imageSize) await prefetchImageBundle(variantImageUrls(variants, imageSize.width, imageSize.height), imageSize.width, imageSize.height);
+    for (const v of variants) await visit(v);
+    page = next ? await next : null;
+  }
 }
 
 function positionFrame(frame, template, index, cols = 5, gap = 120, startBelowTemplate = true) {
@@ -923,8 +1011,86 @@ function ensureBatchFrame(batchName, template, cols = 5, rows = 6, gap = 120, pa
   return batch;
 }
 
+// Local static images are requested as server-side derivatives sized to the placeholder
+// (cached on disk by the file server) instead of downloading and decoding the full-size file.
+const STATIC_IMAGE_PREFIX = "http://localhost:8001/static/images/";
+
+// original image URL -> source version from bundle manifests; versioned /img/ URLs are cached long-term
+const IMAGE_VERSIONS = new Map();
+
+function derivativeImageUrl(url, width, height) {
+  if (!url || !url.startsWith(STATIC_IMAGE_PREFIX) || !(width > 0) || !(height > 0)) return url;
+  const file = url.slice(STATIC_IMAGE_PREFIX.length).split("?")[0];
+  const version = IMAGE_VERSIONS.get(url);
+  return `http://localhost:8001/img/${file}?w=${Math.ceil(width)}&h=${Math.ceil(height)}&fit=cover` +
+    (version ? `&v=${version}` : "");
+}
+
+// "<url>@<w>x<h>" -> Uint8Array view into a downloaded bundle (no per-image copy); cleared per build
+const IMAGE_BUNDLE_CACHE = new Map();
+
+function bundleKey(url, width, height) {
+  return `${url}@${Math.ceil(width)}x${Math.ceil(height)}`;
+}
+
+// Image placeholder of a template or variant frame (#IMAGE, #IMAGE_HERO, #HERO, #PHOTO...)
+function findImagePlaceholder(node) {
+  return node.findOne(n => n.type === "RECTANGLE" && (
+    n.name.includes("IMAGE") ||
+    n.name.includes("HERO") ||
+    n.name.includes("PHOTO")
+  ));
+}
+
+// Size the bundle's derivatives to the rect they are placed into (null: template has no image slot)
+function bundleImageSize(template) {
+  const rect = findImagePlaceholder(template);
+  return rect ? { width: rect.width, height: rect.height } : null;
+}
+
+// Only variant.image_url is placed via placeImageFill; logos and tagged images are not fetched
+function variantImageUrls(variants, width, height) {
+  const urls = new Set();
+  for (const v of variants) {
+    const url = v.image_url;
+    if (url && url.startsWith(STATIC_IMAGE_PREFIX) && !IMAGE_BUNDLE_CACHE.has(bundleKey(url, width, height))) urls.add(url);
+  }
+  return [...urls];
+}
+
+// One request for many images: an uncompressed zip plus a manifest of byte ranges
+async function prefetchImageBundle(urls, width, height) {
+  if (!urls.length) return;
+  try {
+    const res = await fetch("http://localhost:8001/bundle", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ assets: urls, w: Math.ceil(width), h: Math.ceil(height), fit: "cover" })
+    });
+    const manifestHeader = res.headers && res.headers.get ? res.headers.get("X-Bundle-Manifest") : null;
+    if (!res.ok || !manifestHeader) throw new Error(`bundle request failed (${res.status})`);
+    const manifest = JSON.parse(manifestHeader);
+    const buffer = await res.arrayBuffer();
+    for (const [url, entry] of Object.entries(manifest.assets || {})) {
+      IMAGE_BUNDLE_CACHE.set(bundleKey(url, width, height), new Uint8Array(buffer, entry.offset, entry.length));
+      if (entry.version) IMAGE_VERSIONS.set(url, entry.version);
+    }
+    console.log(`🖼️ Image bundle: ${Object.keys(manifest.assets || {}).length} images in one request`);
+  } catch (e) {
+    console.warn(`[Plugin] Image bundle unavailable, fetching images individually: ${e.message || e}`);
+  }
+}
+
 async function placeImageFill(rect, url) {
-  const res = await fetch(url);
+  const bundled = IMAGE_BUNDLE_CACHE.get(bundleKey(url, rect.width, rect.height));
+  if (bundled) {
+    const image = figma.createImage(bundled);
+    rect.fills = [{ type: "IMAGE", scaleMode: "FILL", imageHash: image.hash }];
+    return;
+  }
+  const sizedUrl = derivativeImageUrl(url, rect.width, rect.height);
+  let res = await fetch(sizedUrl);
+  if (!res.ok && sizedUrl !== url) res = await fetch(url);
   const bytes = await res.arrayBuffer();
   const image = figma.createImage(new Uint8Array(bytes));
   rect.fills = [{ type: "IMAGE", scaleMode: "FILL", imageHash: image.hash }];
@@ -1039,11 +1205,7 @@ async function buildVariant(template, v) {
   }
 
   // Dynamically find image placeholder (could be #IMAGE, #IMAGE_HERO, #HERO, etc.)
-  const imagePlaceholder = frame.findOne(n => n.type === "RECTANGLE" && (
-    n.name.includes("IMAGE") || 
-    n.name.includes("HERO") || 
-    n.name.includes("PHOTO")
-  ));
+  const imagePlaceholder = findImagePlaceholder(frame);
   
   if (imagePlaceholder) {
     console.log(`🔍 Found image placeholder: ${imagePlaceholder.name}`);
@@ -1145,50 +1307,63 @@ figma.ui.onmessage = async (msg) => {
 
   try {
     const BASE = "http://localhost:8001";
-    console.log(`[Plugin] Fetching job: ${jobId} from ${BASE}`);
-    
-    const res = await fetch(`${BASE}/out/${jobId}.json`);
-    if (!res.ok) throw new Error(`Fetch failed: ${res.status}`);
-    const job = await res.json();
-    
-    console.log(`[Plugin] Job loaded:`, job);
-    console.log(`[Plugin] Job format: ${job.format}, variants: ${(job.variants && job.variants.length) || 0}`);
-    console.log(`[Plugin] Template version: ${templateVersion}, variations: ${variations.join(', ')}`);
-
-    // Filter variants based on selected variations
-    let filteredVariants = job.variants;
-    
-    // Debug: Show variant structure
-    console.log(`[Plugin] All variants:`, job.variants.map(v => ({
-      id: v.id,
-      layout: v.layout,
-      template_variation: v.template_variation,
-      template_name: v.template_name
-    })));
-    
-    if (templateVersion && variations.length > 0) {
-      filteredVariants = job.variants.filter(variant => {
-        if (variant.template_variation) {
+    // Only filter by variation type when a version was picked (same rule as before paging)
+    let types = (templateVersion && variations.length > 0) ? variations : [];
+    let job;
+    let firstPage;
+    // Fan-out jobs hold variants for several templates: build the selected one (default: the job's first)
+    let templateFilter = null;
+    const pickTemplate = (header) => {
+      const names = Array.isArray(header.template_names) ? header.template_names : null;
+      return names && names.length ? (names.includes(msg.templateName) ? msg.templateName : names[0]) : null;
+    };
+    try {
+      console.log(`[Plugin] Fetching job summary: ${jobId} from ${API_BASE}`);
+      job = await fetchJobSummary(jobId);
+      templateFilter = pickTemplate(job);
+      firstPage = await fetchVariantPage(jobId, 0, VARIANT_PAGE_SIZE, types, templateFilter);
+      if (types.length && firstPage.total === 0) {
+        console.warn(`[Plugin] No variants matched the requested variations; falling back to all variants.`);
+        types = [];
+        firstPage = await fetchVariantPage(jobId, 0, VARIANT_PAGE_SIZE, types, templateFilter);
+      }
+    } catch (apiError) {
+      // Claims API unavailable: load the whole job file from the static server
+      console.warn(`[Plugin] Paged job API unavailable (${apiError.message || apiError}); fetching ${BASE}/out/${jobId}.json?schema=2`);
+      const res = await fetch(`${BASE}/out/${jobId}.json?schema=2`);
+      if (!res.ok) throw new Error(`Fetch failed: ${res.status}`);
+      job = await res.json();
+      templateFilter = pickTemplate(job);
+      let variants = job.variants || [];
+      if (templateFilter) {
+        variants = variants.filter(variant => (variant.template_name || job.template_name) === templateFilter);
+      }
+      if (types.length) {
+        const matched = variants.filter(variant => {
+          if (!variant.template_variation) return true; // Include if no template variation specified
           const parts = String(variant.template_variation).split('-');
           const variantType = parts.length > 1 ? parts[1] : undefined; // Expect 'portrait' or 'square'
-          console.log(`[Plugin] Variant ${variant.id}: template_variation="${variant.template_variation}", extracted type="${variantType}"`);
           // If we can't extract a type (e.g., template_variation is just '01'), don't filter it out
-          if (!variantType) return true;
-          return variations.includes(variantType);
+          return !variantType || types.includes(variantType);
+        });
+        if (matched.length === 0) {
+          console.warn(`[Plugin] No variants matched the requested variations; falling back to all variants.`);
+        } else {
+          variants = matched;
         }
-        console.log(`[Plugin] Variant ${variant.id}: no template_variation field, including by default`);
-        return true; // Include if no template variation specified
-      });
-      if (filteredVariants.length === 0) {
-        console.warn(`[Plugin] No variants matched the requested variations; falling back to all variants.`);
-        filteredVariants = job.variants;
       }
-      console.log(`[Plugin] Filtered variants: ${filteredVariants.length} of ${job.variants.length} based on selected variations`);
+      firstPage = { variants, total: variants.length, next_offset: null };
+      delete job.variants;
     }
 
+    const totalVariants = firstPage.total;
+    const filteredVariants = expandJob(Object.assign({}, job, { variants: firstPage.variants })).variants;
+    console.log(`[Plugin] Job format: ${job.format}, variants: ${totalVariants} (first page ${filteredVariants.length})`);
+    console.log(`[Plugin] Template version: ${templateVersion}, variations: ${variations.join(', ')}`);
+
     // Use the first variant's template name as the base template
     // This should come from the claims generation, not be constructed from job format
-    const baseTemplateName = (filteredVariants[0] && filteredVariants[0].template_name) || (job.variants[0] && job.variants[0].template_name);
+    const baseTemplateName = templateFilter || (filteredVariants[0] && filteredVariants[0].template_name) || job.template_name;
     if (!baseTemplateName) {
       throw new Error(`No template name found in variants. Please ensure claims were generated with a template.`);
     }
@@ -1291,11 +1466,13 @@ figma.ui.onmessage = async (msg) => {
     
     const cellW = template.width;
     const cellH = template.height;
+    // Bundled bytes from earlier builds are for other templates/sizes; release them
+    IMAGE_BUNDLE_CACHE.clear();
 
     let i = 0;
 
     if (mode === "batch") {
-      const rows = Math.ceil(filteredVariants.length / 5); // Default to 5 columns
+      const rows = Math.ceil(totalVariants / 5); // Default to 5 columns
       const pad  = 120; // Default gap of 120px
       sessionRunCounter++; // Increment counter for unique frame names
       // Build a descriptive batch frame name from user selections and job metadata
@@ -1309,19 +1486,19 @@ figma.ui.onmessage = async (msg) => {
       try { BATCH_CHOSEN_IMAGES = new Set(); } catch (e) {}
       const batch = ensureBatchFrame(batchName, template, 5, rows, 120, pad);
 
-      for (const v of filteredVariants) {
+      await forEachVariant(jobId, job, types, templateFilter, firstPage, async (v) => {
         const frame = await buildVariant(template, v);
         batch.appendChild(frame);
         positionFrameInGrid(frame, cellW, cellH, i, 5, 120, pad);
         i++;
-      }
+      }, bundleImageSize(template));
       figma.currentPage.selection = [batch];
       figma.viewport.scrollAndZoomIntoView([batch]);
       figma.notify(`Built ${i} variants into ${batchName}`);
     } else {
       const startIndex = existingVariantCount("Ad/");
       sessionRunCounter++; // Increment counter for unique frame names
-      for (const v of filteredVariants) {
+      await forEachVariant(jobId, job, types, templateFilter, firstPage, async (v) => {
         const frame = await buildVariant(template, v);
         frame.x = template.x;
         frame.y = template.y + template.height + 120;
@@ -1329,7 +1506,7 @@ figma.ui.onmessage = async (msg) => {
         frame.name = `${frame.name}_run${sessionRunCounter}`;
         positionFrameInBox(frame, cellW, cellH, startIndex + i, 5, 120, 120);
         i++;
-      }
+      }, bundleImageSize(template));
       figma.notify(`Infinite Ad Garden: built ${i} variants (continued grid, run ${sessionRunCounter})`);
     }
 
@@ -1510,24 +1687,38 @@ figma.ui.onmessage = async (msg) => {
       // Show loading state in UI
       figma.ui.postMessage({ type: 'show-loading' });
       
-      // Call the claims API
-      fetch('http://localhost:8002/generate-claims', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          brandFile: msg.brandFile,
-          claimCount: msg.claimCount,
-          claimStyle: msg.claimStyle,
-          templateName: msg.templateName,
-          knowledgeAdInfluence: msg.knowledgeAdInfluence || 'medium',
-          knowledgeBrandInfluence: msg.knowledgeBrandInfluence || 'medium'
-        })
-      })
-      .then(response => response.json())
-      .then(data => {
-        if (data.success) {
+      // Start the job, then follow its events (one long-poll request per change instead of polling out/)
+      (async () => {
+        try {
+          const res = await fetch(`${API_BASE}/generate-claims`, {
+            method: 'POST',
+            headers: {
+              'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+              brandFile: msg.brandFile,
+              claimCount: msg.claimCount,
+              claimStyle: msg.claimStyle,
+              templateName: msg.templateName,
+              templateNames: msg.templateNames,
+              knowledgeAdInfluence: msg.knowledgeAdInfluence || 'medium',
+              knowledgeBrandInfluence: msg.knowledgeBrandInfluence || 'medium',
+              async: true
+            })
+          });
+          let data = await res.json();
+          if (!data.success) throw new Error(data.error);
+          if (!data.claims) {
+            let progress = null;
+            await waitForJobEvents(data.job_id, (event) => {
+              if (event.type === 'variants') {
+                if (progress) progress.cancel();
+                progress = figma.notify(`⏳ ${event.total} variants written…`, { timeout: 4000 });
+              }
+            });
+            if (progress) progress.cancel();
+            data = Object.assign(data, await fetchJobClaims(data.job_id, msg.claimStyle, msg.brandFile));
+          }
           figma.ui.postMessage({ 
             type: 'claims-generated', 
             claims: data.claims,
@@ -1535,15 +1726,11 @@ figma.ui.onmessage = async (msg) => {
             job_id: data.job_id
           });
           figma.notify(`✅ ${data.message}`);
-        } else {
+        } catch (error) {
           figma.ui.postMessage({ type: 'hide-loading' });
-          figma.notify(`❌ Error: ${data.error}`);
+          figma.notify(`❌ Error: ${error.message}`);
         }
-      })
-      .catch(error => {
-        figma.ui.postMessage({ type: 'hide-loading' });
-        figma.notify(`❌ Network error: ${error.message}`);
-      });
+      })();
       
     } catch (error) {
       console.error('Error triggering claims generation:', error);
@@ -0,0 +1,231 @@
+# orchestrator/brand_bundle.py
+"""
+Compiled brand bundle: everything downstream needs about a brand, loaded once
+per process and invalidated when any of the brand's source files change.
+"""
+
+import copy
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .brand_profile import _safe_load_json, synthesize_brand_profile
+
+
+@dataclass(frozen=True)
+class BrandBundle:
+    """Resolved brand inputs shared by claims generation, expansion and variants.
+    The bundle is cached across runs, so cfg/profile hand out deep copies: callers
+    may mutate what they get without changing the bundle for everyone else."""
+    brand_name: str
+    version: str
+    _cfg: Dict[str, Any]
+    _profile: Dict[str, Any]
+    typography: Dict[str, Optional[str]]
+    lexicon: Dict[str, List[str]]
+    profile_text: str
+
+    @property
+    def cfg(self) -> Dict[str, Any]:
+        return copy.deepcopy(self._cfg)
+
+    @property
+    def profile(self) -> Dict[str, Any]:
+        return copy.deepcopy(self._profile)
+
+
+_BUNDLES: Dict[str, Tuple[Tuple, BrandBundle]] = {}
+_LOCK = threading.Lock()
+
+
+def split_family_and_style(raw: str):
+    """Split a font string like 'Inter Bold' -> ('Inter', 'Bold').
+    If only family provided, default style to 'Regular'.
+    Accepts 'Semi Bold' and other spaced styles.
+    """
+    if not raw:
+        return (None, None)
+    value = str(raw).strip()
+    # Known styles, longer first
+    known_styles = [
+        "Extra Black", "ExtraBold", "Extra Bold",
+        "SemiBold", "Semi Bold", "DemiBold", "Demi Bold",
+        "Black", "Bold", "Medium", "Light", "Thin", "Regular", "Book", "Roman"
+    ]
+    # Try exact suffix match
+    for style in known_styles:
+        if value.lower().endswith(style.lower()):
+            family = value[:-len(style)].strip()
+            # Normalize style spacing (e.g., 'Semi Bold' -> 'SemiBold')
+            normalized_style = style.replace(" ", "") if style in ["Semi Bold", "Demi Bold", "Extra Bold", "Extra Black"] else style
+            return (family or value, normalized_style)
+    # Fallback: only treat last token as style if it's a known style token
+    parts = value.split()
+    if len(parts) > 1:
+        last_token = parts[-1]
+        if last_token.lower() in [s.lower() for s in known_styles]:
+            return (" ".join(parts[:-1]).strip(), last_token)
+        # Otherwise, the entire value is the family; default style Regular
+        return (value, "Regular")
+    return (value, "Regular")
+
+
+def load_brand_txt_fonts(brand_folder: Path) -> Dict[str, str]:
+    """Parse brand font overrides from text files.
+    Looks for:
+      - inputs/{brand}/brand.txt
+      - inputs/{brand}/brand_docs/brand.txt
+    Recognizes lines like 'Heading Font: FreightDisp Pro' or 'Body Copy Font: Parabolica'.
+    Returns keys: heading_font, body_font, cta_font.
+    Later files override earlier ones.
+    """
+    result: Dict[str, str] = {}
+    candidates = [
+        brand_folder / "brand.txt",
+        brand_folder / "brand_docs" / "brand.txt",
+    ]
+
+    def apply_from_text(text: str):
+        nonlocal result
+        for raw_line in text.splitlines():
+            lower = raw_line.strip().lower()
+            if not lower:
+                continue
+            val = raw_line.split(":", 1)[1].strip() if ":" in raw_line else None
+            heading_keys = ["heading font", "headline font", "heading_typography", "headline", "title", "heading"]
+            body_keys    = ["body copy font", "body font", "body_typography", "body copy", "body"]
+            cta_keys     = ["cta font", "cta_typography", "cta", "button font", "button"]
+            if any(k in lower for k in heading_keys) and val:
+                result["heading_font"] = val
+            elif any(k in lower for k in body_keys) and val:
+                result["body_font"] = val
+            elif any(k in lower for k in cta_keys) and val:
+                result["cta_font"] = val
+
+    for path in candidates:
+        try:
+            if path.exists():
+                apply_from_text(path.read_text(encoding="utf-8", errors="ignore"))
+        except Exception:
+            continue
+
+    return result
+
+
+def resolve_typography(brand: Dict[str, Any], brand_txt_fonts: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Resolve the variant `type` block from the enhanced JSON plus brand.txt overrides."""
+    # Prefer structured typography if available
+    heading_dict = (brand.get("typography", {}) or {}).get("heading") or (brand.get("visual", {}).get("typography", {}) or {}).get("heading")
+    body_dict    = (brand.get("typography", {}) or {}).get("body")    or (brand.get("visual", {}).get("typography", {}) or {}).get("body")
+    # Fallbacks from older schema
+    if not heading_dict:
+        heading_dict = brand.get("type", {}).get("heading")
+    if not body_dict:
+        body_dict = brand.get("type", {}).get("body")
+
+    # Extract family/style from structured objects when present
+    heading_family_json = heading_dict.get("family") if isinstance(heading_dict, dict) else heading_dict
+    body_family_json    = body_dict.get("family")    if isinstance(body_dict, dict)    else body_dict
+    heading_style_json  = heading_dict.get("style")  if isinstance(heading_dict, dict) else None
+    body_style_json     = body_dict.get("style")     if isinstance(body_dict, dict)    else None
+    # Allow brand.txt overrides if present (highest precedence)
+    heading_raw = brand_txt_fonts.get("heading_font") or heading_family_json
+    body_raw    = brand_txt_fonts.get("body_font")    or body_family_json
+    cta_raw     = brand_txt_fonts.get("cta_font")     or heading_raw
+    heading_family, heading_style = split_family_and_style(heading_raw)
+    body_family, body_style       = split_family_and_style(body_raw)
+    # If JSON explicitly provided styles, prefer them over parsed styles
+    if heading_style_json:
+        heading_style = heading_style_json
+    if body_style_json:
+        body_style = body_style_json
+    _, cta_style                  = split_family_and_style(cta_raw)
+
+    return {
+        "heading": heading_family or brand.get("type", {}).get("heading"),
+        "body": body_family or brand.get("type", {}).get("body"),
+        "headingStyle": heading_style or heading_style_json or "Regular",
+        "bodyStyle": body_style or body_style_json or "Regular",
+        "ctaStyle": cta_style or "Bold",
+    }
+
+
+def format_profile_text(profile: Dict[str, Any]) -> str:
+    """Reference-doc fragment attached to claims and expansion prompts."""
+    profile_lines = []
+    ings = profile.get('product_ingredients', {}).get('ingredients', [])
+    if ings:
+        profile_lines.append("Product & Ingredients:\n" + "\n".join(ings))
+    pos = profile.get('positioning_statement', '')
+    if pos:
+        profile_lines.append("Positioning:\n" + pos)
+    aud = profile.get('audience_persona', {}).get('audience', '')
+    if aud:
+        profile_lines.append("Audience:\n" + aud)
+    return "\n\n".join(profile_lines)
+
+
+def _source_paths(brand_name: str) -> List[Path]:
+    base = Path(f"inputs/{brand_name}")
+    return [
+        base / f"{brand_name.lower()}_enhanced.json",
+        base / "brand_profile.json",
+        base / "brand.txt",
+        base / "brand_docs" / "brand.txt",
+    ]
+
+
+def _source_signature(paths: List[Path]) -> Tuple:
+    sig = []
+    for p in paths:
+        try:
+            st = p.stat()
+            sig.append((str(p), st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append((str(p), None, None))
+    return tuple(sig)
+
+
+def _compile_bundle(brand_name: str, signature: Tuple) -> BrandBundle:
+    paths = _source_paths(brand_name)
+    cfg = _safe_load_json(paths[0])
+    profile = _safe_load_json(paths[1]) or synthesize_brand_profile(cfg)
+    brand = cfg.get("brand", {}) or {}
+
+    voice = brand.get("voice_guide", {})
+    lex = (voice.get("lexicon") or {}) if isinstance(voice, dict) else {}
+    profile_lex = profile.get("voice_lexicon", {}) or {}
+    lexicon = {
+        "prefer": [w for w in (profile_lex.get("prefer") or lex.get("prefer") or []) if isinstance(w, str)],
+        "avoid": [w for w in (profile_lex.get("avoid") or lex.get("avoid") or []) if isinstance(w, str)],
+    }
+
+    return BrandBundle(
+        brand_name=brand_name,
+        version=hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()[:12],
+        _cfg=cfg,
+        _profile=profile,
+        typography=resolve_typography(brand, load_brand_txt_fonts(Path(f"inputs/{brand_name}"))),
+        lexicon=lexicon,
+        profile_text=format_profile_text(profile),
+    )
+
+
+def load_brand_bundle(brand_name: str) -> BrandBundle:
+    """
+    Return the compiled bundle for a brand folder under inputs/.
+    Cached per process; recompiled when any source file's mtime or size changes.
+    """
+    signature = _source_signature(_source_paths(brand_name))
+    cached = _BUNDLES.get(brand_name)
+    if cached and cached[0] == signature:
+        return cached[1]
+    with _LOCK:
+        cached = _BUNDLES.get(brand_name)
+        if cached and cached[0] == signature:
+            return cached[1]
+        bundle = _compile_bundle(brand_name, signature)
+        _BUNDLES[brand_name] = (signature, bundle)
+        return bundle
@@ -16,16 +16,14 @@ def load_brand_profile(brand_name: str) -> Dict[str, Any]:
     """
     Load a structured brand profile used to guide prompts.
     Priority: inputs/<brand>/brand_profile.json → synthesize from <brand>_enhanced.json
+    Served from the memoized brand bundle, so repeated calls do not touch disk.
     """
-    base = Path(f"inputs/{brand_name}")
-    # 1) Explicit brand profile (manual/curated overrides)
-    profile_path = base / "brand_profile.json"
-    profile = _safe_load_json(profile_path)
-    if profile:
-        return profile
+    from .brand_bundle import load_brand_bundle
+    return load_brand_bundle(brand_name).profile
 
-    # 2) Synthesize from enhanced JSON
-    enhanced = _safe_load_json(base / f"{brand_name.lower()}_enhanced.json")
+
+def synthesize_brand_profile(enhanced: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a brand profile from an enhanced brand JSON."""
     brand = enhanced.get("brand", {})
     strategy = enhanced.get("strategy", {})
     formulation = enhanced.get("formulation", {})
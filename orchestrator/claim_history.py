@@ -0,0 +1,134 @@
+# orchestrator/claim_history.py
+"""
+Persistent per-brand history of delivered claims (SQLite).
+Exact repeats hit a unique index on normalized text; near-duplicates are found
+through an indexed table of MinHash LSH band keys, so lookups stay constant-time
+as history grows into the hundreds of thousands of claims.
+"""
+
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .dedup import DEFAULT_THRESHOLD, NUM_PERM, band_keys, minhash_signature, normalize_claim, shingles
+
+HISTORY_DIR = os.getenv("CLAIM_HISTORY_DIR", "out/history")
+# Upper bound on LSH candidates checked per lookup (keeps pathological buckets cheap)
+MAX_CANDIDATES = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    id INTEGER PRIMARY KEY,
+    norm TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    sig BLOB NOT NULL,
+    job_id TEXT,
+    created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS claim_bands (
+    band_key INTEGER NOT NULL,
+    claim_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_claim_bands_key ON claim_bands(band_key);
+CREATE INDEX IF NOT EXISTS idx_claims_created ON claims(created_at);
+"""
+
+_SIG_FORMAT = f">{NUM_PERM}Q"
+
+
+def history_enabled() -> bool:
+    return os.getenv("CLAIM_HISTORY", "true").lower() in ("1", "true", "yes")
+
+
+def _db_path(brand_name: str) -> Path:
+    safe = re.sub(r"[^\w.-]+", "_", brand_name or "default")
+    return Path(HISTORY_DIR) / f"{safe}.sqlite"
+
+
+class ClaimHistory:
+    """Previously delivered claims for one brand."""
+
+    def __init__(self, brand_name: str, db_path: str = None, threshold: float = DEFAULT_THRESHOLD):
+        self.brand_name = brand_name
+        self.threshold = threshold
+        path = Path(db_path) if db_path else _db_path(brand_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM claims").fetchone()[0]
+
+    def find(self, text: str) -> Optional[str]:
+        """Return a previously delivered claim that `text` duplicates, if any."""
+        norm = normalize_claim(text)
+        if not norm:
+            return None
+        sig = minhash_signature(shingles(text))
+        keys = band_keys(sig)
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM claims WHERE norm = ?", (norm,)).fetchone()
+            if row:
+                return row[0]
+            rows = self._conn.execute(
+                f"SELECT DISTINCT c.text, c.sig FROM claim_bands b JOIN claims c ON c.id = b.claim_id "
+                f"WHERE b.band_key IN ({','.join('?' * len(keys))}) LIMIT {MAX_CANDIDATES}",
+                keys,
+            ).fetchall()
+        for cand_text, cand_sig in rows:
+            other = struct.unpack(_SIG_FORMAT, cand_sig)
+            # MinHash estimate of Jaccard similarity
+            if sum(1 for a, b in zip(sig, other) if a == b) / float(NUM_PERM) >= self.threshold:
+                return cand_text
+        return None
+
+    def record(self, texts: Iterable[str], job_id: str = None) -> int:
+        """Store delivered claims (exact repeats are ignored). Returns rows added."""
+        now = int(time.time())
+        added = 0
+        with self._lock, self._conn:
+            for text in texts:
+                norm = normalize_claim(text)
+                if not norm:
+                    continue
+                sig = minhash_signature(shingles(text))
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO claims (norm, text, sig, job_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (norm, text.strip(), struct.pack(_SIG_FORMAT, *sig), job_id, now),
+                )
+                if cur.rowcount:
+                    added += 1
+                    self._conn.executemany(
+                        "INSERT INTO claim_bands (band_key, claim_id) VALUES (?, ?)",
+                        [(k, cur.lastrowid) for k in band_keys(sig)],
+                    )
+        return added
+
+    def recent(self, limit: int = 25) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text FROM claims ORDER BY created_at DESC, id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def avoid_summary(self, limit: int = 25, max_chars: int = 1200) -> List[str]:
+        """Compact list of recent lines to steer the model away from (bounded by max_chars)."""
+        out: List[str] = []
+        used = 0
+        for text in self.recent(limit):
+            if used + len(text) > max_chars:
+                break
+            out.append(text)
+            used += len(text)
+        return out
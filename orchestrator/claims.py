@@ -1,16 +1,29 @@
 # orchestrator/claims.py
 from typing import Dict, Any, List
 from .llm import llm_json
-from .knowledge import load_knowledge_texts
-from .brand_profile import load_brand_profile
+from .prompt_log import get_prompt_logger
+from .knowledge import knowledge_signature, load_knowledge_texts
+from .brand_bundle import load_brand_bundle
+import json
 import os
+from .dedup import DEFAULT_THRESHOLD, NearDuplicateIndex
+from .field_limits import element_limits, item_violations, find_limit_violations, trim_to_limit
+from .headline_rewrite import BANNED_HEADLINE_VERBS, rewrite_headline_locally
+from .prompt_cache import prompt_cache, requirements_hash, stable_hash
+from .template_requirements import compiled_requirements, template_guidance
 from .prompt_templates import (
     CLAIMS_SYSTEM,
     CLAIMS_USER,
+    CLAIMS_EXCLUSIONS_BLOCK,
+    CLAIMS_HISTORY_BLOCK,
     EXPAND_SYSTEM,
     EXPAND_USER,
+    EXPAND_BATCH_USER,
+    FIELD_REPAIR_USER,
+    COMPLIANCE_REWRITE_USER,
+    HEADLINE_REWRITE_SYSTEM,
+    HEADLINE_REWRITE_BATCH_USER,
 )
-from pathlib import Path
 import datetime
 def _debug_enabled() -> bool:
     return os.getenv("DEBUG_PROMPTS", "false").lower() in ("1", "true", "yes")
@@ -20,11 +33,7 @@ def _debug_write(block: str, text: str):
     if not _debug_enabled():
         return
     try:
-        p = Path(os.getenv("PROMPT_DEBUG_FILE", "logs/prompts.log"))
-        p.parent.mkdir(parents=True, exist_ok=True)
-        with p.open("a", encoding="utf-8") as f:
-            # Write only the raw text with a minimal newline separator
-            f.write(f"\n{text}\n")
+        get_prompt_logger().write(block, text)
     except Exception:
         pass
 
@@ -63,6 +72,27 @@ def _debug_log_prompt(tag: str, system_text: str, user_text: str):
     except Exception:
         pass
 
+
+def _llm_json_logged(tag: str, system: str, user: str, extra: str = None) -> Dict[str, Any]:
+    """llm_json with sampled debug capture of the prompt (plus `extra`) and the response."""
+    sampled = _debug_enabled() and get_prompt_logger().sampled()
+    if sampled:
+        _debug_log_prompt(tag, system, user)
+        if extra:
+            _debug_write(f"{tag} EXTRA", extra)
+    try:
+        out = llm_json(system, user)
+    except Exception as e:
+        if sampled:
+            _debug_write(f"{tag} ERROR", repr(e))
+        raise
+    if sampled:
+        _debug_write(f"{tag} RESPONSE", json.dumps(out, ensure_ascii=False))
+    return out
+
+# Cap on accepted claims echoed back as exclusions when topping up
+MAX_EXCLUSIONS = 60
+
 def _ing_str(formulation: Dict[str, Any]) -> str:
     parts: List[str] = []
     for i in formulation.get("key_ingredients", []):
@@ -70,45 +100,37 @@ def _ing_str(formulation: Dict[str, Any]) -> str:
         parts.append(f"{i['name']}{dose} ({i.get('evidence_level','n/a')})")
     return ", ".join(parts)
 
-def generate_claims_by_angle(cfg: Dict[str, Any], target_per_angle: int = 8, style: str = 'balanced', template_requirements: Dict[str, Any] = None) -> Dict[str, List[Dict[str, str]]]:
-    """
-    Returns {angle_id: [ {text, style, angle_id}, ... ] } with de-dupe per angle.
-    Now style-first approach to avoid angle/style conflicts.
-    """
-    brand, strategy, formulation = cfg["brand"], cfg["strategy"], cfg["formulation"]
-    angle_claims: Dict[str, List[Dict[str, str]]] = {}
+# Style-specific instructions for the LLM, with creativity guardrails
+STYLE_INSTRUCTIONS = {
+    'benefit-focused': "ONLY BENEFIT-FOCUSED: Lead with the single most important benefit. Use 'you' language. No problem statements, no urgency, no proof.",
+    'problem-solution': "ONLY PROBLEM–SOLUTION: Start with the problem in 3–6 words, then present Metra as the solution. No social proof, no urgency, no generic benefits-only lines.",
+    'social-proof': "ONLY SOCIAL PROOF: Center the line on validation—ratings, experts, review snippets, or volume. Use explicit signals like 'Rated 4.9★', 'Trusted by 10,000+', 'Dermatologist-approved', '4.9/5 from 2,431 reviews'. No problem framing, no urgency.",
+    'urgency-driven': "ONLY URGENCY-DRIVEN: Time/quantity triggers + action. Keep tasteful, avoid hype. No proof language, no problem framing.",
+    'mixed-styles': "BLENDED: Hook + light problem + subtle proof + soft urgency, balanced in one line.",
+    'ingredient-led': (
+        "INGREDIENT-LED: Lead with the ingredient as hero; immediately connect it to a tangible beauty/wellness outcome. "
+        "Keep language consumer-friendly (avoid jargon); frame as part of a holistic blend (no miracle claims). "
+        "Where appropriate, nod to support (e.g., clinically studied/trusted by experts). "
+        "Stay compliant: use 'supports/helps/nourishes'; never disease/treat/cure/prevent. "
+        "Prefer hooks: Solution-First, Stat/Authority, Why-Explainer."
+    )
+}
 
-    # Style-specific instructions for the LLM
-    # Style-specific instructions for the LLM, with creativity guardrails
-    style_instructions = {
-        'benefit-focused': "ONLY BENEFIT-FOCUSED: Lead with the single most important benefit. Use 'you' language. No problem statements, no urgency, no proof.",
-        'problem-solution': "ONLY PROBLEM–SOLUTION: Start with the problem in 3–6 words, then present Metra as the solution. No social proof, no urgency, no generic benefits-only lines.",
-        'social-proof': "ONLY SOCIAL PROOF: Center the line on validation—ratings, experts, review snippets, or volume. Use explicit signals like 'Rated 4.9★', 'Trusted by 10,000+', 'Dermatologist-approved', '4.9/5 from 2,431 reviews'. No problem framing, no urgency.",
-        'urgency-driven': "ONLY URGENCY-DRIVEN: Time/quantity triggers + action. Keep tasteful, avoid hype. No proof language, no problem framing.",
-        'mixed-styles': "BLENDED: Hook + light problem + subtle proof + soft urgency, balanced in one line.",
-        'ingredient-led': (
-            "INGREDIENT-LED: Lead with the ingredient as hero; immediately connect it to a tangible beauty/wellness outcome. "
-            "Keep language consumer-friendly (avoid jargon); frame as part of a holistic blend (no miracle claims). "
-            "Where appropriate, nod to support (e.g., clinically studied/trusted by experts). "
-            "Stay compliant: use 'supports/helps/nourishes'; never disease/treat/cure/prevent. "
-            "Prefer hooks: Solution-First, Stat/Authority, Why-Explainer."
-        )
-    }
-    
-    style_instruction = style_instructions.get(style, style_instructions['mixed-styles'])
+# (brand_chars, global_chars) knowledge budgets per influence level
+CLAIMS_KNOWLEDGE_BUDGETS = {"low": (1000, 1000), "medium": (3000, 3000), "high": (6000, 6000)}
+EXPAND_KNOWLEDGE_BUDGETS = {"low": (800, 800), "medium": (2000, 2000), "high": (4000, 4000)}
 
-    # Get all available angles for context
-    angles = cfg.get("angles", [])
-    angle_context = ""
-    if angles:
-        angle_context = f"Available angles: {', '.join([a.get('name', '') for a in angles])}"
-    
-    # Generate claims for the specific style, using angles as context but not as the primary driver
-    brand_profile = load_brand_profile(brand.get("name", ""))
-    # Build angles text for prompt readability
-    angles_text = ", ".join([a.get('name','') for a in angles]) if angles else "beauty-from-within, busy-lifestyle, scientific-backing"
+# Placeholder for the per-call claim count inside a compiled claims prompt
+_TARGET_COUNT_SLOT = "\x00TARGET_COUNT\x00"
+
+
+def _cfg_fingerprint(cfg: Dict[str, Any]) -> str:
+    """Content hash of the prompt-relevant config (callers get copies of the bundle's cfg and may edit them)."""
+    return stable_hash({k: cfg.get(k) for k in ("brand", "strategy", "formulation", "angles")})
 
-    # Prepare ingredient list for ingredient-led style
+
+def _ingredient_lines(cfg: Dict[str, Any], brand_profile: Dict[str, Any]):
+    """Ingredient names and '- name: benefits' detail lines (falls back to the brand profile)."""
     ing_names: List[str] = []
     ing_detail_lines: List[str] = []
     try:
@@ -139,39 +161,27 @@ def generate_claims_by_angle(cfg: Dict[str, Any], target_per_angle: int = 8, sty
                     ing_detail_lines.append(f"- {txt}")
         except Exception:
             pass
-    ingredients_list = ", ".join([n for n in ing_names if n])
-    ingredients_detail_block = "\n".join(ing_detail_lines)
+    return ", ".join([n for n in ing_names if n]), "\n".join(ing_detail_lines)
+
+
+def _compile_claims_prompt(cfg: Dict[str, Any], bundle, style: str, template_requirements: Dict[str, Any],
+                           brand_chars: int, global_chars: int):
+    """Build the static claims prompt (reference docs + instruction) with a target-count slot.
+    Returns (prompt, resolved style instruction)."""
+    brand, strategy = cfg["brand"], cfg["strategy"]
+    angles = cfg.get("angles", [])
+    # Build angles text for prompt readability
+    angles_text = ", ".join([a.get('name','') for a in angles]) if angles else "beauty-from-within, busy-lifestyle, scientific-backing"
+    ingredients_list, ingredients_detail_block = _ingredient_lines(cfg, bundle.profile)
 
     # If ingredient-led selected, enrich instruction with ingredient roster
     if style == 'ingredient-led' and ingredients_list:
-        style_instruction = style_instructions.get(style)
-        style_instruction = f"{style_instruction} Rotate across key ingredients: {ingredients_list}."
+        style_instruction = f"{STYLE_INSTRUCTIONS[style]} Rotate across key ingredients: {ingredients_list}."
     else:
-        style_instruction = style_instructions.get(style, style_instructions['mixed-styles'])
-
-    # We will ask for exactly target_per_angle claims total
-    # Build template requirements block and output fields for single-pass generation
-    tr_block = ""
-    output_fields_csv = ""
-    if template_requirements and template_requirements.get('elements'):
-        lines: List[str] = []
-        out_fields: List[str] = []
-        for el in template_requirements.get('elements', []):
-            name = el.get('name', '')
-            max_chars = el.get('max_chars', 100)
-            desc = el.get('description', '')
-            if name:
-                lines.append(f"- {name}: max {max_chars} chars — {desc}")
-                out_fields.append(f'"{name}": "…"')
-        # Include prompt guidance if available
-        guidance = ""
-        if isinstance(template_requirements, dict) and template_requirements.get('metadata'):
-            guidance = template_requirements['metadata'].get('prompt_guidance', '')
-        if guidance:
-            lines.append(f"- Guidance: {guidance}")
-        tr_block = "\n".join(lines)
-        output_fields_csv = ",\n      ".join(out_fields)
+        style_instruction = STYLE_INSTRUCTIONS.get(style, STYLE_INSTRUCTIONS['mixed-styles'])
 
+    # Precompiled by TemplateManager (compiled here only for ad-hoc requirement dicts)
+    requirements = compiled_requirements(template_requirements)
     user = CLAIMS_USER.format(
         brand_name=brand.get("name",""),
         tagline=brand.get("tagline",""),
@@ -182,70 +192,86 @@ def generate_claims_by_angle(cfg: Dict[str, Any], target_per_angle: int = 8, sty
         angle_name=angles_text,
         ingredients_list=ingredients_list,
         ingredients_detail_block=ingredients_detail_block,
-        template_requirements_block=tr_block,
-        output_fields_csv=output_fields_csv or '"#HEADLINE": "…"',
-        target_count=target_per_angle,
+        template_requirements_block=requirements["prompt_block"],
+        output_fields_csv=requirements["output_fields_csv"] or '"#HEADLINE": "…"',
+        target_count=_TARGET_COUNT_SLOT,
         style_instruction=style_instruction,
         style=style,
     )
 
     # Lightweight RAG: attach concise brand/global knowledge as a prefix note
-    brand_name = brand.get("name", "")
-    # Knowledge influence budgets
-    # Prefer separate brand vs ad influence if provided
-    infl = os.getenv("KNOWLEDGE_INFLUENCE", os.getenv("KNOWLEDGE_AD_INFLUENCE", "medium")).lower()
-    brand_infl = os.getenv("KNOWLEDGE_BRAND_INFLUENCE", infl).lower()
-    budgets = {
-        "low": (1000, 1000),
-        "medium": (3000, 3000),
-        "high": (6000, 6000),
-    }
-    brand_chars, global_chars = budgets.get(brand_infl, budgets["medium"]) 
-    kb = load_knowledge_texts(brand_name, brand_chars=brand_chars, global_chars=global_chars)
-    # Build brand profile reference text and attach as reference docs (not inline prompt)
-    profile_lines = []
-    ings = brand_profile.get('product_ingredients',{}).get('ingredients',[])
-    if ings:
-        profile_lines.append("Product & Ingredients:\n" + "\n".join(ings))
-    pos = brand_profile.get('positioning_statement','')
-    if pos:
-        profile_lines.append("Positioning:\n" + pos)
-    aud = brand_profile.get('audience_persona',{}).get('audience','')
-    if aud:
-        profile_lines.append("Audience:\n" + aud)
-    profile_text = "\n\n".join(profile_lines)
-
-    ref_docs = profile_text
+    kb = load_knowledge_texts(bundle.brand_name, brand_chars=brand_chars, global_chars=global_chars)
+    # Brand profile reference text is precompiled in the bundle; attach as reference docs (not inline prompt)
+    ref_docs = bundle.profile_text
     if kb:
         ref_docs = (ref_docs + "\n\n" if ref_docs else "") + kb
     if ref_docs:
         user = f"""[REFERENCE DOCS]\n{ref_docs}\n\n[INSTRUCTION]\n{user}"""
-    if _debug_enabled():
-        # Log the prompt plus an explicit resolved style instruction block for easy debugging
-        _debug_log_prompt("CLAIMS", CLAIMS_SYSTEM, user)
-        try:
-            resolved = f"\n-- RESOLVED STYLE --\n{style_instruction}\n-- END STYLE --\n"
-            _debug_write("CLAIMS_STYLE", resolved)
-        except Exception:
-            pass
-    out = llm_json(CLAIMS_SYSTEM, user) or {}
-    seen: set = set()
+    return user, style_instruction
+
+
+def generate_claims_by_angle(cfg: Dict[str, Any], target_per_angle: int = 8, style: str = 'balanced', template_requirements: Dict[str, Any] = None,
+                             dedup_index: NearDuplicateIndex = None, exclude_claims: List[str] = None,
+                             avoid_claims: List[str] = None) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Returns {angle_id: [ {text, style, angle_id}, ... ] } with near-duplicate de-dupe.
+    Pass a shared `dedup_index` to reject near-duplicates of claims accepted earlier in a run
+    (it is only read here; add claims to it once they are kept),
+    `exclude_claims` (already accepted lines) when topping up a shortfall, and
+    `avoid_claims` (a compact summary of the brand's delivered history).
+    Now style-first approach to avoid angle/style conflicts.
+    """
+    brand = cfg["brand"]
+    angles = cfg.get("angles", [])
+    angle_claims: Dict[str, List[Dict[str, str]]] = {}
+
+    bundle = load_brand_bundle(brand.get("name", ""))
+    # Knowledge influence budgets
+    # Prefer separate brand vs ad influence if provided
+    infl = os.getenv("KNOWLEDGE_INFLUENCE", os.getenv("KNOWLEDGE_AD_INFLUENCE", "medium")).lower()
+    brand_infl = os.getenv("KNOWLEDGE_BRAND_INFLUENCE", infl).lower()
+    brand_chars, global_chars = CLAIMS_KNOWLEDGE_BUDGETS.get(brand_infl, CLAIMS_KNOWLEDGE_BUDGETS["medium"])
+
+    # Static parts (style table, ingredients, angles, template block, reference docs) are compiled
+    # once per bundle version / style / requirements; only the count and exclusions vary per call
+    key = ("claims", _cfg_fingerprint(cfg), style, requirements_hash(template_requirements),
+           brand_chars, global_chars, knowledge_signature(bundle.brand_name))
+    compiled, style_instruction = prompt_cache.get_or_build(
+        key, lambda: _compile_claims_prompt(cfg, bundle, style, template_requirements, brand_chars, global_chars)
+    )
+    user = compiled.replace(_TARGET_COUNT_SLOT, str(target_per_angle))
+
+    if avoid_claims:
+        user += CLAIMS_HISTORY_BLOCK.format(history="\n".join(f"- {c}" for c in avoid_claims))
+    exclusions = [c for c in (exclude_claims or []) if c][-MAX_EXCLUSIONS:]
+    if exclusions:
+        user += CLAIMS_EXCLUSIONS_BLOCK.format(exclusions="\n".join(f"- {c}" for c in exclusions))
+
+    # Log the prompt plus an explicit resolved style instruction block for easy debugging
+    resolved = f"\n-- RESOLVED STYLE --\n{style_instruction}\n-- END STYLE --\n"
+    out = _llm_json_logged("CLAIMS", CLAIMS_SYSTEM, user, extra=resolved) or {}
+    # The shared index only holds claims the caller accepted; this batch is checked against it
+    # and against itself, and the caller indexes whatever it ends up keeping
+    batch_index = NearDuplicateIndex(threshold=dedup_index.threshold if dedup_index is not None else DEFAULT_THRESHOLD)
     all_claims: List[Dict[str, Any]] = []
+    rejected = 0
     
     for c in out.get("claims", []):
         claim_txt = (c.get("claim") or c.get("text") or "").strip()
         if not claim_txt:
             continue
-        k = claim_txt.lower()
-        if k in seen:
+        if (dedup_index is not None and dedup_index.find(claim_txt) is not None) or not batch_index.add(claim_txt):
+            rejected += 1
             continue
-        seen.add(k)
         # Keep the full structured item and ensure style is present
         item = dict(c)
         if not item.get("style"):
             item["style"] = style
         all_claims.append(item)
     
+    if rejected:
+        print(f"[IAG] Rejected {rejected} near-duplicate claims", flush=True)
+
     # Distribute claims across angles if we have them
     if angles and all_claims:
         claims_per_angle = len(all_claims) // len(angles)
@@ -259,24 +285,262 @@ def generate_claims_by_angle(cfg: Dict[str, Any], target_per_angle: int = 8, sty
 
     return angle_claims
 
+def _needs_rewrite(text: str) -> bool:
+    lower = (text or "").lower()
+    return any(w in lower for w in BANNED_HEADLINE_VERBS)
+
+
+def _is_headline_field(field: str) -> bool:
+    return field.strip().replace('#', '').upper().startswith('HEADLINE')
+
+
+def _expand_budgets():
+    # Include knowledge with independent budgets for brand/global
+    infl = os.getenv("KNOWLEDGE_INFLUENCE", os.getenv("KNOWLEDGE_AD_INFLUENCE", "medium")).lower()
+    brand_infl = os.getenv("KNOWLEDGE_BRAND_INFLUENCE", infl).lower()
+    return EXPAND_KNOWLEDGE_BUDGETS.get(brand_infl, EXPAND_KNOWLEDGE_BUDGETS["medium"])
+
+
+def _expand_attachments(brand: Dict[str, Any]) -> str:
+    """Reference docs shared by expansion prompts: brand profile + knowledge."""
+    b_chars, g_chars = _expand_budgets()
+    kb = load_knowledge_texts(brand.get("name",""), brand_chars=b_chars, global_chars=g_chars)
+    # Include concise brand profile in attachments so the LLM has brand-specific context
+    profile_text = load_brand_bundle(brand.get("name","")).profile_text
+    return "\n\n".join([t for t in [profile_text, kb] if t])
+
+
+# Placeholder for the per-call claim text (or claims block) inside a compiled expansion prompt
+_CLAIM_SLOT = "\x00CLAIM\x00"
+
+
+def _compile_expand_prompt(kind: str, brand: Dict[str, Any], strategy: Dict[str, Any],
+                           template_requirements: Dict[str, Any] = None) -> str:
+    """
+    Cached expansion prompt (reference docs + instruction) with a _CLAIM_SLOT for the claim.
+    kind: "template" / "generic" (single claim) or "batch" (numbered claims block).
+    """
+    name = brand.get("name", "")
+    bundle = load_brand_bundle(name)
+    b_chars, g_chars = _expand_budgets()
+    key = ("expand", kind, bundle.version,
+           stable_hash([name, brand.get("tone", ""), strategy.get("audience", "")]),
+           requirements_hash(template_requirements), b_chars, g_chars, knowledge_signature(name))
+
+    def build() -> str:
+        if kind == "generic":
+            body = EXPAND_USER.format(tone=brand.get("tone", ""), audience=strategy.get("audience", ""),
+                                      claim=_CLAIM_SLOT)
+        else:
+            limits = element_limits(template_requirements)
+            guidance = template_guidance(template_requirements) or "Generate engaging, brand-appropriate content for each text element."
+            if kind == "batch":
+                body = EXPAND_BATCH_USER.format(
+                    brand_name=name,
+                    tone=brand.get("tone", ""),
+                    audience=strategy.get("audience", ""),
+                    element_info="\n".join(f"- {n}: max {mc} characters" for n, mc in limits.items()),
+                    template_guidance=guidance,
+                    claims_block=_CLAIM_SLOT,
+                    fields_csv=", ".join(f'"{field}": "..."' for field in limits),
+                )
+            else:
+                element_info = "\n".join(f"- {n}: max {mc} characters" for n, mc in limits.items())
+                fields = "\n".join(f'"{field}": "..."' for field in limits)
+                body = f"""Brand: {name}
+Tone: {brand.get("tone", "")}
+Audience: {strategy.get("audience", "")}
+Claim: "{_CLAIM_SLOT}"
+
+TEMPLATE REQUIREMENTS:
+{element_info}
+
+TEMPLATE GUIDANCE:
+{guidance}
+
+Generate ONLY the text elements specified above. Each element should respect the character limits and follow the template guidance.
+Return JSON with exactly these fields: {fields}
+
+JSON:"""
+        return f"""[REFERENCE DOCS]\n{_expand_attachments(brand)}\n\n[INSTRUCTION]\n{body}"""
+
+    return prompt_cache.get_or_build(key, build)
+
+
+def _items_by_index(rows: Any, count: int) -> Dict[int, Dict[str, Any]]:
+    """Map batch response rows to request indexes (falls back to row position)."""
+    mapped: Dict[int, Dict[str, Any]] = {}
+    if not isinstance(rows, list):
+        return mapped
+    for pos, row in enumerate(rows):
+        if not isinstance(row, dict):
+            continue
+        try:
+            idx = int(row.get("index", pos))
+        except (TypeError, ValueError):
+            idx = pos
+        if 0 <= idx < count and idx not in mapped:
+            mapped[idx] = row
+    return mapped
+
+
+def rewrite_headlines_batch(brand: Dict[str, Any], strategy: Dict[str, Any],
+                            headlines: List[str], max_chars: int = 70) -> List[str]:
+    """Rewrite many banned-verb headlines in a single LLM call.
+    Items the model does not return (or returns over the limit) keep their original text.
+    """
+    if not headlines:
+        return []
+    block = "\n".join(f'{i}. (max {max_chars} chars) "{h}"' for i, h in enumerate(headlines))
+    user = HEADLINE_REWRITE_BATCH_USER.format(
+        tone=brand.get("tone", ""),
+        audience=strategy.get("audience", ""),
+        headlines_block=block,
+        banned_verbs=", ".join(BANNED_HEADLINE_VERBS),
+    )
+    try:
+        out = _llm_json_logged("REWRITE(batch)", HEADLINE_REWRITE_SYSTEM, user) or {}
+    except Exception:
+        return list(headlines)
+    rows = _items_by_index(out.get("headlines"), len(headlines))
+    result: List[str] = []
+    for i, original in enumerate(headlines):
+        new_h = (rows.get(i, {}).get("headline") or "").strip()
+        result.append(new_h if new_h and len(new_h) <= max_chars and not _needs_rewrite(new_h) else original)
+    return result
+
+
+def repair_field_limits(brand: Dict[str, Any], strategy: Dict[str, Any], items: List[Dict[str, Any]],
+                        template_requirements: Dict[str, Any], batch_size: int = None) -> int:
+    """
+    Enforce template max_chars on structured claims in place.
+    Every field of every item is checked in one pass; only offending fields are sent
+    back to the model, together, in one batched repair call (chunked for very large runs).
+    Anything the model still leaves over the limit is trimmed at a word boundary.
+    Returns the number of fields that were repaired or trimmed.
+    """
+    violations = find_limit_violations(items, template_requirements)
+    if not violations:
+        return 0
+    print(f"[IAG] {len(violations)} template fields break their limits; repairing", flush=True)
+    batch_size = batch_size or int(os.getenv("REPAIR_BATCH_SIZE", "40"))
+    for start in range(0, len(violations), batch_size):
+        chunk = violations[start:start + batch_size]
+        fields_block = "\n".join(
+            f'{i}. [{name}, max {max_chars} chars] claim: "{items[idx].get("claim") or ""}" current: "{items[idx].get(name) or ""}"'
+            for i, (idx, name, max_chars) in enumerate(chunk)
+        )
+        user = FIELD_REPAIR_USER.format(
+            tone=brand.get("tone", ""),
+            audience=strategy.get("audience", ""),
+            fields_block=fields_block,
+        )
+        try:
+            out = _llm_json_logged("REPAIR(fields)", EXPAND_SYSTEM, user) or {}
+        except Exception:
+            out = {}
+        rows = _items_by_index(out.get("fields"), len(chunk))
+        for i, (idx, name, max_chars) in enumerate(chunk):
+            val = rows.get(i, {}).get("value")
+            if isinstance(val, str) and val.strip() and len(val.strip()) <= max_chars:
+                items[idx][name] = val.strip()
+            elif items[idx].get(name):
+                items[idx][name] = trim_to_limit(items[idx][name], max_chars)
+    return len(violations)
+
+
+def expand_copy_batch(brand: Dict[str, Any], claims: List[str], strategy: Dict[str, Any],
+                      template_requirements: Dict[str, Any] = None,
+                      max_retries: int = 1, batch_size: int = None) -> List[Dict[str, str]]:
+    """
+    Batch counterpart of expand_copy: expands many claims per LLM call.
+    The reference docs are sent once per batch; every returned item is validated
+    against the template elements and max_chars, and only failing items are retried.
+    Returns one dict per input claim, in input order.
+    """
+    if not claims:
+        return []
+    if not (template_requirements and template_requirements.get('elements')):
+        # Generic structure has no per-field limits to validate; keep the single-claim path
+        return [expand_copy(brand, c, strategy) for c in claims]
+
+    limits = element_limits(template_requirements)
+    required_fields = list(limits.keys())
+    prompt = _compile_expand_prompt("batch", brand, strategy, template_requirements)
+    batch_size = batch_size or int(os.getenv("EXPAND_BATCH_SIZE", "20"))
+
+    results: List[Dict[str, str]] = [{} for _ in claims]
+    pending = list(range(len(claims)))
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        failed: List[int] = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            claims_block = "\n".join(f'{i}. "{claims[ci]}"' for i, ci in enumerate(chunk))
+            user = prompt.replace(_CLAIM_SLOT, claims_block)
+            try:
+                out = _llm_json_logged("EXPAND(batch)", EXPAND_SYSTEM, user) or {}
+            except Exception:
+                out = {}
+            rows = _items_by_index(out.get("items"), len(chunk))
+            for i, ci in enumerate(chunk):
+                row = rows.get(i, {})
+                item: Dict[str, str] = {}
+                for f in required_fields:
+                    prev = results[ci].get(f, "")
+                    new_val = row.get(f).strip() if isinstance(row.get(f), str) else ""
+                    # Fields that were already valid on an earlier attempt are kept as-is
+                    item[f] = prev if prev and len(prev) <= limits[f] else (new_val or prev)
+                results[ci] = item
+                if item_violations(item, limits):
+                    failed.append(ci)
+        if failed:
+            print(f"[IAG] Batch expansion: {len(failed)} of {len(claims)} items failed validation (attempt {attempt + 1})", flush=True)
+        pending = failed
+
+    # Fill anything still missing the same way expand_copy does
+    for item in results:
+        for f in required_fields:
+            if not item.get(f):
+                item[f] = f"Default {f}"
+
+    # Headline fields with banned verbs: local rule-based rewrite first,
+    # then one batched LLM rewrite for whatever it could not fix
+    lexicon = load_brand_bundle(brand.get("name", "")).lexicon
+    to_rewrite = []
+    for ci, item in enumerate(results):
+        for f in required_fields:
+            if _is_headline_field(f) and _needs_rewrite(item[f]):
+                local = rewrite_headline_locally(item[f], lexicon.get("prefer"), lexicon.get("avoid"), limits[f])
+                if local:
+                    item[f] = local
+                else:
+                    to_rewrite.append((ci, f))
+    if to_rewrite:
+        max_chars = min(limits[f] for _, f in to_rewrite)
+        rewritten = rewrite_headlines_batch(brand, strategy, [results[ci][f] for ci, f in to_rewrite], max_chars=max_chars)
+        for (ci, f), new_h in zip(to_rewrite, rewritten):
+            results[ci][f] = new_h
+    return results
+
+
 def expand_copy(brand: Dict[str, Any], claim: str, strategy: Dict[str, Any], 
                 template_requirements: Dict[str, Any] = None) -> Dict[str, str]:
     """
     Returns dynamic structure based on template requirements.
     Completely template-driven - no hardcoded fields.
     """
-    # Helper: banned headline verbs we want to avoid (too common)
-    banned_verbs = [
-        "elevate", "unlock", "discover", "transform", "reveal", "experience", "boost"
-    ]
-
-    def _needs_rewrite(text: str) -> bool:
-        lower = (text or "").lower()
-        return any(w in lower for w in banned_verbs)
+    banned_verbs = BANNED_HEADLINE_VERBS
+    lexicon = load_brand_bundle(brand.get("name", "")).lexicon
 
-    def _rewrite_headline(text: str) -> str:
+    def _rewrite_headline(text: str, max_chars: int = 70) -> str:
+        # Deterministic local rewrite first; only fall back to the LLM when it cannot fix the line
+        local = rewrite_headline_locally(text, lexicon.get("prefer"), lexicon.get("avoid"), max_chars)
+        if local:
+            return local
         try:
-            system = "You are a concise, on-brand headline writer. Return JSON only."
+            system = HEADLINE_REWRITE_SYSTEM
             user = (
                 f"Tone: {brand.get('tone','')}\n"
                 f"Audience: {strategy.get('audience','')}\n"
@@ -285,7 +549,7 @@ def expand_copy(brand: Dict[str, Any], claim: str, strategy: Dict[str, Any],
                 f"Keep meaning and legality; avoid hype.\n\n"
                 "JSON:{\"headline\":\"…\"}"
             )
-            out = llm_json(system, user) or {}
+            out = _llm_json_logged("REWRITE(headline)", system, user) or {}
             new_h = (out.get("headline") or "").strip()
             return new_h or text
         except Exception:
@@ -295,105 +559,26 @@ def expand_copy(brand: Dict[str, Any], claim: str, strategy: Dict[str, Any],
     if template_requirements and template_requirements.get('elements'):
         # Template-specific generation
         elements = template_requirements.get('elements', [])
-        element_info = []
-        required_fields = []
-        
-        for element in elements:
-            name = element.get('name', '')
-            max_chars = element.get('max_chars', 100)
-            element_info.append(f"- {name}: max {max_chars} characters")
-            required_fields.append(name)
-        
-        # Get template prompt guidance if available
-        template_guidance = ""
-        if hasattr(template_requirements, 'metadata') and template_requirements.metadata:
-            template_guidance = template_requirements.metadata.get('prompt_guidance', '')
-        elif isinstance(template_requirements, dict) and template_requirements.get('metadata'):
-            template_guidance = template_requirements['metadata'].get('prompt_guidance', '')
-        
-        # Include knowledge with independent budgets for brand/global
-        infl = os.getenv("KNOWLEDGE_INFLUENCE", os.getenv("KNOWLEDGE_AD_INFLUENCE", "medium")).lower()
-        brand_infl = os.getenv("KNOWLEDGE_BRAND_INFLUENCE", infl).lower()
-        budgets = {"low": (800, 800), "medium": (2000, 2000), "high": (4000, 4000)}
-        b_chars, g_chars = budgets.get(brand_infl, budgets["medium"]) 
-        kb = load_knowledge_texts(brand.get("name",""), brand_chars=b_chars, global_chars=g_chars)
-        # Include concise brand profile in attachments so the LLM has brand-specific context
-        bp = load_brand_profile(brand.get("name",""))
-        profile_lines = []
-        ings = bp.get('product_ingredients',{}).get('ingredients',[])
-        if ings:
-            profile_lines.append("Product & Ingredients:\n" + "\n".join(ings))
-        pos = bp.get('positioning_statement','')
-        if pos:
-            profile_lines.append("Positioning:\n" + pos)
-        audp = bp.get('audience_persona',{}).get('audience','')
-        if audp:
-            profile_lines.append("Audience:\n" + audp)
-        profile_text = "\n\n".join(profile_lines)
-        attachments = "\n\n".join([t for t in [profile_text, kb] if t])
-
-        body = f"""Brand: {brand.get("name", "")}
-Tone: {brand.get("tone", "")}
-Audience: {strategy.get("audience", "")}
-Claim: "{claim}"
-
-TEMPLATE REQUIREMENTS:
-{chr(10).join(element_info)}
-
-TEMPLATE GUIDANCE:
-{template_guidance if template_guidance else "Generate engaging, brand-appropriate content for each text element."}
-
-Generate ONLY the text elements specified above. Each element should respect the character limits and follow the template guidance.
-Return JSON with exactly these fields: {chr(10).join(f'"{field}": "..."' for field in required_fields)}
-
-JSON:"""
-        user = f"""[REFERENCE DOCS]\n{attachments}\n\n[INSTRUCTION]\n{body}"""
-        if _debug_enabled():
-            _debug_log_prompt("EXPAND(template)", EXPAND_SYSTEM, user)
-        out = llm_json(EXPAND_SYSTEM, user) or {}
+        required_fields = [e.get('name', '') for e in elements]
+        user = _compile_expand_prompt("template", brand, strategy, template_requirements).replace(_CLAIM_SLOT, claim)
+        out = _llm_json_logged("EXPAND(template)", EXPAND_SYSTEM, user) or {}
         
         # Return only the fields that the template requires
         result = {}
         for field in required_fields:
             val = (out.get(field) or "").strip() or f"Default {field}"
             # If this field looks like a headline, optionally rewrite to avoid banned words
-            if field.strip().replace('#','').upper().startswith('HEADLINE') and _needs_rewrite(val):
-                val = _rewrite_headline(val)
+            if _is_headline_field(field) and _needs_rewrite(val):
+                max_chars = next((int(e.get('max_chars', 70)) for e in elements if e.get('name') == field), 70)
+                val = _rewrite_headline(val, max_chars)
             result[field] = val
         
         return result
     else:
         # Fallback to default structure if no template requirements
-        # Include knowledge
-        infl = os.getenv("KNOWLEDGE_INFLUENCE", os.getenv("KNOWLEDGE_AD_INFLUENCE", "medium")).lower()
-        brand_infl = os.getenv("KNOWLEDGE_BRAND_INFLUENCE", infl).lower()
-        budgets = {"low": (800, 800), "medium": (2000, 2000), "high": (4000, 4000)}
-        b_chars, g_chars = budgets.get(brand_infl, budgets["medium"]) 
-        kb = load_knowledge_texts(brand.get("name",""), brand_chars=b_chars, global_chars=g_chars)
-        bp = load_brand_profile(brand.get("name",""))
-        profile_lines = []
-        ings = bp.get('product_ingredients',{}).get('ingredients',[])
-        if ings:
-            profile_lines.append("Product & Ingredients:\n" + "\n".join(ings))
-        pos = bp.get('positioning_statement','')
-        if pos:
-            profile_lines.append("Positioning:\n" + pos)
-        audp = bp.get('audience_persona',{}).get('audience','')
-        if audp:
-            profile_lines.append("Audience:\n" + audp)
-        profile_text = "\n\n".join(profile_lines)
-        attachments = "\n\n".join([t for t in [profile_text, kb] if t])
-
-        body = EXPAND_USER.format(
-            tone=brand.get("tone", ""),
-            audience=strategy.get("audience", ""),
-            claim=claim,
-        )
-        user = f"""[REFERENCE DOCS]\n{attachments}\n\n[INSTRUCTION]\n{body}"""
-        
-        if _debug_enabled():
-            _debug_log_prompt("EXPAND(generic)", EXPAND_SYSTEM, user)
-        out = llm_json(EXPAND_SYSTEM, user) or {}
+        user = _compile_expand_prompt("generic", brand, strategy).replace(_CLAIM_SLOT, claim)
+
+        out = _llm_json_logged("EXPAND(generic)", EXPAND_SYSTEM, user) or {}
         headline = (out.get("headline") or "").strip() or claim
         if _needs_rewrite(headline):
             headline = _rewrite_headline(headline)
@@ -408,4 +593,33 @@ JSON:"""
         cta = (out.get("cta") or "").strip() or "Learn More"
         return {"headline": headline, "value_props": value_props, "cta": cta}
 
-## Compliance verification removed per request
\ No newline at end of file
+
+def rewrite_noncompliant_batch(brand: Dict[str, Any], strategy: Dict[str, Any],
+                               batch: List[Any], template_requirements: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """
+    Rewrite the non-compliant fields of many claims in one LLM call.
+    `batch` holds (item, {field: [banned phrases]}) pairs; returns repaired copies in
+    the same order. Only the flagged fields are sent; the caller re-screens the result.
+    """
+    if not batch:
+        return []
+    limits = element_limits(template_requirements)
+    entries = [(pos, field, phrases) for pos, (_, found) in enumerate(batch) for field, phrases in found.items()]
+    lines = []
+    for i, (pos, field, phrases) in enumerate(entries):
+        limit = f", max {limits[field]} chars" if field in limits else ""
+        lines.append(f'{i}. [{field}{limit}] banned: {", ".join(phrases)} current: "{batch[pos][0].get(field) or ""}"')
+    user = COMPLIANCE_REWRITE_USER.format(
+        tone=brand.get("tone", ""),
+        audience=strategy.get("audience", ""),
+        fields_block="\n".join(lines),
+    )
+    out = _llm_json_logged("COMPLIANCE(rewrite)", EXPAND_SYSTEM, user) or {}
+    rows = _items_by_index(out.get("fields"), len(entries))
+    fixed = [dict(item) for item, _ in batch]
+    for i, (pos, field, _) in enumerate(entries):
+        val = rows.get(i, {}).get("value")
+        if isinstance(val, str) and val.strip():
+            val = val.strip()
+            fixed[pos][field] = trim_to_limit(val, limits[field]) if field in limits else val
+    return fixed
\ No newline at end of file
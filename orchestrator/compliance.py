@@ -1,12 +1,94 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Iterable, List, Tuple
+
 BANNED_PHRASES = {
     "cure", "treat", "prevent disease", "clinically proven", "guaranteed",
     "diagnose", "mitigate", "heal", "medicine", "prescription"
 }
 
+# Simple inflections of single-word phrases ("treat" -> "treats", "treated", "treating");
+# a final "e" is dropped before "-ing" ("cure" -> "cures", "cured", "curing")
+_INFLECTIONS = r"(?:s|es|ed|ing)?"
+_E_INFLECTIONS = r"(?:e|es|ed|ing)"
+
+
+@dataclass(frozen=True)
+class ComplianceMatch:
+    """A banned phrase found in a claim, with its character span"""
+    phrase: str
+    start: int
+    end: int
+
+
+def _phrase_pattern(phrase: str) -> str:
+    words = phrase.split()
+    if len(words) == 1 and phrase.isalpha():
+        if phrase.endswith("e"):
+            return re.escape(phrase[:-1]) + _E_INFLECTIONS
+        return re.escape(phrase) + _INFLECTIONS
+    return r"\s+".join(re.escape(w) for w in words)
+
+
+class ComplianceMatcher:
+    """
+    Banned-phrase screen compiled into one word-bounded alternation regex.
+    "treat" matches "treat"/"treated" but not "treatment"; multi-word phrases
+    tolerate any whitespace between words.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        cleaned = {" ".join(p.lower().split()) for p in phrases if isinstance(p, str) and p.strip()}
+        # Longest first so "prevent disease" wins over a shorter overlapping phrase
+        self.phrases: Tuple[str, ...] = tuple(sorted(cleaned, key=lambda p: (-len(p), p)))
+        if self.phrases:
+            alternation = "|".join(f"({_phrase_pattern(p)})" for p in self.phrases)
+            self._regex = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+        else:
+            self._regex = None
+
+    def screen(self, text: str) -> List[ComplianceMatch]:
+        """All banned phrases in `text` with their spans (empty list when clean)."""
+        if not self._regex or not text:
+            return []
+        return [
+            ComplianceMatch(self.phrases[m.lastindex - 1], m.start(), m.end())
+            for m in self._regex.finditer(text)
+        ]
+
+    def screen_batch(self, texts: Iterable[str]) -> List[List[ComplianceMatch]]:
+        """Screen many claims; result i holds the matches for texts[i]."""
+        return [self.screen(t) for t in texts]
+
+    def is_clean(self, text: str) -> bool:
+        return not self._regex or not text or self._regex.search(text) is None
+
+
+def _formulation_banned(formulation: Any) -> Tuple[str, ...]:
+    if formulation is None:
+        return ()
+    if isinstance(formulation, dict):
+        banned = formulation.get("banned_claims") or []
+    else:
+        banned = getattr(formulation, "banned_claims", None) or []
+    return tuple(b for b in banned if isinstance(b, str))
+
+
+@lru_cache(maxsize=64)
+def _compiled(extra: Tuple[str, ...]) -> ComplianceMatcher:
+    return ComplianceMatcher(list(BANNED_PHRASES) + list(extra))
+
+
+def get_matcher(formulation: Any = None) -> ComplianceMatcher:
+    """Compiled matcher for the global list plus a formulation's banned_claims (cached per list)."""
+    return _compiled(tuple(sorted(set(_formulation_banned(formulation)))))
+
+
+def screen_claims(texts: Iterable[str], formulation: Any = None) -> List[List[ComplianceMatch]]:
+    """Batch API: screen many claims against the global and formulation lists."""
+    return get_matcher(formulation).screen_batch(texts)
+
+
 def validate_claim(text: str, formulation) -> bool:
-    low = text.lower()
-    if any(p in low for p in BANNED_PHRASES):
-        return False
-    if any(p.lower() in low for p in formulation.banned_claims):
-        return False
-    return True
+    return get_matcher(formulation).is_clean(text)
@@ -0,0 +1,129 @@
+# orchestrator/dedup.py
+"""
+Near-duplicate claim detection with character shingles, MinHash and LSH banding.
+Catches trivial variants (punctuation, casing, reordered words) that exact-match
+de-dupe lets through, in well under a millisecond per lookup.
+"""
+
+import random
+import re
+import struct
+import zlib
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_K = 3
+DEFAULT_THRESHOLD = 0.7
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)  # fixed seed: signatures must be stable across runs
+_PERMS: List[Tuple[int, int]] = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize_claim(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+
+def shingles(text: str, k: int = SHINGLE_K) -> FrozenSet[int]:
+    """Hashed character k-grams of each padded token; word order does not matter."""
+    out = set()
+    for tok in normalize_claim(text).split():
+        padded = f" {tok} "
+        if len(padded) <= k:
+            out.add(zlib.crc32(padded.encode("utf-8")))
+            continue
+        for i in range(len(padded) - k + 1):
+            out.add(zlib.crc32(padded[i:i + k].encode("utf-8")))
+    return frozenset(out)
+
+
+def minhash_signature(shingle_set: Iterable[int]) -> Tuple[int, ...]:
+    values = list(shingle_set)
+    if not values:
+        return tuple([0] * NUM_PERM)
+    return tuple(min((a * x + b) % _PRIME for x in values) for a, b in _PERMS)
+
+
+def band_keys(signature: Tuple[int, ...]) -> List[int]:
+    """One hash per LSH band; equal band keys make two claims candidates."""
+    return [zlib.crc32(struct.pack(f">B{ROWS}Q", band, *signature[band * ROWS:(band + 1) * ROWS])) | (band << 32)
+            for band in range(BANDS)]
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / float(len(a | b) or 1)
+
+
+class NearDuplicateIndex:
+    """In-memory near-duplicate index shared across a run.
+    An optional `history` (anything with find(text)) is consulted after the in-memory index,
+    e.g. a ClaimHistory of previously delivered claims.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, history=None):
+        self.threshold = threshold
+        self.history = history
+        self._exact: Dict[str, str] = {}
+        self._shingles: List[FrozenSet[int]] = []
+        self._texts: List[str] = []
+        self._buckets: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def find(self, text: str) -> Optional[str]:
+        """Return the previously indexed claim that `text` duplicates, if any."""
+        norm = normalize_claim(text)
+        if not norm:
+            return None
+        if norm in self._exact:
+            return self._exact[norm]
+        sh = shingles(text)
+        seen = set()
+        for key in band_keys(minhash_signature(sh)):
+            for idx in self._buckets.get(key, ()):
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                if jaccard(sh, self._shingles[idx]) >= self.threshold:
+                    return self._texts[idx]
+        if self.history is not None:
+            return self.history.find(text)
+        return None
+
+    def add(self, text: str) -> bool:
+        """Index `text` unless it duplicates an existing claim. Returns True if added."""
+        norm = normalize_claim(text)
+        if not norm or self.find(text) is not None:
+            return False
+        sh = shingles(text)
+        idx = len(self._texts)
+        self._texts.append(text)
+        self._shingles.append(sh)
+        self._exact[norm] = text
+        for key in band_keys(minhash_signature(sh)):
+            self._buckets.setdefault(key, []).append(idx)
+        return True
+
+
+def seed_from_recent_jobs(index: NearDuplicateIndex, brand_name: str, out_dir: str = "out", limit: int = 20) -> int:
+    """Add claims/headlines from a brand's most recent jobs in the job store. Returns jobs read."""
+    if limit <= 0:
+        return 0
+    from .storage import get_job_store
+    store = get_job_store(out_dir)
+    headers = store.list_jobs(brand=brand_name, limit=limit)
+    for header in headers:
+        for v in store.get_variants(header["job_id"]):
+            for key in ("claim", "#HEADLINE", "headline"):
+                val = v.get(key)
+                if isinstance(val, str) and val.strip():
+                    index.add(val)
+    return len(headers)
@@ -0,0 +1,63 @@
+# orchestrator/field_limits.py
+"""
+Template field limit helpers shared by batch expansion and post-generation repair.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from .template_requirements import precompiled
+
+
+def element_limits(template_requirements: Dict[str, Any]) -> Dict[str, int]:
+    """Return {element_name: max_chars} for a template requirements dict."""
+    compiled = precompiled(template_requirements)
+    if compiled is not None:
+        return dict(compiled["char_limits"])
+    limits: Dict[str, int] = {}
+    for el in (template_requirements or {}).get("elements", []) or []:
+        name = el.get("name")
+        if name:
+            limits[name] = int(el.get("max_chars", 100) or 100)
+    return limits
+
+
+def item_violations(item: Dict[str, Any], limits: Dict[str, int]) -> List[str]:
+    """Names of fields that are missing, empty or over their character limit."""
+    bad: List[str] = []
+    for name, max_chars in limits.items():
+        val = item.get(name)
+        if not isinstance(val, str) or not val.strip() or len(val.strip()) > max_chars:
+            bad.append(name)
+    return bad
+
+
+def canonicalize_fields(item: Dict[str, Any], names: List[str]) -> Dict[str, Any]:
+    """Copy '#HEADLINE'-style values from 'headline'/'#headline' spellings onto the element name."""
+    for name in names:
+        if not item.get(name):
+            alt = item.get(name.lower()) or item.get(name.strip('#').lower())
+            if alt:
+                item[name] = alt
+    return item
+
+
+def find_limit_violations(items: List[Dict[str, Any]], template_requirements: Dict[str, Any]) -> List[Tuple[int, str, int]]:
+    """One pass over every field of every item.
+    Returns (item_index, field_name, max_chars) for fields that are empty or over their limit.
+    """
+    limits = element_limits(template_requirements)
+    out: List[Tuple[int, str, int]] = []
+    for idx, item in enumerate(items):
+        canonicalize_fields(item, list(limits.keys()))
+        for name in item_violations(item, limits):
+            out.append((idx, name, limits[name]))
+    return out
+
+
+def trim_to_limit(text: str, max_chars: int) -> str:
+    """Last-resort trim at a word boundary so a field never exceeds max_chars."""
+    text = (text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars + 1].rsplit(" ", 1)[0] if " " in text[:max_chars + 1] else text[:max_chars]
+    return cut[:max_chars].rstrip(" ,;:—-")
@@ -0,0 +1,164 @@
+# orchestrator/headline_rewrite.py
+"""
+Deterministic headline rewriting for overused verbs (elevate, unlock, discover, ...).
+Tried before any LLM rewrite; returns None when a headline cannot be fixed locally.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Default substitutes per banned verb (base forms), best first
+VERB_SUBSTITUTES: Dict[str, List[str]] = {
+    "elevate": ["lift", "raise", "refine", "upgrade"],
+    "unlock": ["open", "claim", "reach", "find"],
+    "discover": ["meet", "find", "try", "see"],
+    "transform": ["renew", "reshape", "refresh", "change"],
+    "reveal": ["show", "uncover", "bring"],
+    "experience": ["feel", "enjoy", "try", "savor"],
+    "boost": ["lift", "fuel", "power", "support"],
+}
+
+BANNED_HEADLINE_VERBS: List[str] = list(VERB_SUBSTITUTES.keys())
+
+# Noun/adjective forms that also trip the banned-verb check
+DERIVED_SUBSTITUTES: Dict[str, List[str]] = {
+    "experience": ["ritual", "moment", "feeling"],
+    "experiences": ["rituals", "moments"],
+    "boost": ["lift"],
+    "boosts": ["lifts"],
+    "transformation": ["change", "renewal"],
+    "transformations": ["changes"],
+    "transformative": ["renewing", "refreshing"],
+    "discovery": ["find"],
+    "discoveries": ["finds"],
+    "revelation": ["surprise"],
+    "elevation": ["lift"],
+}
+
+# Lexicon words that can stand in for a verb when a brand prefers them
+VERB_LIKE = {
+    w for subs in VERB_SUBSTITUTES.values() for w in subs
+} | {
+    "nourish", "support", "restore", "glow", "balance", "calm", "soothe", "strengthen",
+    "brighten", "smooth", "hydrate", "replenish", "fuel", "feed", "care", "renew", "refresh",
+}
+
+IRREGULAR_PAST = {"find": "found", "feel": "felt", "meet": "met", "see": "seen", "bring": "brought", "feed": "fed"}
+
+DETERMINERS = {"the", "a", "an", "your", "our", "this", "that", "every", "each", "their", "my", "its"}
+
+LEADING_PHRASES = [
+    (re.compile(r"^(discover|experience|unlock|reveal)\s+how\b", re.I), "See how"),
+    (re.compile(r"^(discover|experience|unlock|reveal)\s+why\b", re.I), "See why"),
+    (re.compile(r"^(discover|experience|unlock|reveal)\s+what\b", re.I), "See what"),
+]
+
+def _inflect(base: str, form: str) -> str:
+    """Inflect a base verb into the form ('', 's', 'ed', 'ing') of the word it replaces."""
+    if form == "":
+        return base
+    if form == "s":
+        if base.endswith("y") and base[-2:-1] not in "aeiou":
+            return base[:-1] + "ies"
+        if base.endswith(("s", "sh", "ch", "x")):
+            return base + "es"
+        return base + "s"
+    if form == "ed":
+        if base in IRREGULAR_PAST:
+            return IRREGULAR_PAST[base]
+        if base.endswith("e"):
+            return base + "d"
+        if base.endswith("y") and base[-2:-1] not in "aeiou":
+            return base[:-1] + "ied"
+        return base + "ed"
+    if form == "ing":
+        if base.endswith("e") and not base.endswith("ee"):
+            return base[:-1] + "ing"
+        return base + "ing"
+    return base
+
+
+def _verb_form(word: str, verb: str) -> Optional[str]:
+    """Return the inflection of `verb` that `word` uses, or None if it is not a form of it."""
+    low = word.lower()
+    stem = verb[:-1] if verb.endswith("e") else verb
+    if low == verb:
+        return ""
+    if low == verb + "s":
+        return "s"
+    if low in (verb + "d", verb + "ed"):
+        return "ed"
+    if low == stem + "ing":
+        return "ing"
+    return None
+
+
+def _match_case(template: str, word: str) -> str:
+    if template.isupper() and len(template) > 1:
+        return word.upper()
+    if template[:1].isupper():
+        return word[:1].upper() + word[1:]
+    return word
+
+
+def _needs_rewrite(text: str, banned: Iterable[str]) -> bool:
+    lower = (text or "").lower()
+    return any(w in lower for w in banned)
+
+
+def rewrite_headline_locally(text: str, prefer: Iterable[str] = None, avoid: Iterable[str] = None,
+                             max_chars: int = None) -> Optional[str]:
+    """
+    Swap banned verbs (and their noun forms) for substitutes, preferring verbs from the
+    brand lexicon `prefer` list and choosing the candidate closest to the original length.
+    Returns the rewritten headline, or None if it still needs an LLM rewrite.
+    """
+    if not text:
+        return None
+    banned = BANNED_HEADLINE_VERBS
+    avoid_set = {a.lower() for a in (avoid or []) if isinstance(a, str)}
+    brand_verbs = [w.strip().lower() for w in (prefer or [])
+                   if isinstance(w, str) and w.strip().lower() in VERB_LIKE]
+
+    out = text.strip()
+    for pattern, replacement in LEADING_PHRASES:
+        out = pattern.sub(replacement, out, count=1)
+
+    tokens = re.split(r"(\W+)", out)
+    present = {t.lower() for t in tokens if t and t[0].isalpha()}
+    for i, tok in enumerate(tokens):
+        if not tok or not tok[0].isalpha():
+            continue
+        low = tok.lower()
+        prev_word = next((t.lower() for t in reversed(tokens[:i]) if t and t[0].isalpha()), "")
+        candidates: List[str] = []
+        preferred: set = set()
+        if low in DERIVED_SUBSTITUTES and (low not in VERB_SUBSTITUTES or prev_word in DETERMINERS):
+            # Noun use ("the experience", "a boost") or a derived noun/adjective
+            candidates = list(DERIVED_SUBSTITUTES[low])
+        else:
+            for verb, subs in VERB_SUBSTITUTES.items():
+                form = _verb_form(low, verb)
+                if form is None:
+                    continue
+                bases = brand_verbs + [s for s in subs if s not in brand_verbs]
+                candidates = [_inflect(b, form) for b in bases if b != verb]
+                preferred = {_inflect(b, form) for b in brand_verbs}
+                break
+        # Skip substitutes the brand avoids or that would repeat a word already in the line
+        candidates = [c for c in candidates
+                      if c.lower() not in avoid_set and c.lower() not in present and not _needs_rewrite(c, banned)]
+        if not candidates:
+            continue
+        # Brand-preferred verbs win when they stay within a few characters of the
+        # original word; otherwise keep the line length as close as possible
+        best = min(candidates, key=lambda c: (abs(len(c) - len(tok)) > 3, c not in preferred,
+                                              abs(len(c) - len(tok)), candidates.index(c)))
+        tokens[i] = _match_case(tok, best)
+
+    result = "".join(tokens)
+    if _needs_rewrite(result, banned):
+        return None
+    if max_chars and len(result) > max_chars:
+        return None
+    return result
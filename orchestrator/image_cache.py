@@ -0,0 +1,174 @@
+# orchestrator/image_cache.py
+"""
+Resized image derivatives for the plugin.
+A derivative is keyed by the source file's content hash, the target size, fit and
+format, generated once (Pillow, imported lazily) and kept in a size-bounded disk
+cache; least recently used derivatives are evicted first.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "out/image_cache")
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+MAX_DIMENSION = 4096
+
+FORMATS = {"jpeg": ("JPEG", ".jpg", "image/jpeg"),
+           "png": ("PNG", ".png", "image/png"),
+           "webp": ("WEBP", ".webp", "image/webp")}
+FITS = ("cover", "contain")
+
+
+def _pil():
+    try:
+        from PIL import Image, ImageOps
+        return Image, ImageOps
+    except ImportError:
+        return None
+
+
+def available() -> bool:
+    return _pil() is not None
+
+
+# (path, mtime_ns, size) -> content hash; least recently used entries are dropped past the cap
+_SOURCE_HASHES: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_SOURCE_HASHES_MAX = int(os.getenv("IMAGE_SOURCE_HASH_ENTRIES", "4096"))
+_SOURCE_HASHES_LOCK = threading.Lock()
+
+
+def source_hash(path: str) -> str:
+    """Content hash of a source image, cached until its mtime/size change."""
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _SOURCE_HASHES_LOCK:
+        digest = _SOURCE_HASHES.get(key)
+        if digest is not None:
+            _SOURCE_HASHES.move_to_end(key)
+            return digest
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _SOURCE_HASHES_LOCK:
+        _SOURCE_HASHES[key] = digest
+        while len(_SOURCE_HASHES) > _SOURCE_HASHES_MAX:
+            _SOURCE_HASHES.popitem(last=False)
+    return digest
+
+
+def _has_alpha(img) -> bool:
+    return img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _render(src: str, base: Path, width: int, height: int, fit: str, fmt: str) -> Path:
+    """Write the derivative next to `base` (extension from the resolved format) and return its path."""
+    Image, ImageOps = _pil()
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img)
+        if fmt == "auto":
+            fmt = "png" if _has_alpha(img) else "jpeg"
+        if fit == "cover":
+            # Never upscale: shrink the target box (same aspect) to fit inside the source
+            scale = max(width / img.width, height / img.height)
+            if scale > 1:
+                width, height = max(1, round(width / scale)), max(1, round(height / scale))
+            img = ImageOps.fit(img, (width, height), method=Image.LANCZOS)
+        else:
+            img = img.copy()
+            img.thumbnail((width, height), Image.LANCZOS)
+        pil_format, ext, _ = FORMATS[fmt]
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        options = {"quality": JPEG_QUALITY, "optimize": True} if pil_format in ("JPEG", "WEBP") else {"optimize": True}
+        dest = base.with_suffix(ext)
+        tmp = base.with_name(f"{base.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        img.save(tmp, pil_format, **options)
+        os.replace(tmp, dest)
+        return dest
+
+
+class DerivativeCache:
+    """Disk cache of derivatives with LRU eviction (access time = file mtime, touched on hit)."""
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(32)]
+        self._total: Optional[int] = None
+
+    def _scan_total(self) -> int:
+        if self._total is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._total = sum(p.stat().st_size for p in self.dir.iterdir() if p.is_file() and not p.name.endswith(".tmp"))
+        return self._total
+
+    def get(self, src: str, width: int, height: int, fit: str = "cover", fmt: str = "auto") -> Tuple[Path, str, str]:
+        """Path, content type and strong ETag of the derivative, generating it on a miss."""
+        width, height = min(int(width), MAX_DIMENSION), min(int(height), MAX_DIMENSION)
+        if width < 1 or height < 1:
+            raise ValueError("width and height must be positive")
+        if fit not in FITS:
+            raise ValueError(f"fit must be one of {FITS}")
+        if fmt != "auto" and fmt not in FORMATS:
+            raise ValueError(f"format must be auto or one of {tuple(FORMATS)}")
+        key = hashlib.sha1(f"{source_hash(src)}:{width}x{height}:{fit}:{fmt}:{JPEG_QUALITY}".encode()).hexdigest()[:24]
+
+        # Striped lock: concurrent requests for the same derivative render it once
+        with self._stripes[int(key[:8], 16) % len(self._stripes)]:
+            hit = self._find(key)
+            if hit:
+                os.utime(hit)
+            else:
+                self.dir.mkdir(parents=True, exist_ok=True)
+                hit = _render(src, self.dir / key, width, height, fit, fmt)
+                self._added(hit.stat().st_size)
+        ctype = next(c for _, e, c in FORMATS.values() if e == hit.suffix)
+        return hit, ctype, f'"{key}"'
+
+    def _find(self, key: str) -> Optional[Path]:
+        for _, ext, _ in FORMATS.values():
+            p = self.dir / (key + ext)
+            if p.exists():
+                return p
+        return None
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._total is None:
+                self._scan_total()  # first scan already includes the new file
+            else:
+                self._total += size
+            if self._total <= self.max_bytes:
+                return
+            files = sorted((p for p in self.dir.iterdir() if p.is_file() and not p.name.endswith(".tmp")),
+                           key=lambda p: p.stat().st_mtime)
+            # Evict down to 90% so we do not rescan on every insert
+            for p in files:
+                if self._total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    size = p.stat().st_size
+                    p.unlink()
+                    self._total -= size
+                except OSError:
+                    pass
+
+
+_CACHE: Optional[DerivativeCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_derivative_cache() -> DerivativeCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = DerivativeCache()
+        return _CACHE
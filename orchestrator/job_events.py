@@ -0,0 +1,108 @@
+# orchestrator/job_events.py
+"""
+Per-job event log for completion/progress notifications.
+Each job gets an append-only out/events/<job_id>.jsonl; the writer (and the claims
+API, which runs main.py in a subprocess) append one JSON line per state change or
+batch of new variants. An event's sequence number is its line number, so clients
+resume with "give me everything after N" (long-poll) or Last-Event-ID (SSE).
+
+Event types: queued, running, started, variants, completed, failed.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+EVENTS_DIR = os.getenv("JOB_EVENTS_DIR", "out/events")
+TERMINAL = ("completed", "failed")
+
+_LOCK = threading.Lock()
+
+
+def events_enabled() -> bool:
+    return os.getenv("JOB_EVENTS", "true").lower() in ("1", "true", "yes")
+
+
+def events_path(job_id: str) -> Path:
+    return Path(EVENTS_DIR) / f"{job_id}.jsonl"
+
+
+def publish(job_id: str, event_type: str, **data: Any):
+    """Append one event. A single O_APPEND write per line keeps concurrent publishers from interleaving."""
+    if not job_id or not events_enabled():
+        return
+    line = json.dumps(dict(data, type=event_type, job_id=job_id, ts=time.time()),
+                      ensure_ascii=False, separators=(",", ":")) + "\n"
+    path = events_path(job_id)
+    try:
+        with _LOCK:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+    except OSError as e:
+        print(f"[IAG] Could not publish {event_type} event for job {job_id}: {e}", flush=True)
+
+
+def read_events(job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+    """Events with seq > after (seq is 1-based). A trailing partial line is left for the next read."""
+    try:
+        with open(events_path(job_id), "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+    except FileNotFoundError:
+        return []
+    events = []
+    for seq, line in enumerate(lines[:-1], start=1):  # last element: "" or a partial line
+        if seq <= after or not line:
+            continue
+        try:
+            events.append(dict(json.loads(line), seq=seq))
+        except ValueError:
+            break
+    return events
+
+
+def is_done(events: List[Dict[str, Any]]) -> bool:
+    return any(e.get("type") in TERMINAL for e in events)
+
+
+def wait_for_events(job_id: str, after: int = 0, timeout: float = 25.0, interval: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Long-poll: block until there are events after `after` or the timeout passes.
+    Watches the file's size server-side, so the client makes one request per change.
+    """
+    deadline = time.monotonic() + timeout
+    path = events_path(job_id)
+    last_size = -1
+    while True:
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size != last_size:
+            last_size = size
+            events = read_events(job_id, after)
+            if events:
+                return events
+        if time.monotonic() >= deadline:
+            return []
+        time.sleep(interval)
+
+
+def follow_events(job_id: str, after: int = 0, heartbeat: float = 15.0) -> Iterator[Dict[str, Any]]:
+    """Yield events as they are published (None on idle heartbeats) until a terminal event."""
+    while True:
+        events = wait_for_events(job_id, after, timeout=heartbeat)
+        if not events:
+            yield None
+            continue
+        for event in events:
+            yield event
+        after = events[-1]["seq"]
+        if is_done(events):
+            return
@@ -0,0 +1,74 @@
+# orchestrator/job_schema.py
+"""
+Job file schema versions.
+
+v1: every variant repeats logo_url, palette, the typography dict and template_name.
+v2: those live once in the job header ("brand_assets", "typography", "template_name");
+    a variant only carries them when it overrides the job-level value.
+
+expand_job()/expand_variant() turn a v2 job back into the v1 shape for older readers.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+SCHEMA_VERSION = 2
+
+# variant key -> (header block, key inside the block; None = the block itself)
+SHARED_FIELDS = {
+    "logo_url": ("brand_assets", "logo_url"),
+    "palette": ("brand_assets", "palette"),
+    "type": ("typography", None),
+    "template_name": ("template_name", None),
+}
+
+
+def schema_version() -> int:
+    """Schema for newly written jobs (JOB_SCHEMA_VERSION=1 keeps the legacy layout)."""
+    return 1 if os.getenv("JOB_SCHEMA_VERSION", str(SCHEMA_VERSION)) == "1" else SCHEMA_VERSION
+
+
+def job_defaults(brand: Dict[str, Any], typography: Dict[str, Any], template_name: Optional[str]) -> Dict[str, Any]:
+    """Header blocks shared by every variant of a job."""
+    return {
+        "brand_assets": {"logo_url": brand.get("logo_url"), "palette": brand.get("palette")},
+        "typography": dict(typography or {}),
+        "template_name": template_name,
+    }
+
+
+def _shared_value(header: Dict[str, Any], key: str) -> Any:
+    block, sub = SHARED_FIELDS[key]
+    value = header.get(block)
+    if sub is not None:
+        value = (value or {}).get(sub) if isinstance(value, dict) else None
+    return value
+
+
+def normalize_variant(variant: Dict[str, Any], header: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop shared fields that equal the job-level value (anything different stays as an override)."""
+    return {k: v for k, v in variant.items()
+            if not (k in SHARED_FIELDS and v == _shared_value(header, k))}
+
+
+def expand_variant(variant: Dict[str, Any], header: Dict[str, Any]) -> Dict[str, Any]:
+    """v1-shaped variant: job-level values filled in where the variant has no override."""
+    if header.get("schema_version", 1) < 2:
+        return variant
+    out = dict(variant)
+    for key in SHARED_FIELDS:
+        if key not in out:
+            value = _shared_value(header, key)
+            if value is not None:
+                out[key] = dict(value) if isinstance(value, dict) else value
+    return out
+
+
+def expand_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """v1-shaped copy of any job (v1 jobs are returned unchanged)."""
+    if not job or job.get("schema_version", 1) < 2:
+        return job
+    header = {k: v for k, v in job.items() if k != "variants"}
+    out = {k: v for k, v in header.items() if k not in ("schema_version", "brand_assets", "typography", "template_name")}
+    out["variants"] = [expand_variant(v, header) for v in job.get("variants") or []]
+    return out
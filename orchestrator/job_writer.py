@@ -0,0 +1,152 @@
+# orchestrator/job_writer.py
+"""
+Incremental job writer.
+Variants are appended as they are built instead of being collected and dumped at
+the end, so memory stays flat for very large jobs and readers can consume a job
+while it is still being written.
+
+On-disk layout (compact, one record per line, still a valid JSON document once closed):
+
+    {"job_id":"ab12cd34","brand":"Metra",...,"variants":[
+    {"id":"...",...}
+    ,{"id":"...",...}
+    ]}
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .job_events import publish
+from .job_schema import normalize_variant, schema_version
+from .storage import JobStore, get_job_store, new_job
+
+_COMPACT = (",", ":")
+_TRAILER = "]}"
+_FAILED_TRAILER = '],"failed":true}'
+
+
+class JobWriter:
+    """Streams one job's variants to the job store and its out/<job_id>.json file."""
+
+    def __init__(self, brand_name: str, product_name: str, fmt: str, out_dir: str = "out",
+                 store: JobStore = None, batch_size: int = None, defaults: Dict[str, Any] = None,
+                 job_id: str = None, **extra: Any):
+        """`defaults` (see job_schema.job_defaults) makes this a v2 job: the shared
+        brand assets/typography/template go in the header and variants carry only overrides.
+        `job_id` lets a caller (the claims API) choose the id up front to subscribe to its events."""
+        self.store = store or get_job_store(out_dir)
+        self.header = new_job([], brand_name, product_name, fmt)
+        del self.header["variants"]
+        self.normalized = bool(defaults) and schema_version() >= 2
+        if self.normalized:
+            self.header["schema_version"] = schema_version()
+            self.header.update(defaults)
+        self.header.update(extra)
+        if job_id:
+            self.header["job_id"] = job_id
+        self.job_id = self.header["job_id"]
+        self.count = 0
+        self.batch_size = batch_size or int(os.getenv("JOB_WRITE_BATCH", "50"))
+        self._pending: List[Dict[str, Any]] = []
+        self._closed = False
+        self._fh = None
+        mirror_dir = getattr(self.store, "mirror_dir", None)
+        if mirror_dir:
+            Path(mirror_dir).mkdir(parents=True, exist_ok=True)
+            self.path: Optional[Path] = Path(mirror_dir) / f"{self.job_id}.json"
+            self._fh = open(self.path, "w", encoding="utf-8")
+            head = json.dumps(self.header, ensure_ascii=False, separators=_COMPACT)
+            self._fh.write(head[:-1] + ',"variants":[\n')
+            self._fh.flush()
+        else:
+            self.path = None
+        self.store.begin_job(self.header)
+        publish(self.job_id, "started", brand=brand_name, template_name=self.header.get("template_name"))
+
+    def __enter__(self) -> "JobWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(failed=exc_type is not None)
+
+    def write(self, variant: Dict[str, Any]):
+        if self.normalized:
+            variant = normalize_variant(variant, self.header)
+        self._pending.append(variant)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, variants: Iterable[Dict[str, Any]]):
+        for v in variants:
+            self.write(v)
+
+    def flush(self):
+        """Push buffered variants to the store and the file (visible to partial readers)."""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self.store.append_variants(self.job_id, self.count, batch)
+        if self._fh:
+            lines = []
+            for i, v in enumerate(batch):
+                sep = "," if self.count + i else ""
+                lines.append(sep + json.dumps(v, ensure_ascii=False, separators=_COMPACT) + "\n")
+            self._fh.write("".join(lines))
+            self._fh.flush()
+        publish(self.job_id, "variants", start=self.count, count=len(batch), total=self.count + len(batch))
+        self.count += len(batch)
+
+    def close(self, failed: bool = False) -> Dict[str, Any]:
+        """
+        Finish the job; returns its header with variant_count.
+        `failed` (set when the writer's `with` block raises) still terminates the file as
+        valid JSON and completes the store row, flagged "failed": true, so the partial
+        job can be read, re-templated and archived like any other.
+        """
+        if not self._closed:
+            try:
+                self.flush()
+            except Exception:
+                if not failed:
+                    raise  # __exit__ comes back here with failed=True
+                print(f"[IAG] Could not flush the last variants of failed job {self.job_id}", flush=True)
+            self._closed = True
+            if self._fh:
+                self._fh.write(_FAILED_TRAILER if failed else _TRAILER)
+                self._fh.close()
+            self.store.finish_job(self.job_id, self.count, failed=failed)
+            publish(self.job_id, "failed" if failed else "completed", variant_count=self.count)
+        header = dict(self.header, variant_count=self.count)
+        if failed:
+            header["failed"] = True
+        return header
+
+
+def read_partial_job(path: str) -> Dict[str, Any]:
+    """
+    Read a job file that may still be being written. Returns the job with the
+    variants complete so far and "complete": True/False. Works for finished
+    files in any JSON layout as well.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    try:
+        job = json.loads(text)
+        job["complete"] = True
+        return job
+    except ValueError:
+        pass
+    lines = text.split("\n")
+    job = json.loads(lines[0] + _TRAILER)
+    for line in lines[1:]:
+        line = line.strip()
+        if not line or line == _TRAILER:
+            continue
+        try:
+            job["variants"].append(json.loads(line.lstrip(",")))
+        except ValueError:
+            # Last line may be mid-write
+            break
+    job["complete"] = False
+    return job
@@ -1,8 +1,21 @@
+import os
+import threading
+import time
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 
 SUPPORTED_EXTS = {".txt", ".md", ".markdown", ".json"}
 
+GLOBAL_KNOWLEDGE_DIR = Path("inputs/ad_KnowledgeBase/creative_examples")
+
+# (brand, brand_chars, global_chars) -> (dir signature, text)
+_KNOWLEDGE_CACHE: Dict[Tuple[str, int, int], Tuple[Tuple, str]] = {}
+_CACHE_LOCK = threading.Lock()
+
+# brand -> (monotonic time taken, signature); rescanned at most every KNOWLEDGE_SIGNATURE_TTL seconds
+_SIGNATURES: Dict[str, Tuple[float, Tuple]] = {}
+SIGNATURE_TTL = float(os.getenv("KNOWLEDGE_SIGNATURE_TTL", "5"))
+
 
 def _safe_read_text(path: Path, max_chars: int) -> str:
     try:
@@ -37,6 +50,34 @@ def _collect_from_dir(dir_path: Path, remaining: int) -> str:
     return "".join(chunks)
 
 
+def knowledge_signature(brand_name: str) -> Tuple:
+    """
+    Change marker for the knowledge folders (supported file paths, mtimes and sizes).
+    It sits on the prompt-cache hot path, so the folder scan is memoized per brand
+    for SIGNATURE_TTL seconds; an edit is picked up within that window.
+    """
+    now = time.monotonic()
+    cached = _SIGNATURES.get(brand_name)
+    if cached and now - cached[0] < SIGNATURE_TTL:
+        return cached[1]
+    sig = _scan_signature(brand_name)
+    with _CACHE_LOCK:
+        _SIGNATURES[brand_name] = (now, sig)
+    return sig
+
+
+def _scan_signature(brand_name: str) -> Tuple:
+    sig = []
+    for dir_path in (Path(f"inputs/{brand_name}/knowledge/creative_assets"), GLOBAL_KNOWLEDGE_DIR):
+        if not dir_path.is_dir():
+            continue
+        for file_path in sorted(dir_path.glob("**/*")):
+            if file_path.suffix.lower() in SUPPORTED_EXTS and file_path.is_file():
+                st = file_path.stat()
+                sig.append((str(file_path), st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
 def load_knowledge_texts(brand_name: str, brand_chars: int = 3000, global_chars: int = 3000) -> str:
     """
     Aggregate lightweight reference text from:
@@ -44,11 +85,24 @@ def load_knowledge_texts(brand_name: str, brand_chars: int = 3000, global_chars:
     - Brand: inputs/{brand}/knowledge/creative_assets
 
     Character budgets are provided independently for brand and global.
+    Results are memoized until a knowledge file is added, removed or modified.
     """
+    key = (brand_name, int(brand_chars), int(global_chars))
+    sig = knowledge_signature(brand_name)
+    cached = _KNOWLEDGE_CACHE.get(key)
+    if cached and cached[0] == sig:
+        return cached[1]
+    text = _load_knowledge_texts(brand_name, brand_chars, global_chars)
+    with _CACHE_LOCK:
+        _KNOWLEDGE_CACHE[key] = (sig, text)
+    return text
+
+
+def _load_knowledge_texts(brand_name: str, brand_chars: int, global_chars: int) -> str:
     brand_budget = max(0, int(brand_chars))
     global_budget = max(0, int(global_chars))
 
-    global_dir = Path("inputs/ad_KnowledgeBase/creative_examples")
+    global_dir = GLOBAL_KNOWLEDGE_DIR
     brand_dir = Path(f"inputs/{brand_name}/knowledge/creative_assets")
 
     out_parts: List[str] = []
@@ -3,86 +3,22 @@ from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv(Path(__file__).resolve().parents[1] / ".env", override=True)
 
-import json, uuid, sys, traceback, os
-from typing import Dict, Any, List
-
-from orchestrator.storage import save_job
+import json, uuid, sys, traceback, os, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable
+
+from orchestrator.job_writer import JobWriter
+from orchestrator.job_schema import job_defaults
+from orchestrator.retention import apply_retention
+from orchestrator.brand_bundle import load_brand_bundle
+from orchestrator.dedup import NearDuplicateIndex, seed_from_recent_jobs
+from orchestrator.claim_history import ClaimHistory, history_enabled
+from orchestrator.compliance import get_matcher
+from orchestrator.pipeline import ComplianceStage
 
 def load_json(p: str) -> Dict[str, Any]:
     return json.load(open(p, "r", encoding="utf-8"))
 
-def _split_family_and_style(raw: str):
-    """Split a font string like 'Inter Bold' -> ('Inter', 'Bold').
-    If only family provided, default style to 'Regular'.
-    Accepts 'Semi Bold' and other spaced styles.
-    """
-    if not raw:
-        return (None, None)
-    value = str(raw).strip()
-    # Known styles, longer first
-    known_styles = [
-        "Extra Black", "ExtraBold", "Extra Bold",
-        "SemiBold", "Semi Bold", "DemiBold", "Demi Bold",
-        "Black", "Bold", "Medium", "Light", "Thin", "Regular", "Book", "Roman"
-    ]
-    # Try exact suffix match
-    for style in known_styles:
-        if value.lower().endswith(style.lower()):
-            family = value[:-len(style)].strip()
-            # Normalize style spacing (e.g., 'Semi Bold' -> 'SemiBold')
-            normalized_style = style.replace(" ", "") if style in ["Semi Bold", "Demi Bold", "Extra Bold", "Extra Black"] else style
-            return (family or value, normalized_style)
-    # Fallback: only treat last token as style if it's a known style token
-    parts = value.split()
-    if len(parts) > 1:
-        last_token = parts[-1]
-        if last_token.lower() in [s.lower() for s in known_styles]:
-            return (" ".join(parts[:-1]).strip(), last_token)
-        # Otherwise, the entire value is the family; default style Regular
-        return (value, "Regular")
-    return (value, "Regular")
-
-def _load_brand_txt_fonts(brand_folder: Path) -> Dict[str, str]:
-    """Parse brand font overrides from text files.
-    Looks for:
-      - inputs/{brand}/brand.txt
-      - inputs/{brand}/brand_docs/brand.txt
-    Recognizes lines like 'Heading Font: FreightDisp Pro' or 'Body Copy Font: Parabolica'.
-    Returns keys: heading_font, body_font, cta_font.
-    Later files override earlier ones.
-    """
-    result: Dict[str, str] = {}
-    candidates = [
-        brand_folder / "brand.txt",
-        brand_folder / "brand_docs" / "brand.txt",
-    ]
-
-    def apply_from_text(text: str):
-        nonlocal result
-        for raw_line in text.splitlines():
-            lower = raw_line.strip().lower()
-            if not lower:
-                continue
-            val = raw_line.split(":", 1)[1].strip() if ":" in raw_line else None
-            heading_keys = ["heading font", "headline font", "heading_typography", "headline", "title", "heading"]
-            body_keys    = ["body copy font", "body font", "body_typography", "body copy", "body"]
-            cta_keys     = ["cta font", "cta_typography", "cta", "button font", "button"]
-            if any(k in lower for k in heading_keys) and val:
-                result["heading_font"] = val
-            elif any(k in lower for k in body_keys) and val:
-                result["body_font"] = val
-            elif any(k in lower for k in cta_keys) and val:
-                result["cta_font"] = val
-
-    for path in candidates:
-        try:
-            if path.exists():
-                apply_from_text(path.read_text(encoding="utf-8", errors="ignore"))
-        except Exception:
-            continue
-
-    return result
-
 # ---- Fallback claim helpers
 def _fallback_claims_from_brand(brand: Dict[str, Any]) -> List[str]:
     """Generate safe, brand-appropriate fallback lines when LLM output is empty.
@@ -113,11 +49,194 @@ def _fallback_claims_from_brand(brand: Dict[str, Any]) -> List[str]:
             out.append(l)
     return out
 
+def _generate_claims_with_topup(cfg: Dict[str, Any], n: int, style: str, template_requirements: Dict[str, Any],
+                                dedup_index: NearDuplicateIndex,
+                                on_batch: Callable[[List[Dict[str, Any]]], int] = None,
+                                avoid_claims: List[str] = None) -> List[Dict[str, Any]]:
+    """Generate n structured claims; when the model comes back short, ask only for the
+    missing count (with earlier claims as exclusions) until the count, the round
+    limit (TOPUP_MAX_ROUNDS) or the deadline (TOPUP_DEADLINE_S) is reached.
+    `on_batch` receives each round's new claims as soon as they arrive and returns how
+    many it kept (e.g. passed or queued for repair); only those count toward n."""
+    deadline = time.monotonic() + float(os.environ.get('TOPUP_DEADLINE_S', 90))
+    max_rounds = int(os.environ.get('TOPUP_MAX_ROUNDS', 3))
+    accepted: List[Dict[str, Any]] = []
+    kept = 0
+    rounds = 0
+    while kept < n:
+        missing = n - kept
+        if rounds > 0:
+            if rounds > max_rounds or time.monotonic() >= deadline:
+                print(f"[IAG] Top-up stopped with {missing} claims short", flush=True)
+                break
+            print(f"[IAG] Topping up {missing} missing claims (round {rounds})…", flush=True)
+        try:
+            angle_map = generate_claims_by_angle(cfg, target_per_angle=missing, style=style, template_requirements=template_requirements,
+                                                 dedup_index=dedup_index,
+                                                 exclude_claims=[it.get("claim") or it.get("text") or "" for it in accepted],
+                                                 avoid_claims=avoid_claims)
+        except Exception:
+            if not accepted:
+                raise
+            print("[IAG] Top-up round failed; keeping accepted claims", file=sys.stderr)
+            traceback.print_exc()
+            break
+        fresh = [it for items in angle_map.values() for it in items][:missing]
+        accepted.extend(fresh)
+        if fresh:
+            kept += on_batch(fresh) if on_batch else len(fresh)
+        rounds += 1
+        if not fresh and rounds > 1:
+            # Model has nothing new to offer; don't burn the rest of the budget
+            break
+    return accepted
+
+def _build_variants_for_item(item: Dict[str, Any], idx: int, tmpl_name: str, template_requirements: Dict[str, Any],
+                             template_variations: List[Any], template_variation: str,
+                             brand: Dict[str, Any], typography: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build the variant(s) for one structured claim: one per template variation, or a single variant."""
+    variants: List[Dict[str, Any]] = []
+    try:
+        # Build copy dict directly from structured claim item
+        copy = {}
+        if template_requirements and template_requirements.get("elements"):
+            for el in template_requirements.get("elements", []):
+                name = el.get("name")
+                if not name:
+                    continue
+                copy[name] = item.get(name) or item.get(name.lower()) or item.get(name.strip('#').lower()) or ""
+        else:
+            # headline-only fallback
+            copy["#HEADLINE"] = item.get("#HEADLINE") or item.get("headline") or (item.get("claim") or "")
+
+        # If we have template variations, create variants for each variation
+        if template_variations and len(template_variations) > 1:
+            # Create variants for each template variation (portrait, square, etc.)
+            for variation in template_variations:
+                # Create dynamic variant based on template requirements
+                variant = {
+                    "id": str(uuid.uuid4())[:8],
+                    "layout": f"{tmpl_name}-{variation.name}",
+                    "claim": item.get("claim") or "",
+                    "logo_url": brand["logo_url"],
+                    "palette": brand["palette"],
+                    "type": dict(typography),
+                    # Always set the template name we actually used
+                    "template_name": tmpl_name,
+                    "template_variation": variation.name,
+                    "aspect_ratio": variation.aspect_ratio,
+                    "dimensions": variation.dimensions
+                }
+                if item.get("style"):
+                    variant["style"] = item.get("style")
+
+                # Add all fields from copy (template-specific)
+                for key, value in copy.items():
+                    variant[key] = value
+
+                variants.append(variant)
+
+            print(f"[IAG] Created {len(template_variations)} variants for claim {idx + 1}", flush=True)
+        else:
+            # Standard single variant
+            variant = {
+                "id": str(uuid.uuid4())[:8],
+                "layout": tmpl_name,
+                "claim": item.get("claim") or "",
+                "logo_url": brand["logo_url"],
+                "palette": brand["palette"],
+                "type": dict(typography),
+                # Always set the template name we actually used
+                "template_name": tmpl_name,
+                "template_variation": template_variation,
+            }
+            if item.get("style"):
+                variant["style"] = item.get("style")
+
+            # Add all fields from copy (template-specific)
+            for key, value in copy.items():
+                variant[key] = value
+
+            variants.append(variant)
+
+    except Exception as e:
+        print("[IAG] Variant build error:", e, file=sys.stderr)
+        traceback.print_exc()
+    return variants
+
+def _template_context(template_name: str, template_variation: str):
+    """(requirements, variations) for one template; headline-only requirements when none are found."""
+    template_requirements = None
+    template_variations = []
+    try:
+        from orchestrator.templates import template_manager
+        template_requirements = template_manager.get_claims_requirements(template_name, template_variation)
+        
+        # Get all variations (portrait, square) for the selected version
+        if template_variation:
+            template_variations = template_manager.get_variations_by_version(template_name, template_variation)
+            print(f"[IAG] {template_name} version {template_variation} has {len(template_variations)} variations (portrait/square)", flush=True)
+        else:
+            # If no version specified, get all variations (objects: the variant builder reads .name etc.)
+            template = template_manager.get_template(template_name)
+            template_variations = list(template.variations) if template else []
+            print(f"[IAG] All {template_name} variations loaded: {len(template_variations)} total", flush=True)
+            
+        elems_count = len(template_requirements.get('elements', [])) if template_requirements else 0
+        print(f"[IAG] Template requirements loaded: {elems_count} elements", flush=True)
+    except ImportError:
+        print("[IAG] Template manager not available, proceeding without template requirements", flush=True)
+
+    # If a template was specified but we failed to load any requirements, use a safe headline-only fallback
+    if not template_requirements or not template_requirements.get('elements'):
+        print(f"[IAG] No requirements found for '{template_name}'. Using headline-only fallback (no CTA/value props).", flush=True)
+        template_requirements = {
+            "template_name": template_name,
+            "variation_name": template_variation or "01",
+            "elements": [
+                {"name": "#HEADLINE", "max_chars": 70, "description": "Primary headline"}
+            ],
+            "metadata": {"prompt_guidance": "Produce a single impactful headline only. No CTA or value props."}
+        }
+    return template_requirements, template_variations
+
+def _expand_fanout(brand: Dict[str, Any], strategy: Dict[str, Any], items: List[Dict[str, Any]],
+                   fanout: List[Any], matcher, use_llm: bool) -> List[List[Any]]:
+    """
+    Expand one batch of accepted claims into every fan-out template's fields, one template
+    per worker thread. Expanded copy is screened like the claims; violators get one batched
+    rewrite and are left out (None) if they still fail. Returns [template][item] -> fields or None.
+    """
+    claims = [it.get("claim") or it.get("headline") or "" for it in items]
+
+    def expand(requirements: Dict[str, Any]) -> List[Any]:
+        if not use_llm:
+            return [{} for _ in items]
+        rows = expand_copy_batch(brand, claims, strategy, requirements)
+        checker = ComplianceStage(matcher, fields=[el["name"] for el in requirements.get("elements", []) if el.get("name")])
+        flagged = [(pos, checker.violations(row)) for pos, row in enumerate(rows)]
+        flagged = [(pos, found) for pos, found in flagged if found]
+        if flagged:
+            try:
+                fixed = rewrite_noncompliant_batch(brand, strategy, [(rows[pos], found) for pos, found in flagged], requirements)
+            except Exception:
+                traceback.print_exc()
+                fixed = []
+            for k, (pos, _) in enumerate(flagged):
+                row = fixed[k] if k < len(fixed) else None
+                rows[pos] = row if row is not None and not checker.violations(row) else None
+        return rows
+
+    workers = max(1, min(len(fanout), int(os.environ.get('FANOUT_WORKERS', 4))))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="iag-fanout") as pool:
+        return list(pool.map(expand, [requirements for _, requirements, _ in fanout]))
+
 # ---- LLM availability (module scope, no rebinding inside main)
 HAS_LLM = False
 try:
     # NOTE: import the new angle-aware generator
-    from orchestrator.claims import generate_claims_by_angle, expand_copy
+    from orchestrator.claims import (generate_claims_by_angle, expand_copy_batch, repair_field_limits,
+                                     rewrite_noncompliant_batch)
     HAS_LLM = True
 except Exception:
     HAS_LLM = False
@@ -131,8 +250,12 @@ def main():
     # Read brand file from environment variable (set by the API)
     brand_file = os.environ.get('BRAND_FILE', 'Metra')
     
-    # point to your current enhanced input file (processed from input docs)
-    cfg = load_json(f"inputs/{brand_file}/{brand_file.lower()}_enhanced.json")
+    # point to your current enhanced input file (processed from input docs);
+    # compiled once per brand and shared with claims generation/expansion
+    bundle = load_brand_bundle(brand_file)
+    cfg = bundle.cfg
+    if not cfg:
+        raise FileNotFoundError(f"inputs/{brand_file}/{brand_file.lower()}_enhanced.json")
 
     strategy, brand, formulation = cfg["strategy"], cfg["brand"], cfg["formulation"]
     
@@ -143,12 +266,20 @@ def main():
     # New: Read template information
     template_name = os.environ.get('TEMPLATE_NAME')
     template_variation = os.environ.get('TEMPLATE_VARIATION')
+    # Multi-template mode: TEMPLATE_NAMES=a,b,c (TEMPLATE_NAME, if set, goes first)
+    template_names = [t.strip() for t in os.environ.get('TEMPLATE_NAMES', '').split(',') if t.strip()]
+    if template_name:
+        template_names = [template_name] + [t for t in template_names if t != template_name]
+    elif template_names:
+        template_name = template_names[0]
     
     # Override config values with API parameters
     n = claim_count  # Use the actual requested count instead of hardcoded 30
     per_angle = max(claim_count // 4, 2)  # legacy calc (not used for target now)
     
     print(f"[IAG] Requested: {claim_count} claims, style: {claim_style}", flush=True)
+    if len(template_names) > 1:
+        print(f"[IAG] Templates (fan-out): {', '.join(template_names)}", flush=True)
     if template_name:
         print(f"[IAG] Template: {template_name}", flush=True)
         if template_variation:
@@ -157,59 +288,6 @@ def main():
 
     use_llm = HAS_LLM and (not FORCE_MOCK)
 
-    # ---- CLAIMS (angle-aware + balanced sampling)
-    claims: List[str] = []
-    if use_llm:
-        try:
-            print("[IAG] LLM claims by angle…", flush=True)
-            # Request exactly claim_count total claims from the generator, including template fields
-            angle_map = generate_claims_by_angle(cfg, target_per_angle=claim_count, style=claim_style, template_requirements=None)
-
-            # accept all non-empty claims without compliance filtering/rewrite
-            allowed_pool: List[Dict[str, str]] = []
-            for angle_id, items in angle_map.items():
-                for c in items:
-                    txt = (c.get("text") or "").strip()
-                    if not txt:
-                        continue
-                    allowed_pool.append({"text": txt, "angle_id": angle_id})
-
-            # even sampling across angles
-            by_angle: Dict[str, List[str]] = {}
-            for item in allowed_pool:
-                by_angle.setdefault(item["angle_id"], []).append(item["text"])
-
-            while len(claims) < n and any(by_angle.values()):
-                for aid in list(by_angle.keys()):
-                    if by_angle[aid]:
-                        claims.append(by_angle[aid].pop(0))
-                        if len(claims) >= n:
-                            break
-
-        except Exception as e:
-            print("[IAG] LLM failed — using mock claims.", file=sys.stderr)
-            traceback.print_exc()
-
-    # ---- BACKFILL to guarantee n claims (if LLM path left us short)
-    if use_llm and len(claims) < n:
-        # light, safe stock lines to top up
-        bases = _fallback_claims_from_brand(brand)
-        for b in bases:
-            if len(claims) >= n: break
-            if b not in claims:
-                claims.append(b)
-
-    # ---- full mock fallback (if LLM produced nothing)
-    if not claims:
-        print("[IAG] Mock claims fallback", flush=True)
-        bases = _fallback_claims_from_brand(brand)
-        claims = (bases * ((n//len(bases))+1))[:n]
-
-    # Typography selection happens after claims; move log below once computed
-
-    # ---- VARIANTS
-    variants = []
-    
     # Determine template name for variants (always use tmpl_name subsequently)
     if template_name:
         tmpl_name = template_name
@@ -219,194 +297,136 @@ def main():
         print(f"[IAG] Using default template: {tmpl_name}", flush=True)
 
     # Get template requirements for prompt (single-pass)
-    template_requirements = None
-    template_variations = []
-    if template_name:
-        try:
-            from orchestrator.templates import template_manager
-            template_requirements = template_manager.get_claims_requirements(template_name, template_variation)
-            
-            # Get all variations (portrait, square) for the selected version
-            if template_variation:
-                template_variations = template_manager.get_variations_by_version(template_name, template_variation)
-                print(f"[IAG] Template version {template_variation} has {len(template_variations)} variations (portrait/square)", flush=True)
-            else:
-                # If no version specified, get all variations
-                template_variations = template_manager.get_all_variations_for_template(template_name)
-                print(f"[IAG] All template variations loaded: {len(template_variations)} total", flush=True)
-                
-            elems_count = len(template_requirements.get('elements', [])) if template_requirements else 0
-            print(f"[IAG] Template requirements loaded: {elems_count} elements", flush=True)
-        except ImportError:
-            print("[IAG] Template manager not available, proceeding without template requirements", flush=True)
-
-    # If a template was specified but we failed to load any requirements, use a safe headline-only fallback
-    if template_name and (not template_requirements or not template_requirements.get('elements')):
-        print(f"[IAG] No requirements found for '{template_name}'. Using headline-only fallback (no CTA/value props).", flush=True)
-        template_requirements = {
-            "template_name": template_name,
-            "variation_name": template_variation or "01",
-            "elements": [
-                {"name": "#HEADLINE", "max_chars": 70, "description": "Primary headline"}
-            ],
-            "metadata": {"prompt_guidance": "Produce a single impactful headline only. No CTA or value props."}
-        }
-
-    # Derive brand fonts from enhanced JSON, with optional overrides from brand.txt
-    brand_folder = Path(f"inputs/{brand_file}")
-    brand_txt_fonts = _load_brand_txt_fonts(brand_folder)
-    # Base from enhanced JSON
-    # Prefer structured typography if available
-    heading_dict = (brand.get("typography", {}) or {}).get("heading") or (brand.get("visual", {}).get("typography", {}) or {}).get("heading")
-    body_dict    = (brand.get("typography", {}) or {}).get("body")    or (brand.get("visual", {}).get("typography", {}) or {}).get("body")
-    # Fallbacks from older schema
-    if not heading_dict:
-        heading_dict = brand.get("type", {}).get("heading")
-    if not body_dict:
-        body_dict = brand.get("type", {}).get("body")
-
-    # Extract family/style from structured objects when present
-    heading_family_json = heading_dict.get("family") if isinstance(heading_dict, dict) else heading_dict
-    body_family_json    = body_dict.get("family")    if isinstance(body_dict, dict)    else body_dict
-    heading_style_json  = heading_dict.get("style")  if isinstance(heading_dict, dict) else None
-    body_style_json     = body_dict.get("style")     if isinstance(body_dict, dict)    else None
-    # Allow brand.txt overrides if present (highest precedence)
-    heading_raw = brand_txt_fonts.get("heading_font") or heading_family_json
-    body_raw    = brand_txt_fonts.get("body_font")    or body_family_json
-    cta_raw     = brand_txt_fonts.get("cta_font")     or heading_raw
-    heading_family, heading_style = _split_family_and_style(heading_raw)
-    body_family, body_style       = _split_family_and_style(body_raw)
-    # If JSON explicitly provided styles, prefer them over parsed styles
-    if heading_style_json:
-        heading_style = heading_style_json
-    if body_style_json:
-        body_style = body_style_json
-    _, cta_style                  = _split_family_and_style(cta_raw)
-
-    print(f"[IAG] Typography chosen -> heading: {heading_family} / {heading_style}, body: {body_family} / {body_style}", flush=True)
-
-    # Re-run first call with template requirements now that we have them
-    if use_llm:
-        try:
-            print("[IAG] Regenerating claims with template requirements (single-pass)…", flush=True)
-            angle_map = generate_claims_by_angle(cfg, target_per_angle=claim_count, style=claim_style, template_requirements=template_requirements)
-            # Flatten to list preserving counts
-            claims_structured = []
-            for items in angle_map.values():
-                for it in items:
-                    # Ensure template metadata propagated if present
-                    it["template_name"] = tmpl_name
-                    claims_structured.append(it)
-            claims_structured = claims_structured[:n]
-        except Exception:
-            claims_structured = []
-    else:
-        claims_structured = []
-
-    for idx, item in enumerate(claims_structured or []):
-        try:
-            # Build copy dict directly from structured claim item
-            copy = {}
-            if template_requirements and template_requirements.get("elements"):
-                for el in template_requirements.get("elements", []):
-                    name = el.get("name")
-                    if not name:
+    template_requirements, template_variations = (_template_context(template_name, template_variation)
+                                                  if template_name else (None, []))
+
+    # Multi-template fan-out: claims are generated once (against the first template) and
+    # every other template's fields are expanded from those same claims, concurrently
+    fanout = [(extra, *_template_context(extra, template_variation)) for extra in template_names[1:]]
+
+    # Brand fonts resolved by the bundle (enhanced JSON, with optional overrides from brand.txt)
+    typography = bundle.typography
+
+    print(f"[IAG] Typography chosen -> heading: {typography['heading']} / {typography['headingStyle']}, body: {typography['body']} / {typography['bodyStyle']}", flush=True)
+
+    # Near-duplicate index for this run, backed by the brand's delivered-claim history
+    # and optionally seeded with the brand's recent jobs
+    history = ClaimHistory(brand["name"]) if history_enabled() else None
+    avoid_claims = history.avoid_summary() if history is not None else []
+    dedup_index = NearDuplicateIndex(history=history)
+    history_jobs = int(os.environ.get('DEDUP_HISTORY_JOBS', 0))
+    if history_jobs > 0:
+        seeded = seed_from_recent_jobs(dedup_index, brand["name"], out_dir="out", limit=history_jobs)
+        print(f"[IAG] Dedup seeded from {seeded} recent jobs ({len(dedup_index)} claims)", flush=True)
+
+    # ---- CLAIMS → COMPLIANCE → VARIANTS
+    # Each generation round is limit-checked and screened as it arrives. Clean claims
+    # become variants straight away; violators are rewritten on a background worker
+    # and appended to the job once the repair returns.
+    screened_fields = ["claim"] + ([el.get("name") for el in template_requirements.get("elements", []) if el.get("name")]
+                                   if template_requirements else ["headline", "#HEADLINE"])
+    stage = ComplianceStage(
+        get_matcher(formulation),
+        fields=screened_fields,
+        repair=(lambda batch: rewrite_noncompliant_batch(brand, strategy, batch, template_requirements)) if use_llm else None,
+    )
+    # Variants are streamed to the job as they are built (flat memory; readers can follow along)
+    header_extra = {"template_names": template_names} if fanout else {}
+    with JobWriter(brand["name"], formulation["product_name"], strategy["format"], out_dir="out",
+                   defaults=job_defaults(brand, typography, tmpl_name), job_id=os.getenv("JOB_ID") or None,
+                   brand_file=brand_file, **header_extra) as writer:
+        delivered: Dict[str, None] = {}
+        matcher = stage.matcher
+        built = [0]  # claims that reached the job (passed screening or were repaired)
+
+        def build(indexed: List[Any]):
+            """Variants for accepted (index, item) pairs: the primary template, then each fan-out template."""
+            if not indexed:
+                return
+            built[0] += len(indexed)
+            for _, item in indexed:
+                # Only claims that reach the job steer later top-ups away from near-duplicates
+                dedup_index.add(item.get("claim") or item.get("text") or "")
+            expanded = _expand_fanout(brand, strategy, [item for _, item in indexed], fanout, matcher, use_llm) if fanout else []
+            for pos, (idx, item) in enumerate(indexed):
+                variants = _build_variants_for_item(item, idx, tmpl_name, template_requirements, template_variations,
+                                                    template_variation, brand, typography)
+                for (name, requirements, variations), rows in zip(fanout, expanded):
+                    if rows[pos] is None:
+                        print(f"[IAG] Compliance: skipped {name} copy for claim {idx + 1}", flush=True)
                         continue
-                    copy[name] = item.get(name) or item.get(name.lower()) or item.get(name.strip('#').lower()) or ""
-            else:
-                # headline-only fallback
-                copy["#HEADLINE"] = item.get("#HEADLINE") or item.get("headline") or (item.get("claim") or "")
-
-            # If we have template variations, create variants for each variation
-            print(f"[IAG] DEBUG: template_variations count: {len(template_variations) if template_variations else 0}", flush=True)
-            if template_variations and len(template_variations) > 1:
-                print(f"[IAG] DEBUG: Creating variants for {len(template_variations)} variations", flush=True)
-                # Create variants for each template variation (portrait, square, etc.)
-                for variation in template_variations:
-                    print(f"[IAG] DEBUG: Processing variation: {variation.name}", flush=True)
-                    # Create dynamic variant based on template requirements
-                    variant = {
-                        "id": str(uuid.uuid4())[:8],
-                        "layout": f"{tmpl_name}-{variation.name}",
-                        "claim": item.get("claim") or "",
-                        "logo_url": brand["logo_url"],
-                        "palette": brand["palette"],
-                        "type": {
-                            "heading": heading_family or brand.get("type", {}).get("heading"),
-                            "body": body_family or brand.get("type", {}).get("body"),
-                            "headingStyle": heading_style or heading_style_json or "Regular",
-                            "bodyStyle": body_style or body_style_json or "Regular",
-                            "ctaStyle": cta_style or "Bold",
-                        },
-                        # Always set the template name we actually used
-                        "template_name": tmpl_name,
-                        "template_variation": variation.name,
-                        "aspect_ratio": variation.aspect_ratio,
-                        "dimensions": variation.dimensions
-                    }
-                    if item.get("style"):
-                        variant["style"] = item.get("style")
-                    
-                    # Add all fields from copy (template-specific)
-                    for key, value in copy.items():
-                        variant[key] = value
-                    
-                    variants.append(variant)
-                    print(f"[IAG] DEBUG: Added variant {variant['id']}", flush=True)
-                
-                print(f"[IAG] Created {len(template_variations)} variants for claim {idx + 1}", flush=True)
-            else:
-                # Standard single variant
-                variant = {
-                    "id": str(uuid.uuid4())[:8],
-                    "layout": tmpl_name,
-                    "claim": item.get("claim") or "",
-                    "logo_url": brand["logo_url"],
-                    "palette": brand["palette"],
-                    "type": {
-                        "heading": heading_family or brand.get("type", {}).get("heading"),
-                        "body": body_family or brand.get("type", {}).get("body"),
-                        "headingStyle": heading_style or heading_style_json or "Regular",
-                        "bodyStyle": body_style or body_style_json or "Regular",
-                        "ctaStyle": cta_style or "Bold",
-                    },
-                    # Always set the template name we actually used
-                    "template_name": tmpl_name,
-                    "template_variation": template_variation,
-                }
-                if item.get("style"):
-                    variant["style"] = item.get("style")
-                
-                # Add all fields from copy (template-specific)
-                for key, value in copy.items():
-                    variant[key] = value
-                
-                variants.append(variant)
-
-        except Exception as e:
-            print("[IAG] Variant build error:", e, file=sys.stderr)
-            traceback.print_exc()
-
-        # Limit total variants if we're generating multiple per claim
-        if template_variations and len(template_variations) > 1:
-            # For templates with variations, we want to limit the total number of claims
-            # to avoid overwhelming output
-            if len(variants) >= n * len(template_variations):
+                    variants += _build_variants_for_item(dict(item, **rows[pos]), idx, name, requirements, variations,
+                                                         template_variation, brand, typography)
+                for v in variants:
+                    writer.write(v)
+                    if v.get("claim"):
+                        delivered[v["claim"]] = None
+
+        def accept_batch(items: List[Dict[str, Any]]):
+            # ---- enforce template character limits (only offending fields are regenerated)
+            if use_llm and template_requirements:
+                try:
+                    repair_field_limits(brand, strategy, items, template_requirements)
+                except Exception:
+                    print("[IAG] Field limit repair failed", file=sys.stderr)
+                    traceback.print_exc()
+            for it in items:
+                # Ensure template metadata propagated if present
+                it["template_name"] = tmpl_name
+            dropped = stage.dropped
+            build(stage.submit(items))
+            # Clean claims plus those queued for rewrite, less any earlier rewrites that finished
+            # and failed in the meantime; dropped ones are topped up
+            return len(items) - (stage.dropped - dropped)
+
+        # ---- CLAIMS (single pass with template requirements, then top up only the shortfall)
+        if use_llm:
+            try:
+                print("[IAG] LLM claims with template requirements (single-pass)…", flush=True)
+                _generate_claims_with_topup(cfg, n, claim_style, template_requirements, dedup_index, on_batch=accept_batch,
+                                            avoid_claims=avoid_claims)
+            except Exception:
+                print("[IAG] LLM failed — using mock claims.", file=sys.stderr)
+                traceback.print_exc()
+
+        # ---- full mock fallback (if LLM produced nothing)
+        if not stage.submitted:
+            print("[IAG] Mock claims fallback", flush=True)
+            accept_batch([{"claim": b, "headline": b, "style": claim_style}
+                          for b in _fallback_claims_from_brand(brand)[:n]])
+
+        # Claims still waiting on a rewrite (and the clean ones queued behind them) go out in order
+        build(stage.drain())
+        # Rewrites that still failed screening are replaced with fresh claims
+        for _ in range(int(os.environ.get('TOPUP_MAX_ROUNDS', 3))):
+            before = built[0]
+            if not use_llm or not 0 < before < n:
                 break
-        else:
-            # Standard single variant limit
-            if len(variants) >= n:
+            print(f"[IAG] Topping up {n - before} claims dropped by compliance…", flush=True)
+            try:
+                _generate_claims_with_topup(cfg, n - before, claim_style, template_requirements, dedup_index,
+                                            on_batch=accept_batch, avoid_claims=avoid_claims)
+            except Exception:
+                print("[IAG] Compliance top-up failed", file=sys.stderr)
+                traceback.print_exc()
+            build(stage.drain())
+            if built[0] == before:
                 break
+        job = writer.close()
 
-    print("[IAG] Variants:", len(variants), flush=True)
+    print("[IAG] Variants:", job["variant_count"], flush=True)
 
-    job = save_job(
-        variants,
-        brand_name=brand["name"],
-        product_name=formulation["product_name"],
-        fmt=strategy["format"],
-        out_dir="out"
-    )
+    if history is not None:
+        # Remember what was delivered so later sessions steer away from it
+        history.record(delivered, job_id=job["job_id"])
+        history.close()
+    if os.environ.get('JOB_RETENTION', 'true').lower() in ('1', 'true', 'yes'):
+        # Archive/evict old jobs so out/ stays bounded
+        try:
+            apply_retention(out_dir="out")
+        except Exception:
+            print("[IAG] Retention pass failed", file=sys.stderr)
+            traceback.print_exc()
     print(f"[IAG] JOB_ID: {job['job_id']}")
     print(f"[IAG] WROTE out/{job['job_id']}.json", flush=True)
     return job
@@ -0,0 +1,120 @@
+# orchestrator/pipeline.py
+"""
+Streaming compliance stage between claim generation and variant building.
+Clean claims pass straight through; violators are rewritten in batches on a
+background worker and merged back at their original positions: claims are
+released in generation order, so a clean claim waits only for the repairs
+queued ahead of it.
+"""
+
+import sys
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .compliance import ComplianceMatcher
+
+# (index, item) pairs keep claims in generation order across the two paths
+Indexed = Tuple[int, Dict[str, Any]]
+# batch of (item, {field: [banned phrases]}) -> repaired items, same order
+RepairFn = Callable[[List[Tuple[Dict[str, Any], Dict[str, List[str]]]]], List[Dict[str, Any]]]
+
+
+class ComplianceStage:
+    """Screen claims as they arrive; queue violators for batched background repair."""
+
+    def __init__(self, matcher: ComplianceMatcher, fields: List[str], repair: Optional[RepairFn] = None):
+        self.matcher = matcher
+        self.fields = fields
+        self.repair = repair
+        self.submitted = 0
+        self.dropped = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Tuple[List[Indexed], Future]] = []
+        # Resolved claims (None when dropped) waiting for every earlier index to resolve
+        self._resolved: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._released = 0
+
+    def violations(self, item: Dict[str, Any]) -> Dict[str, List[str]]:
+        """{field: [banned phrases]} for every screened field that fails."""
+        found: Dict[str, List[str]] = {}
+        for f in self.fields:
+            val = item.get(f)
+            if isinstance(val, str) and val:
+                matches = self.matcher.screen(val)
+                if matches:
+                    found[f] = sorted({m.phrase for m in matches})
+        return found
+
+    def submit(self, items: List[Dict[str, Any]]) -> List[Indexed]:
+        """Screen a batch. Violators are sent to the repair worker as one batch.
+        Returns the (index, item) pairs that are ready in generation order: clean claims
+        and finished repairs, up to the first claim whose repair is still running."""
+        dirty: List[Indexed] = []
+        dirty_found: List[Dict[str, List[str]]] = []
+        for item in items:
+            idx = self.submitted
+            self.submitted += 1
+            found = self.violations(item)
+            if not found:
+                self._resolved[idx] = item
+            else:
+                dirty.append((idx, item))
+                dirty_found.append(found)
+        if dirty:
+            if self.repair:
+                if self._executor is None:
+                    # Started lazily, and again for submissions after a drain()
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="iag-compliance")
+                print(f"[IAG] Compliance: {len(dirty)} claims queued for rewrite", flush=True)
+                batch = [(item, found) for (_, item), found in zip(dirty, dirty_found)]
+                self._pending.append((dirty, self._executor.submit(self.repair, batch)))
+            else:
+                for idx, _ in dirty:
+                    self._resolved[idx] = None
+                self.dropped += len(dirty)
+                print(f"[IAG] Compliance: dropped {len(dirty)} non-compliant claims", flush=True)
+        # Merge repairs that already finished without waiting on the rest
+        while self._pending and self._pending[0][1].done():
+            self._merge(*self._pending.pop(0))
+        return self._release()
+
+    def drain(self) -> List[Indexed]:
+        """Wait for queued repairs; returns every remaining claim that passes screening, in order."""
+        for dirty, future in self._pending:
+            self._merge(dirty, future)
+        self._pending = []
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        return self._release()
+
+    def _merge(self, dirty: List[Indexed], future: Future):
+        """Record a finished repair batch; rewrites that still fail screening are dropped."""
+        try:
+            fixed = future.result() or []
+        except Exception:
+            print("[IAG] Compliance rewrite failed", file=sys.stderr)
+            traceback.print_exc()
+            fixed = []
+        dropped = 0
+        for pos, (idx, _) in enumerate(dirty):
+            item = fixed[pos] if pos < len(fixed) else None
+            if item and not self.violations(item):
+                self._resolved[idx] = item
+            else:
+                self._resolved[idx] = None
+                dropped += 1
+        self.dropped += dropped
+        if dropped:
+            print(f"[IAG] Compliance: {dropped} claims could not be repaired and were dropped", flush=True)
+
+    def _release(self) -> List[Indexed]:
+        """Pop the resolved claims that directly follow the last released index."""
+        ready: List[Indexed] = []
+        while self._released in self._resolved:
+            item = self._resolved.pop(self._released)
+            if item is not None:
+                ready.append((self._released, item))
+            self._released += 1
+        return ready
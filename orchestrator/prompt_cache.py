@@ -0,0 +1,67 @@
+# orchestrator/prompt_cache.py
+"""
+Cache for compiled (static) prompt fragments.
+Keys combine the brand bundle version, style and a hash of the template
+requirements, so the same inputs always produce byte-identical prompt prefixes.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class PromptCache:
+    """Small thread-safe LRU of compiled prompt fragments."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Hashable, builder: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        value = builder()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def stable_hash(value: Any) -> str:
+    """Content hash of a JSON-able value (dict key order does not matter)."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def requirements_hash(template_requirements: Dict[str, Any]) -> str:
+    """Hash of the parts of a requirements dict that end up in prompts (the precompiled
+    fingerprint while it still matches the dict, so template requirements are not re-hashed per call)."""
+    from .template_requirements import precompiled
+    compiled = precompiled(template_requirements)
+    if compiled is not None:
+        return compiled["fingerprint"]
+    return requirements_content_hash(template_requirements)
+
+
+def requirements_content_hash(template_requirements: Dict[str, Any]) -> str:
+    """requirements_hash computed from the dict's contents."""
+    if not template_requirements:
+        return ""
+    return stable_hash({
+        "elements": template_requirements.get("elements", []),
+        "guidance": (template_requirements.get("metadata") or {}).get("prompt_guidance", ""),
+    })
+
+
+prompt_cache = PromptCache()
@@ -0,0 +1,135 @@
+# orchestrator/prompt_log.py
+"""
+Background prompt/response debug logger.
+Callers only enqueue; a daemon thread writes in batches to one open file,
+rotates by size and gzips rotated files. Sampling keeps DEBUG_PROMPTS cheap under load.
+"""
+
+import atexit
+import gzip
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+
+class PromptLogger:
+    """Asynchronous, size-rotated log of (tag, text) entries."""
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backups: int = 5,
+                 sample_rate: float = 1.0, flush_interval: float = 1.0, queue_size: int = 10000):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self._fh = None
+        self._thread = threading.Thread(target=self._run, name="prompt-log", daemon=True)
+        self._thread.start()
+
+    def sampled(self) -> bool:
+        """Decide once per LLM call whether its prompt and response are captured."""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def write(self, tag: str, text: str):
+        """Enqueue an entry; never blocks the caller (entries are dropped when the queue is full)."""
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        try:
+            self._queue.put_nowait(f"\n[{stamp}] {tag}\n{text}\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0):
+        """Wait (bounded) until everything queued so far is on disk."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        self.flush()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=1.0)
+
+    # -- writer thread -------------------------------------------------
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch: List[Optional[str]] = [first]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                self._write_batch("".join(e for e in batch if e))
+            except Exception:
+                pass
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                if self._fh:
+                    self._fh.close()
+                return
+
+    def _write_batch(self, data: str):
+        if not data:
+            return
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = self.path.open("a", encoding="utf-8")
+        self._fh.write(data)
+        self._fh.flush()
+        if self.max_bytes and self._fh.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        """prompts.log -> prompts.log.1.gz, shifting older archives up to `backups`."""
+        self._fh.close()
+        self._fh = None
+        if self.backups <= 0:
+            self.path.unlink()
+            return
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}.gz")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}.gz"))
+        rotated = self.path.with_name(f"{self.path.name}.1")
+        os.replace(self.path, rotated)
+        with rotated.open("rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        rotated.unlink()
+
+
+_LOGGER: Optional[PromptLogger] = None
+_LOGGER_LOCK = threading.Lock()
+
+
+def get_prompt_logger() -> PromptLogger:
+    """Process-wide logger configured from PROMPT_DEBUG_* env vars (created on first use)."""
+    global _LOGGER
+    if _LOGGER is None:
+        with _LOGGER_LOCK:
+            if _LOGGER is None:
+                _LOGGER = PromptLogger(
+                    os.getenv("PROMPT_DEBUG_FILE", "logs/prompts.log"),
+                    max_bytes=int(os.getenv("PROMPT_DEBUG_MAX_BYTES", str(10 * 1024 * 1024))),
+                    backups=int(os.getenv("PROMPT_DEBUG_BACKUPS", "5")),
+                    sample_rate=float(os.getenv("PROMPT_DEBUG_SAMPLE", "1.0")),
+                )
+                atexit.register(_LOGGER.close)
+    return _LOGGER
@@ -60,6 +60,16 @@ Constraints
 - Avoid using cliches like elevate, unlock, or transform (and similar).
 """
 
+CLAIMS_EXCLUSIONS_BLOCK = """
+[ALREADY ACCEPTED — DO NOT REPEAT OR PARAPHRASE]
+{exclusions}
+"""
+
+CLAIMS_HISTORY_BLOCK = """
+[RECENTLY DELIVERED IN EARLIER SESSIONS — AVOID SIMILAR LINES]
+{history}
+"""
+
 EXPAND_SYSTEM = """You write on-brand ad copy. JSON only."""
 
 EXPAND_USER = """Tone: {tone}
@@ -81,4 +91,60 @@ JSON:
 {{"headline":"…","value_props":["…","…","…","…"],"cta":"…"}}
 """
 
-# Compliance prompt templates removed per request
\ No newline at end of file
+EXPAND_BATCH_USER = """Brand: {brand_name}
+Tone: {tone}
+Audience: {audience}
+
+TEMPLATE REQUIREMENTS:
+{element_info}
+
+TEMPLATE GUIDANCE:
+{template_guidance}
+
+CLAIMS (expand each one independently):
+{claims_block}
+
+For EVERY claim above, generate ONLY the text elements specified. Each element must respect its character limit and follow the template guidance.
+Return a single JSON object with exactly one item per claim index:
+{{"items": [{{"index": 0, {fields_csv}}}]}}
+"""
+
+FIELD_REPAIR_USER = """Tone: {tone}
+Audience: {audience}
+
+Each entry below is one text field from an ad that is over its character limit (or empty).
+Rewrite ONLY these fields so each one fits within its limit, keeping the meaning of its claim.
+Do not add fields and do not change anything else.
+
+FIELDS:
+{fields_block}
+
+JSON:{{"fields": [{{"index": 0, "value": "…"}}]}}
+"""
+
+HEADLINE_REWRITE_SYSTEM = """You are a concise, on-brand headline writer. Return JSON only."""
+
+HEADLINE_REWRITE_BATCH_USER = """Tone: {tone}
+Audience: {audience}
+
+HEADLINES:
+{headlines_block}
+
+Rewrite each headline above as a single fresh headline (40-70 chars, never longer than its stated limit) WITHOUT using these verbs or their direct variants: {banned_verbs}.
+Keep meaning and legality; avoid hype.
+
+JSON:{{"headlines": [{{"index": 0, "headline": "…"}}]}}
+"""
+
+COMPLIANCE_REWRITE_USER = """Tone: {tone}
+Audience: {audience}
+
+Each entry below is one ad text field that uses banned compliance language.
+Rewrite ONLY these fields without the listed phrases or any variant of them. Use compliant wording ("supports", "helps", "nourishes"); never disease, treat, cure or prevent claims.
+Keep the meaning, the voice and each field's character limit.
+
+FIELDS:
+{fields_block}
+
+JSON:{{"fields": [{{"index": 0, "value": "…"}}]}}
+"""
\ No newline at end of file
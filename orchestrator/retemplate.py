@@ -0,0 +1,135 @@
+# orchestrator/retemplate.py
+"""
+Re-template an existing job without regenerating its claims.
+The source job's claims (and every copy field its variants already carry) are reused;
+only fields the new template needs that are missing, empty or over its character limit
+are expanded, in batches limited to those fields. The result is written as a new job
+whose header records the source ("derived_from").
+
+    python -m orchestrator.retemplate <job_id> <template_name> [--variation 01] [--job-id new_id]
+"""
+
+import argparse
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from orchestrator.brand_bundle import load_brand_bundle
+from orchestrator.compliance import get_matcher
+from orchestrator.field_limits import element_limits, item_violations
+from orchestrator.job_schema import expand_job, job_defaults
+from orchestrator.job_writer import JobWriter
+from orchestrator.main import (HAS_LLM, FORCE_MOCK, _build_variants_for_item, _expand_fanout,
+                               _template_context)
+from orchestrator.storage import load_job
+from orchestrator.templates import template_manager
+
+# Variant keys that describe the layout rather than copy
+_LAYOUT_KEYS = ("id", "layout", "logo_url", "palette", "type", "template_name",
+                "template_variation", "aspect_ratio", "dimensions")
+
+
+def _source_items(variants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One item per distinct claim, in job order, with the union of its copy fields across variants."""
+    items: Dict[str, Dict[str, Any]] = {}
+    for v in variants:
+        claim = v.get("claim") or ""
+        if not claim:
+            continue
+        item = items.setdefault(claim, {"claim": claim})
+        for key, value in v.items():
+            if key not in _LAYOUT_KEYS and isinstance(value, str) and value and not item.get(key):
+                item[key] = value
+    return list(items.values())
+
+
+def _reuse_fields(item: Dict[str, Any], limits: Dict[str, int]) -> List[str]:
+    """Map existing copy onto the template's element names; returns the fields still to expand."""
+    for name in limits:
+        value = item.get(name) or item.get(name.lower()) or item.get(name.strip('#').lower())
+        if value:
+            item[name] = value
+    return item_violations(item, limits)
+
+
+def retemplate_job(source_id: str, template_name: str, template_variation: Optional[str] = None,
+                   job_id: str = None, out_dir: str = "out") -> Dict[str, Any]:
+    """Write a derived job for `template_name`; returns its header with variant_count."""
+    # Re-templating always targets an explicit template: no headline-only fallback for typos
+    if template_manager.get_template(template_name) is None:
+        raise LookupError(f"Template {template_name} not found")
+    source = load_job(source_id, out_dir=out_dir)
+    if not source:
+        raise LookupError(f"Job {source_id} not found")
+    if source.get("complete") is False:
+        raise ValueError(f"Job {source_id} is still being written")
+    source = expand_job(source)
+    variants = source.get("variants") or []
+    items = _source_items(variants)
+    if not items:
+        raise ValueError(f"Job {source_id} has no claims to re-template")
+
+    brand_file = source.get("brand_file") or os.environ.get('BRAND_FILE') or source.get("brand")
+    bundle = load_brand_bundle(brand_file)
+    cfg = bundle.cfg
+    if not cfg:
+        raise FileNotFoundError(f"inputs/{brand_file}/{brand_file.lower()}_enhanced.json")
+    strategy, brand, formulation = cfg["strategy"], cfg["brand"], cfg["formulation"]
+    # Keep the source job's look (assets and fonts it was delivered with)
+    first = variants[0]
+    brand = dict(brand, logo_url=first.get("logo_url", brand.get("logo_url")), palette=first.get("palette", brand.get("palette")))
+    typography = first.get("type") or bundle.typography
+
+    print(f"[IAG] Re-templating job {source_id} ({len(items)} claims) -> {template_name}", flush=True)
+    requirements, variations = _template_context(template_name, template_variation)
+    limits = element_limits(requirements)
+
+    # Group claims by the fields they are missing so each expansion asks for exactly those
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    for pos, item in enumerate(items):
+        item["template_name"] = template_name
+        missing = _reuse_fields(item, limits)
+        if missing:
+            groups.setdefault(tuple(missing), []).append(pos)
+    expanded_fields = sum(len(fields) * len(group) for fields, group in groups.items())
+    print(f"[IAG] Reusing {len(items) * len(limits) - expanded_fields} fields, expanding {expanded_fields}", flush=True)
+
+    use_llm = HAS_LLM and (not FORCE_MOCK)
+    matcher = get_matcher(formulation)
+    dropped = set()
+    for fields, group in groups.items():
+        partial = dict(requirements, elements=[el for el in requirements.get("elements", []) if el.get("name") in fields])
+        (rows,) = _expand_fanout(brand, strategy, [items[pos] for pos in group],
+                                 [(template_name, partial, variations)], matcher, use_llm)
+        for pos, row in zip(group, rows):
+            if row is None:
+                print(f"[IAG] Compliance: skipped {template_name} copy for claim {pos + 1}", flush=True)
+                dropped.add(pos)
+            else:
+                items[pos].update({k: v for k, v in row.items() if k in fields})
+
+    with JobWriter(brand["name"], formulation["product_name"], source.get("format") or strategy["format"],
+                   out_dir=out_dir, defaults=job_defaults(brand, typography, template_name), job_id=job_id,
+                   brand_file=brand_file, derived_from=source_id) as writer:
+        for pos, item in enumerate(items):
+            if pos not in dropped:
+                writer.write_many(_build_variants_for_item(item, pos, template_name, requirements, variations,
+                                                           template_variation, brand, typography))
+        job = writer.close()
+    print("[IAG] Variants:", job["variant_count"], flush=True)
+    print(f"[IAG] JOB_ID: {job['job_id']}")
+    print(f"[IAG] WROTE out/{job['job_id']}.json", flush=True)
+    return job
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-template an existing job without regenerating claims")
+    parser.add_argument("source_id", metavar="job_id", help="Source job id")
+    parser.add_argument("template_name", help="Template to fill, e.g. Template-Problem_Solution")
+    parser.add_argument("--variation", default=os.environ.get('TEMPLATE_VARIATION'), help="Template version, e.g. 01")
+    parser.add_argument("--job-id", dest="new_job_id", default=os.environ.get('JOB_ID'), help="Id for the derived job")
+    args = parser.parse_args()
+    retemplate_job(args.source_id, args.template_name, args.variation, job_id=args.new_job_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# orchestrator/retention.py
+"""
+Archival tier and retention policy for old jobs.
+Jobs past the retention age (or beyond the live size budget) are compressed into
+append-only archive segments (one gzip member / zstd frame per job) with an
+offset index, then removed from the live store and out/. Reads of archived jobs
+stay transparent: the job stores fall back to the archive.
+
+    python3 -m orchestrator.retention            # apply the configured policy
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .job_events import events_path
+from .storage import JobStore, get_job_store
+
+ARCHIVE_DIR = os.getenv("JOB_ARCHIVE_DIR", "out/archive")
+SEGMENT_BYTES = int(os.getenv("JOB_ARCHIVE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archived_jobs (
+    job_id TEXT PRIMARY KEY,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    brand TEXT,
+    created_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_archived_segment ON archived_jobs(segment);
+"""
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def _pick_codec(codec: str = None) -> str:
+    """JOB_ARCHIVE_CODEC=gzip|zstd|auto (auto: zstd when the zstandard package is installed)."""
+    codec = (codec or os.getenv("JOB_ARCHIVE_CODEC", "auto")).lower()
+    if codec in ("zstd", "auto") and _zstd() is not None:
+        return "zstd"
+    if codec == "zstd":
+        print("[IAG] zstandard not installed; archiving with gzip", flush=True)
+    return "gzip"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().decompress(blob)
+    return gzip.decompress(blob)
+
+
+class JobArchive:
+    """Append-only compressed segments plus an SQLite offset index."""
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR, codec: str = None, segment_bytes: int = SEGMENT_BYTES):
+        self.dir = Path(archive_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.codec = _pick_codec(codec)
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.dir / "index.sqlite"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __contains__(self, job_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM archived_jobs WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM segments").fetchone()[0]
+
+    def _active_segment(self) -> str:
+        row = self._conn.execute(
+            "SELECT name, bytes FROM segments WHERE codec = ? ORDER BY created_at DESC, name DESC LIMIT 1", (self.codec,)
+        ).fetchone()
+        if row and row[1] < self.segment_bytes:
+            return row[0]
+        ext = "zst" if self.codec == "zstd" else "gz"
+        name = f"jobs-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}.{ext}"
+        self._conn.execute("INSERT INTO segments (name, codec, bytes, created_at) VALUES (?, ?, 0, ?)",
+                           (name, self.codec, int(time.time())))
+        return name
+
+    def add(self, job: Dict[str, Any]):
+        """Append one job (compressed on its own, so it can be read back by offset)."""
+        blob = _compress(json.dumps(job, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), self.codec)
+        with self._lock, self._conn:
+            # Every orchestrator subprocess runs retention: the write lock taken before choosing
+            # the segment serializes segment choice and append across processes too
+            self._conn.execute("BEGIN IMMEDIATE")
+            segment = self._active_segment()
+            with open(self.dir / segment, "ab") as f:
+                offset = os.fstat(f.fileno()).st_size
+                f.write(blob)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archived_jobs (job_id, segment, offset, length, brand, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job["job_id"], segment, offset, len(blob), job.get("brand"), job.get("created_at")),
+            )
+            self._conn.execute("UPDATE segments SET bytes = bytes + ? WHERE name = ?", (len(blob), segment))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT a.segment, a.offset, a.length, s.codec FROM archived_jobs a JOIN segments s ON s.name = a.segment "
+                "WHERE a.job_id = ?", (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        segment, offset, length, codec = row
+        try:
+            with open(self.dir / segment, "rb") as f:
+                f.seek(offset)
+                return json.loads(_decompress(f.read(length), codec))
+        except (OSError, ValueError):
+            return None
+
+    def evict(self, max_bytes: int) -> int:
+        """Delete whole oldest segments until the archive fits in max_bytes. Returns segments removed."""
+        removed = 0
+        with self._lock, self._conn:
+            total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM segments").fetchone()[0]
+            for name, size in self._conn.execute(
+                    "SELECT name, bytes FROM segments ORDER BY created_at, name").fetchall():
+                if total <= max_bytes:
+                    break
+                self._conn.execute("DELETE FROM archived_jobs WHERE segment = ?", (name,))
+                self._conn.execute("DELETE FROM segments WHERE name = ?", (name,))
+                try:
+                    (self.dir / name).unlink()
+                except OSError:
+                    pass
+                total -= size
+                removed += 1
+        return removed
+
+
+_ARCHIVES: Dict[str, JobArchive] = {}
+_ARCHIVES_LOCK = threading.Lock()
+
+
+def get_archive(archive_dir: str = None) -> JobArchive:
+    archive_dir = archive_dir or ARCHIVE_DIR
+    with _ARCHIVES_LOCK:
+        if archive_dir not in _ARCHIVES:
+            _ARCHIVES[archive_dir] = JobArchive(archive_dir)
+        return _ARCHIVES[archive_dir]
+
+
+def load_archived_job(job_id: str, archive_dir: str = None) -> Optional[Dict[str, Any]]:
+    """Archived job, or None (also None when no archive has been created yet)."""
+    archive_dir = archive_dir or ARCHIVE_DIR
+    if not (Path(archive_dir) / "index.sqlite").exists():
+        return None
+    return get_archive(archive_dir).get(job_id)
+
+
+def _live_bytes(out_dir: str) -> int:
+    total = 0
+    with os.scandir(out_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(".json"):
+                total += entry.stat().st_size
+    return total
+
+
+def _archive_one(store: JobStore, archive: JobArchive, header: Dict[str, Any]) -> Optional[int]:
+    """Move one job to the archive. Returns the bytes freed in out/, or None if it was skipped."""
+    if header.get("complete") is False:
+        return None  # still being written
+    job = store.get_job(header["job_id"])
+    if not job:
+        return None
+    path = Path(store.mirror_dir or "") / f"{header['job_id']}.json"
+    size = path.stat().st_size if store.mirror_dir and path.exists() else 0
+    archive.add(job)
+    store.delete_job(header["job_id"])
+    try:
+        events_path(header["job_id"]).unlink()
+    except FileNotFoundError:
+        pass
+    return size
+
+
+def apply_retention(store: JobStore = None, archive: JobArchive = None, max_age_days: float = None,
+                    max_live_bytes: int = None, max_archive_bytes: int = None, out_dir: str = "out") -> Dict[str, int]:
+    """
+    Archive jobs older than max_age_days (JOB_RETENTION_DAYS, default 30), then the oldest jobs
+    while out/ exceeds max_live_bytes (JOB_LIVE_MAX_BYTES, 0 = no limit), then evict whole
+    archive segments beyond max_archive_bytes (JOB_ARCHIVE_MAX_BYTES, 0 = keep everything).
+    """
+    store = store or get_job_store(out_dir)
+    archive = archive or get_archive()
+    max_age_days = float(os.getenv("JOB_RETENTION_DAYS", "30")) if max_age_days is None else max_age_days
+    max_live_bytes = int(os.getenv("JOB_LIVE_MAX_BYTES", "0")) if max_live_bytes is None else max_live_bytes
+    max_archive_bytes = int(os.getenv("JOB_ARCHIVE_MAX_BYTES", "0")) if max_archive_bytes is None else max_archive_bytes
+    stats = {"archived": 0, "evicted_segments": 0}
+
+    if max_age_days > 0:
+        cutoff = int(time.time() - max_age_days * 86400)
+        skipped = 0
+        while True:
+            batch = store.list_jobs(before=cutoff, limit=200, offset=skipped, oldest_first=True)
+            if not batch:
+                break
+            for header in batch:
+                if _archive_one(store, archive, header) is None:
+                    skipped += 1
+                else:
+                    stats["archived"] += 1
+
+    if max_live_bytes > 0 and store.mirror_dir and os.path.isdir(store.mirror_dir):
+        live = _live_bytes(store.mirror_dir)
+        skipped = 0
+        while live > max_live_bytes:
+            batch = store.list_jobs(limit=50, offset=skipped, oldest_first=True)
+            if not batch:
+                break
+            for header in batch:
+                if live <= max_live_bytes:
+                    break
+                freed = _archive_one(store, archive, header)
+                if freed is None:
+                    skipped += 1
+                else:
+                    live -= freed
+                    stats["archived"] += 1
+
+    if max_archive_bytes > 0:
+        stats["evicted_segments"] = archive.evict(max_archive_bytes)
+
+    if stats["archived"] or stats["evicted_segments"]:
+        print(f"[IAG] Retention: archived {stats['archived']} jobs, evicted {stats['evicted_segments']} archive segments", flush=True)
+    return stats
+
+
+if __name__ == "__main__":
+    print(apply_retention())
@@ -1,8 +1,24 @@
-import json, time, uuid
+# orchestrator/storage.py
+"""
+Job storage backends.
+SqliteJobStore (default) keeps jobs and variants in indexed tables so listing and
+filtering stay fast as history grows; it mirrors each job to out/<job_id>.json,
+which is what the Figma plugin fetches. FileJobStore is the original one-file-per-job layout.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
 
-def save_job(variants, brand_name: str, product_name: str, fmt: str, out_dir: str = "out"):
-    job = {
+
+def new_job(variants: List[Dict[str, Any]], brand_name: str, product_name: str, fmt: str) -> Dict[str, Any]:
+    return {
         "job_id": str(uuid.uuid4())[:8],
         "brand": brand_name,
         "product": product_name,
@@ -10,7 +26,455 @@ def save_job(variants, brand_name: str, product_name: str, fmt: str, out_dir: st
         "variants": variants,
         "created_at": int(time.time())
     }
+
+
+def write_job_json(job: Dict[str, Any], out_dir: str = "out") -> Path:
+    """Write out/<job_id>.json atomically (readers never see a half-written file).
+    Compact by default; set JOB_JSON_INDENT for human-readable files."""
     Path(out_dir).mkdir(parents=True, exist_ok=True)
-    with open(f"{out_dir}/{job['job_id']}.json", "w", encoding="utf-8") as f:
-        json.dump(job, f, ensure_ascii=False, indent=2)
-    return job
+    path = Path(out_dir) / f"{job['job_id']}.json"
+    tmp = path.with_suffix(".json.tmp")
+    indent = int(os.getenv("JOB_JSON_INDENT", "0")) or None
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False, indent=indent, separators=None if indent else (",", ":"))
+    os.replace(tmp, path)
+    return path
+
+
+def _variation_filter(template_variation: Any) -> List[str]:
+    """'portrait,square' / ['01-portrait'] -> list of wanted values (empty = no filter)."""
+    if not template_variation:
+        return []
+    values = template_variation.split(",") if isinstance(template_variation, str) else template_variation
+    return [str(v).strip() for v in values if str(v).strip()]
+
+
+def variation_matches(value: Optional[str], wanted: List[str]) -> bool:
+    """
+    Same rule the Figma plugin applies: a wanted value matches the whole template_variation
+    ('01-portrait') or its type after the first dash ('portrait'); variants without a type
+    ('01' or none) are always kept.
+    """
+    if not wanted or not value or "-" not in value:
+        return True
+    return value in wanted or value.split("-", 1)[1] in wanted
+
+
+def _load_archived(job_id: str) -> Optional[Dict[str, Any]]:
+    """Transparent read of a job moved to the archive by the retention policy."""
+    from .retention import load_archived_job
+    return load_archived_job(job_id)
+
+
+def _remove_file(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _job_template(job: Dict[str, Any]) -> Optional[str]:
+    if job.get("template_name"):
+        return job["template_name"]  # v2 header
+    for v in job.get("variants") or []:
+        if v.get("template_name"):
+            return v["template_name"]
+    return None
+
+
+class JobStore(ABC):
+    """Storage backend interface for generated jobs."""
+
+    # Directory that receives out/<job_id>.json files (None if the backend keeps none)
+    mirror_dir: Optional[str] = None
+
+    @abstractmethod
+    def save_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a complete job; returns it."""
+
+    # Incremental writes (see job_writer.JobWriter); file-only backends need none of them
+    def begin_job(self, header: Dict[str, Any]):
+        pass
+
+    def append_variants(self, job_id: str, start: int, variants: List[Dict[str, Any]]):
+        pass
+
+    def finish_job(self, job_id: str, count: int, failed: bool = False):
+        pass
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Full job (header + variants), or None."""
+
+    @abstractmethod
+    def list_jobs(self, brand: str = None, template: str = None, since: int = None,
+                  limit: int = 50, offset: int = 0, before: int = None,
+                  oldest_first: bool = False) -> List[Dict[str, Any]]:
+        """Job headers (no variants), newest first; `since`/`before` bound created_at."""
+
+    @abstractmethod
+    def delete_job(self, job_id: str):
+        """Remove a job (and its out/<job_id>.json file)."""
+
+    def get_header(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job header with variant_count (no variants), or None."""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+        header = {k: v for k, v in job.items() if k != "variants"}
+        header["variant_count"] = len(job.get("variants") or [])
+        header.setdefault("template_name", _job_template(job))
+        return header
+
+    def get_variants(self, job_id: str, offset: int = 0, limit: int = None,
+                     template_variation: Any = None, template_name: str = None) -> List[Dict[str, Any]]:
+        """Variants in job order; `template_variation` filters as in variation_matches,
+        `template_name` keeps one template of a multi-template (fan-out) job."""
+        wanted = _variation_filter(template_variation)
+        job = self.get_job(job_id) or {}
+        variants = [v for v in job.get("variants") or []
+                    if variation_matches(v.get("template_variation"), wanted)
+                    and (not template_name or (v.get("template_name") or job.get("template_name")) == template_name)]
+        return variants[offset:offset + limit if limit is not None else None]
+
+    def count_variants(self, job_id: str, template_variation: Any = None, template_name: str = None) -> int:
+        return len(self.get_variants(job_id, template_variation=template_variation, template_name=template_name))
+
+    def variation_counts(self, job_id: str) -> Dict[str, int]:
+        """{template_variation: count} ('' for variants without one)."""
+        counts: Dict[str, int] = {}
+        for v in self.get_variants(job_id):
+            key = v.get("template_variation") or ""
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def iter_recent_variants(self, brand: str, jobs: int = 20) -> Iterator[Dict[str, Any]]:
+        """Variants of a brand's most recent jobs, newest job first."""
+        for header in self.list_jobs(brand=brand, limit=jobs):
+            for v in self.get_variants(header["job_id"]):
+                yield v
+
+    def close(self):
+        pass
+
+
+class FileJobStore(JobStore):
+    """One JSON file per job in out_dir."""
+
+    def __init__(self, out_dir: str = "out"):
+        self.out_dir = Path(out_dir)
+        self.mirror_dir = out_dir
+
+    def save_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        write_job_json(job, str(self.out_dir))
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        path = self.out_dir / f"{job_id}.json"
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except OSError:
+            return _load_archived(job_id)
+        except ValueError:
+            pass
+        # Job still being streamed by a JobWriter
+        from .job_writer import read_partial_job
+        try:
+            job = read_partial_job(str(path))
+        except (OSError, ValueError):
+            return None
+        job.pop("complete", None)
+        return job
+
+    def delete_job(self, job_id: str):
+        _remove_file(self.out_dir / f"{job_id}.json")
+
+    def list_jobs(self, brand: str = None, template: str = None, since: int = None,
+                  limit: int = 50, offset: int = 0, before: int = None,
+                  oldest_first: bool = False) -> List[Dict[str, Any]]:
+        paths = sorted(self.out_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=not oldest_first)
+        out: List[Dict[str, Any]] = []
+        skipped = 0
+        for path in paths:
+            if len(out) >= limit:
+                break
+            job = self.get_job(path.stem)
+            if not job or (brand and job.get("brand") != brand):
+                continue
+            if (template and _job_template(job) != template) or (since and job.get("created_at", 0) < since):
+                continue
+            if before and job.get("created_at", 0) >= before:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            header = {k: v for k, v in job.items() if k != "variants"}
+            header["variant_count"] = len(job.get("variants") or [])
+            header["template_name"] = _job_template(job)
+            out.append(header)
+        return out
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    brand TEXT,
+    product TEXT,
+    format TEXT,
+    template_name TEXT,
+    variant_count INTEGER NOT NULL DEFAULT 0,
+    created_at INTEGER NOT NULL,
+    extra TEXT,
+    complete INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS variants (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    template_name TEXT,
+    template_variation TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_brand_created ON jobs(brand, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_template ON jobs(template_name, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+CREATE INDEX IF NOT EXISTS idx_variants_template ON variants(template_name);
+"""
+
+_HEADER_KEYS = ("job_id", "brand", "product", "format", "created_at")
+
+
+class SqliteJobStore(JobStore):
+    """Jobs and variants in SQLite (WAL, so readers never block the writer)."""
+
+    def __init__(self, db_path: str = "out/jobs.sqlite", mirror_dir: Optional[str] = "out"):
+        self.db_path = Path(db_path)
+        self.mirror_dir = mirror_dir
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not self.db_path.exists()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Databases created before incremental writes have no completeness flag
+        if "complete" not in {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+        if fresh and mirror_dir:
+            imported = self.import_json_dir(mirror_dir)
+            if imported:
+                print(f"[IAG] Job store: imported {imported} existing jobs from {mirror_dir}/", flush=True)
+
+    def close(self):
+        self._conn.close()
+
+    def save_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        self._insert(job)
+        if self.mirror_dir:
+            # Compatibility path: the plugin and server.py still read out/<job_id>.json
+            write_job_json(job, self.mirror_dir)
+        return job
+
+    def _insert(self, job: Dict[str, Any]):
+        variants = job.get("variants") or []
+        with self._lock, self._conn:
+            self._insert_header(job, len(variants), _job_template(job), complete=True)
+            self._conn.execute("DELETE FROM variants WHERE job_id = ?", (job["job_id"],))
+            self._insert_variants(job["job_id"], 0, variants, job.get("template_name"))
+
+    def _insert_header(self, job: Dict[str, Any], count: int, template_name: Optional[str], complete: bool):
+        extra = {k: v for k, v in job.items() if k not in _HEADER_KEYS and k != "variants"}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, brand, product, format, template_name, variant_count, created_at, extra, complete) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job["job_id"], job.get("brand"), job.get("product"), job.get("format"), template_name,
+             count, int(job.get("created_at") or time.time()),
+             json.dumps(extra, ensure_ascii=False) if extra else None, int(complete)),
+        )
+
+    def _insert_variants(self, job_id: str, start: int, variants: List[Dict[str, Any]], job_template: str = None):
+        # v2 variants inherit the job-level template_name unless they override it
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO variants (job_id, idx, template_name, template_variation, data) VALUES (?, ?, ?, ?, ?)",
+            [(job_id, start + i, v.get("template_name") or job_template, v.get("template_variation"),
+              json.dumps(v, ensure_ascii=False, separators=(",", ":")))
+             for i, v in enumerate(variants)],
+        )
+
+    def begin_job(self, header: Dict[str, Any]):
+        with self._lock, self._conn:
+            self._insert_header(header, 0, header.get("template_name"), complete=False)
+
+    def append_variants(self, job_id: str, start: int, variants: List[Dict[str, Any]]):
+        if not variants:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT template_name FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            self._insert_variants(job_id, start, variants, row[0] if row else None)
+            self._conn.execute(
+                "UPDATE jobs SET variant_count = ?, template_name = COALESCE(template_name, ?) WHERE job_id = ?",
+                (start + len(variants), _job_template({"variants": variants}), job_id),
+            )
+
+    def finish_job(self, job_id: str, count: int, failed: bool = False):
+        """Mark a streamed job complete; `failed` keeps the variants written so far and flags the header."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET variant_count = ?, complete = 1 WHERE job_id = ?", (count, job_id))
+            if failed:
+                row = self._conn.execute("SELECT extra FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                extra = dict(json.loads(row[0]) if row and row[0] else {}, failed=True)
+                self._conn.execute("UPDATE jobs SET extra = ? WHERE job_id = ?",
+                                   (json.dumps(extra, ensure_ascii=False), job_id))
+
+    def import_json_dir(self, out_dir: str) -> int:
+        """Import legacy out/*.json jobs that are not in the database yet."""
+        imported = 0
+        for path in Path(out_dir).glob("*.json"):
+            try:
+                job = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if not isinstance(job, dict) or not job.get("job_id") or self._header(job["job_id"]):
+                continue
+            self._insert(job)
+            imported += 1
+        return imported
+
+    def _header(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, brand, product, format, template_name, variant_count, created_at, extra, complete "
+                "FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_header(row) if row else None
+
+    @staticmethod
+    def _row_to_header(row) -> Dict[str, Any]:
+        header = dict(zip(("job_id", "brand", "product", "format", "template_name", "variant_count", "created_at"), row[:7]))
+        if row[7]:
+            header.update(json.loads(row[7]))
+        header["complete"] = bool(row[8])
+        return header
+
+    def get_header(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._header(job_id) or super().get_header(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        header = self._header(job_id)
+        if header is None:
+            # Jobs written by the file backend before the store existed, then the archive
+            return FileJobStore(self.mirror_dir).get_job(job_id) if self.mirror_dir else _load_archived(job_id)
+        job = {k: header[k] for k in ("job_id", "brand", "product", "format")}
+        job.update({k: v for k, v in header.items()
+                    if k not in _HEADER_KEYS and k not in ("template_name", "variant_count", "complete")})
+        if header.get("schema_version", 1) >= 2:
+            job["template_name"] = header["template_name"]
+        job["variants"] = self.get_variants(job_id)
+        job["created_at"] = header["created_at"]
+        return job
+
+    def delete_job(self, job_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM variants WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        if self.mirror_dir:
+            _remove_file(Path(self.mirror_dir) / f"{job_id}.json")
+
+    def list_jobs(self, brand: str = None, template: str = None, since: int = None,
+                  limit: int = 50, offset: int = 0, before: int = None,
+                  oldest_first: bool = False) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if brand:
+            where.append("brand = ?")
+            params.append(brand)
+        if template:
+            where.append("template_name = ?")
+            params.append(template)
+        if since:
+            where.append("created_at >= ?")
+            params.append(int(since))
+        if before:
+            where.append("created_at < ?")
+            params.append(int(before))
+        order = "ASC" if oldest_first else "DESC"
+        sql = ("SELECT job_id, brand, product, format, template_name, variant_count, created_at, extra, complete FROM jobs"
+               + (f" WHERE {' AND '.join(where)}" if where else "")
+               + f" ORDER BY created_at {order}, rowid {order} LIMIT ? OFFSET ?")
+        with self._lock:
+            rows = self._conn.execute(sql, params + [int(limit), int(offset)]).fetchall()
+        return [self._row_to_header(r) for r in rows]
+
+    @staticmethod
+    def _variation_sql(template_variation: Any):
+        wanted = _variation_filter(template_variation)
+        if not wanted:
+            return "", []
+        marks = ",".join("?" * len(wanted))
+        sql = (" AND (template_variation IS NULL OR instr(template_variation, '-') = 0"
+               f" OR template_variation IN ({marks})"
+               f" OR substr(template_variation, instr(template_variation, '-') + 1) IN ({marks}))")
+        return sql, wanted + wanted
+
+    @classmethod
+    def _filter_sql(cls, template_variation: Any, template_name: Optional[str]):
+        where, params = cls._variation_sql(template_variation)
+        if template_name:
+            # variants.template_name holds the override or, failing that, the job's template
+            where, params = where + " AND template_name = ?", params + [template_name]
+        return where, params
+
+    def get_variants(self, job_id: str, offset: int = 0, limit: int = None,
+                     template_variation: Any = None, template_name: str = None) -> List[Dict[str, Any]]:
+        where, params = self._filter_sql(template_variation, template_name)
+        sql = f"SELECT data FROM variants WHERE job_id = ?{where} ORDER BY idx LIMIT ? OFFSET ?"
+        params = [job_id] + params + [-1 if limit is None else int(limit), int(offset)]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if not rows and self._header(job_id) is None:
+            return super().get_variants(job_id, offset, limit, template_variation, template_name)  # legacy file-only job
+        return [json.loads(r[0]) for r in rows]
+
+    def count_variants(self, job_id: str, template_variation: Any = None, template_name: str = None) -> int:
+        where, params = self._filter_sql(template_variation, template_name)
+        with self._lock:
+            count = self._conn.execute(f"SELECT COUNT(*) FROM variants WHERE job_id = ?{where}",
+                                       [job_id] + params).fetchone()[0]
+        if not count and self._header(job_id) is None:
+            return super().count_variants(job_id, template_variation, template_name)
+        return count
+
+    def variation_counts(self, job_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT COALESCE(template_variation, ''), COUNT(*) FROM variants WHERE job_id = ? GROUP BY 1",
+                (job_id,),
+            ).fetchall()
+        if not rows and self._header(job_id) is None:
+            return super().variation_counts(job_id)
+        return dict(rows)
+
+
+_STORES: Dict[str, JobStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_job_store(out_dir: str = "out") -> JobStore:
+    """Configured backend (JOB_STORE=sqlite|file, JOB_DB path), shared per out_dir."""
+    with _STORES_LOCK:
+        store = _STORES.get(out_dir)
+        if store is None:
+            if os.getenv("JOB_STORE", "sqlite").lower() == "file":
+                store = FileJobStore(out_dir)
+            else:
+                store = SqliteJobStore(os.getenv("JOB_DB", f"{out_dir}/jobs.sqlite"), mirror_dir=out_dir)
+            _STORES[out_dir] = store
+        return store
+
+
+def save_job(variants, brand_name: str, product_name: str, fmt: str, out_dir: str = "out"):
+    job = new_job(variants, brand_name, product_name, fmt)
+    return get_job_store(out_dir).save_job(job)
+
+
+def load_job(job_id: str, out_dir: str = "out") -> Optional[Dict[str, Any]]:
+    return get_job_store(out_dir).get_job(job_id)
@@ -0,0 +1,76 @@
+# orchestrator/template_requirements.py
+"""
+Compiled template requirements.
+A requirements dict (TemplateManager.get_claims_requirements) is turned once into what the
+prompts need: per-field char limits, the template requirements prompt block, the output
+field list, a JSON schema for one generated item and the requirements fingerprint used in
+prompt cache keys. TemplateManager precompiles this for every template variation when templates
+are loaded/added/refreshed and ships it as requirements["compiled"]; other dicts (e.g. main's
+headline-only fallback) compile on demand.
+
+The artifact keeps a copy of the elements and guidance it was built from. precompiled() serves
+it only while the dict still has those (a plain equality check, no hashing), so a dict whose
+elements were edited afterwards (e.g. retemplate's reduced requirements) is never served stale.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from .prompt_cache import requirements_content_hash
+
+
+def template_guidance(requirements: Dict[str, Any]) -> str:
+    if isinstance(requirements, dict) and requirements.get('metadata'):
+        return requirements['metadata'].get('prompt_guidance', '') or ''
+    return ''
+
+
+def compile_requirements(requirements: Dict[str, Any]) -> Dict[str, Any]:
+    """Compile a requirements dict. JSON-serializable, so it can be returned by the API as-is."""
+    elements = (requirements or {}).get('elements') or []
+    guidance = template_guidance(requirements)
+    char_limits: Dict[str, int] = {}
+    lines: List[str] = []
+    out_fields: List[str] = []
+    properties: Dict[str, Any] = {}
+    for el in elements:
+        name = el.get('name', '')
+        if not name:
+            continue
+        max_chars = el.get('max_chars', 100)
+        desc = el.get('description', '')
+        char_limits[name] = int(max_chars or 100)
+        lines.append(f"- {name}: max {max_chars} chars — {desc}")
+        out_fields.append(f'"{name}": "…"')
+        properties[name] = {'type': 'string', 'maxLength': char_limits[name], 'description': desc}
+    if lines and guidance:
+        lines.append(f"- Guidance: {guidance}")
+    return {
+        # What this was compiled from (see precompiled)
+        'elements': [dict(el) for el in elements],
+        'guidance': guidance,
+        'fingerprint': requirements_content_hash(requirements),
+        'char_limits': char_limits,
+        'prompt_block': "\n".join(lines),
+        'output_fields_csv': ",\n      ".join(out_fields),
+        'output_schema': {
+            'type': 'object',
+            'properties': dict({'claim': {'type': 'string'}, 'style': {'type': 'string'}}, **properties),
+            'required': ['claim'] + list(properties),
+            'additionalProperties': True,
+        },
+    }
+
+
+def precompiled(requirements: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The dict's compiled artifact if it was built from the dict's current elements and guidance."""
+    compiled = (requirements or {}).get('compiled')
+    if (isinstance(compiled, dict) and 'prompt_block' in compiled
+            and compiled.get('elements') == (requirements.get('elements') or [])
+            and compiled.get('guidance') == template_guidance(requirements)):
+        return compiled
+    return None
+
+
+def compiled_requirements(requirements: Dict[str, Any]) -> Dict[str, Any]:
+    """The precompiled artifact when it still matches the dict, otherwise compile it now."""
+    return precompiled(requirements) or compile_requirements(requirements)
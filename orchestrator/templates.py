@@ -1,15 +1,28 @@
 # orchestrator/templates.py
 """
 Template Management System for Infinite Ad Garden
-Handles scanning Figma files for templates, parsing requirements, and managing variations
+Handles scanning Figma files for templates, parsing requirements, and managing variations.
+
+The cache file is read lazily on first access (importing this module does no I/O) and
+re-read whenever its mtime/size change, so edits by another process are picked up.
+Lookups by category, version number and variation name go through prebuilt indexes.
+
+Readers work on an immutable snapshot (templates + indexes) that writers replace in a
+single assignment, so the read path takes no locks; writers serialize on one lock and
+write the cache file atomically (temp file + rename), reusing unchanged templates' JSON.
 """
 
 import json
+import os
 import re
-from typing import Dict, List, Any, Optional
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
+from .template_requirements import compile_requirements
+
 @dataclass
 class TemplateElement:
     """Represents a text element in a template"""
@@ -37,31 +50,147 @@ class Template:
     image_weights: str
     metadata: Dict[str, Any]
 
+def _requirements_for(template: Template, variation: TemplateVariation) -> Dict[str, Any]:
+    """Requirements dict for one variation, with its compiled prompt artifact."""
+    requirements = {
+        'template_name': template.name,
+        'variation_name': variation.name,
+        'category': template.category,
+        'elements': [
+            {
+                'name': e.name,
+                'max_chars': e.max_chars,
+                'description': e.description,
+                'required': e.required
+            } for e in variation.elements
+        ],
+        'image_weights': template.image_weights,
+        'total_elements': len(variation.elements),
+        'metadata': template.metadata
+    }
+    requirements['compiled'] = compile_requirements(requirements)
+    return requirements
+
+
+class _Snapshot:
+    """Read-only templates plus lookup indexes. Never mutated: updates build a new one."""
+    
+    def __init__(self, templates: Dict[str, Template], previous: "_Snapshot" = None):
+        self.templates: Mapping[str, Template] = MappingProxyType(dict(templates))
+        # Compiled requirements per template -> variation name (None = first variation);
+        # reused from the previous snapshot for templates that did not change
+        self.requirements: Dict[str, Dict[Optional[str], Dict[str, Any]]] = {}
+        for t in self.templates.values():
+            if previous is not None and previous.templates.get(t.name) is t and t.name in previous.requirements:
+                self.requirements[t.name] = previous.requirements[t.name]
+            elif t.variations:
+                compiled: Dict[Optional[str], Dict[str, Any]] = {}
+                for v in t.variations:
+                    if v.name not in compiled:
+                        compiled[v.name] = _requirements_for(t, v)
+                compiled[None] = compiled[t.variations[0].name]
+                self.requirements[t.name] = compiled
+        by_category: Dict[str, List[Template]] = {}
+        versions: Dict[str, Tuple[str, ...]] = {}
+        by_version: Dict[str, Dict[str, List[TemplateVariation]]] = {}
+        by_variation: Dict[str, Dict[str, TemplateVariation]] = {}
+        for t in self.templates.values():
+            by_category.setdefault(t.category, []).append(t)
+            found = set()
+            for v in t.variations:
+                # "01-portrait" -> version number "01" (first run of digits) and prefix "01"
+                version_match = re.search(r'(\d+)', v.name)
+                if version_match:
+                    found.add(version_match.group(1))
+                if '-' in v.name:
+                    by_version.setdefault(t.name, {}).setdefault(v.name.split('-', 1)[0], []).append(v)
+                by_variation.setdefault(t.name, {}).setdefault(v.name, v)
+            versions[t.name] = tuple(sorted(found, key=int))
+        self.by_category = {k: tuple(v) for k, v in by_category.items()}
+        self.versions = versions
+        self.by_version = {t: {k: tuple(v) for k, v in d.items()} for t, d in by_version.items()}
+        self.by_variation = by_variation
+        self.listing = tuple(
+            {
+                'name': t.name,
+                'base_name': t.base_name,
+                'category': t.category,
+                'description': t.description,
+                'variations_count': len(t.variations),
+                'elements_count': len(t.variations[0].elements) if t.variations else 0
+            }
+            for t in self.templates.values()
+        )
+
+
 class TemplateManager:
     """Manages templates and their requirements"""
     
-    def __init__(self):
-        self.templates: Dict[str, Template] = {}
-        self.template_cache_file = "orchestrator/template_cache.json"
-        self.load_cached_templates()
+    def __init__(self, template_cache_file: str = None):
+        self.template_cache_file = template_cache_file or os.getenv("TEMPLATE_CACHE_FILE", "orchestrator/template_cache.json")
+        self._snapshot: Optional[_Snapshot] = None  # None until first load
+        self._cache_signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()  # writers only
+        # name -> (template object, its serialized JSON) so saves only re-serialize what changed
+        self._serialized: Dict[str, Tuple[Template, str]] = {}
+        self._last_written: Optional[str] = None
+    
+    @property
+    def templates(self) -> Mapping[str, Template]:
+        """Read-only mapping of the current templates"""
+        return self._current().templates
+    
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.template_cache_file)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+    
+    def _current(self) -> _Snapshot:
+        """Current snapshot; loads on first use and reloads when the cache file changed on disk."""
+        snapshot = self._snapshot
+        if snapshot is not None and self._file_signature() == self._cache_signature:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._file_signature() != self._cache_signature:
+                self.load_cached_templates()
+            if self._snapshot is None:
+                self._publish({})
+            return self._snapshot
+    
+    def _publish(self, templates: Dict[str, Template]):
+        """Swap in a new snapshot (single reference assignment: readers see old or new, never a mix)."""
+        self._snapshot = _Snapshot(templates, self._snapshot)
     
     def load_cached_templates(self):
         """Load templates from cache file"""
-        try:
-            if Path(self.template_cache_file).exists():
-                with open(self.template_cache_file, 'r') as f:
-                    cache_data = json.load(f)
+        with self._lock:
+            signature = self._file_signature()
+            try:
+                if signature is not None:
+                    with open(self.template_cache_file, 'r') as f:
+                        cache_data = json.load(f)
+                    templates = {}
                     for template_data in cache_data.get('templates', []):
                         template = self._deserialize_template(template_data)
-                        self.templates[template.name] = template
-                print(f"✅ Loaded {len(self.templates)} cached templates")
-            else:
-                print("📁 No template cache file found, creating default templates")
+                        templates[template.name] = template
+                    self._cache_signature = signature
+                    self._serialized = {}
+                    self._last_written = None
+                    self._publish(templates)
+                    print(f"✅ Loaded {len(templates)} cached templates")
+                else:
+                    print("📁 No template cache file found, creating default templates")
+                    self._create_default_templates()
+            except Exception as e:
+                print(f"⚠️ Failed to load template cache: {e}")
+                if self._snapshot is not None and self._snapshot.templates:
+                    # Keep serving what we had; retry when the file changes again
+                    self._cache_signature = signature
+                    return
+                print("📁 Creating default templates as fallback")
                 self._create_default_templates()
-        except Exception as e:
-            print(f"⚠️ Failed to load template cache: {e}")
-            print("📁 Creating default templates as fallback")
-            self._create_default_templates()
     
     def _create_default_templates(self):
         """Create default templates if none exist"""
@@ -133,9 +262,11 @@ class TemplateManager:
             )
             
             # Add to templates
-            self.templates[value_prop_tick.name] = value_prop_tick
-            self.templates[problem_solution.name] = problem_solution
-            print(f"✅ Created {len(self.templates)} default templates")
+            templates = dict(self._snapshot.templates) if self._snapshot else {}
+            templates[value_prop_tick.name] = value_prop_tick
+            templates[problem_solution.name] = problem_solution
+            self._publish(templates)
+            print(f"✅ Created {len(templates)} default templates")
             
             # Save to cache
             self.save_template_cache()
@@ -144,15 +275,38 @@ class TemplateManager:
             print(f"❌ Error creating default templates: {e}")
     
     def save_template_cache(self):
-        """Save templates to cache file"""
+        """Save templates to cache file (atomically; skipped when nothing changed)"""
         try:
-            cache_data = {
-                'templates': [self._serialize_template(t) for t in self.templates.values()],
-                'last_updated': str(Path().cwd())
-            }
-            with open(self.template_cache_file, 'w') as f:
-                json.dump(cache_data, f, indent=2)
-            print(f"✅ Saved {len(self.templates)} templates to cache")
+            with self._lock:
+                templates = self._snapshot.templates if self._snapshot else {}
+                fragments = []
+                serialized = {}
+                for t in templates.values():
+                    cached = self._serialized.get(t.name)
+                    if cached and cached[0] is t:
+                        text = cached[1]
+                    else:
+                        # Same layout json.dump(indent=2) gives for the whole document
+                        text = '    ' + json.dumps(self._serialize_template(t), indent=2).replace('\n', '\n    ')
+                    serialized[t.name] = (t, text)
+                    fragments.append(text)
+                self._serialized = serialized
+                body = ',\n'.join(fragments)
+                content = ('{\n  "templates": [\n' + body + '\n  ],\n' if fragments else '{\n  "templates": [],\n') + \
+                    f'  "last_updated": {json.dumps(str(Path().cwd()))}\n}}'
+                if content == self._last_written and self._file_signature() == self._cache_signature:
+                    return
+                path = Path(self.template_cache_file)
+                tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp, 'w') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, path)
+                self._last_written = content
+                # Our own write is not a reason to reload
+                self._cache_signature = self._file_signature()
+            print(f"✅ Saved {len(templates)} templates to cache")
         except Exception as e:
             print(f"⚠️ Failed to save template cache: {e}")
     
@@ -279,95 +433,51 @@ class TemplateManager:
     
     def add_template(self, template: Template):
         """Add or update a template"""
-        self.templates[template.name] = template
-        self.save_template_cache()
+        with self._lock:
+            templates = dict(self._current().templates)
+            templates[template.name] = template
+            self._publish(templates)
+            self.save_template_cache()
         print(f"✅ Added/updated template: {template.name}")
     
     def get_template(self, template_name: str) -> Optional[Template]:
         """Get a template by name"""
-        return self.templates.get(template_name)
+        return self._current().templates.get(template_name)
     
     def get_templates_by_category(self, category: str) -> List[Template]:
         """Get all templates in a category"""
-        return [t for t in self.templates.values() if t.category == category]
+        return list(self._current().by_category.get(category, ()))
     
     def list_templates(self) -> List[Dict[str, Any]]:
         """List all templates with summary information"""
-        return [
-            {
-                'name': t.name,
-                'base_name': t.base_name,
-                'category': t.category,
-                'description': t.description,
-                'variations_count': len(t.variations),
-                'elements_count': len(t.variations[0].elements) if t.variations else 0
-            }
-            for t in self.templates.values()
-        ]
+        return [dict(entry) for entry in self._current().listing]
     
     def get_template_variations(self, template_name: str) -> List[str]:
         """Get version numbers for a specific template (e.g., ['01', '02'])"""
-        template = self.get_template(template_name)
-        if not template:
-            return []
-        
-        # Extract unique version numbers from variation names
-        versions = set()
-        for variation in template.variations:
-            # Extract version number from names like "01-portrait", "02-square", etc.
-            version_match = re.search(r'(\d+)', variation.name)
-            if version_match:
-                versions.add(version_match.group(1))
-        
-        # Return sorted version numbers
-        return sorted(list(versions), key=lambda x: int(x))
+        return list(self._current().versions.get(template_name, ()))
     
     def get_variations_by_version(self, template_name: str, version: str) -> List[TemplateVariation]:
         """Get all variations (portrait, square) for a specific version number"""
-        template = self.get_template(template_name)
-        if not template:
-            return []
-        
-        # Find variations that match the version number
-        matching_variations = []
-        for variation in template.variations:
-            if variation.name.startswith(f"{version}-"):
-                matching_variations.append(variation)
-        
-        return matching_variations
+        return list(self._current().by_version.get(template_name, {}).get(version, ()))
+    
+    def get_variation(self, template_name: str, variation_name: str) -> Optional[TemplateVariation]:
+        """Get one variation of a template by its name (e.g. '01-portrait')"""
+        return self._current().by_variation.get(template_name, {}).get(variation_name)
     
     def get_claims_requirements(self, template_name: str, variation_name: str = None) -> Dict[str, Any]:
-        """Get claims requirements for a specific template and variation"""
-        template = self.get_template(template_name)
-        if not template:
+        """Get claims requirements (with the precompiled prompt artifact under 'compiled')
+        for a specific template and variation"""
+        compiled = self._current().requirements.get(template_name)
+        if not compiled:
             return {}
         
         # Use first variation if none specified
-        variation = None
-        if variation_name:
-            variation = next((v for v in template.variations if v.name == variation_name), None)
-        if not variation:
-            variation = template.variations[0] if template.variations else None
-        
-        if not variation:
-            return {}
+        requirements = compiled.get(variation_name) if variation_name else None
+        if requirements is None:
+            requirements = compiled[None]
         
-        return {
-            'template_name': template.name,
-            'variation_name': variation.name,
-            'category': template.category,
-            'elements': [
-                {
-                    'name': e.name,
-                    'max_chars': e.max_chars,
-                    'description': e.description,
-                    'required': e.required
-                } for e in variation.elements
-            ],
-            'image_weights': template.image_weights,
-            'total_elements': len(variation.elements),
-            'metadata': template.metadata
-        }
+        # Callers get their own copy of the mutable parts
+        return dict(requirements, elements=[dict(e) for e in requirements['elements']])
     
     def get_all_variations_for_template(self, template_name: str) -> List[Dict[str, Any]]:
         """Get all variations for a template with their requirements"""
@@ -395,12 +505,15 @@ class TemplateManager:
     
     def scan_and_update_templates(self, figma_templates: List[Dict[str, Any]], template_requirements: Dict[str, Any] = None):
         """Scan and update templates based on Figma plugin data and JSON guide requirements"""
+        with self._lock:
+            self._scan_and_update_templates(figma_templates, template_requirements)
+    
+    def _scan_and_update_templates(self, figma_templates: List[Dict[str, Any]], template_requirements: Dict[str, Any] = None):
         try:
-            # First, ensure we have the existing templates loaded
-            if not self.templates:
-                self.load_cached_templates()
+            # Work on a private copy; readers keep using the current snapshot until we publish
+            templates = dict(self._current().templates)
             
-            print(f"🔍 Starting scan with {len(self.templates)} existing templates")
+            print(f"🔍 Starting scan with {len(templates)} existing templates")
             
             # Process each template found by the Figma plugin
             for figma_template in figma_templates:
@@ -415,23 +528,24 @@ class TemplateManager:
                     # Create template from JSON guide data
                     template = self._create_template_from_guide(template_name, guide_data, figma_template)
                     if template:
-                        self.templates[template_name] = template
+                        templates[template_name] = template
                         print(f"✅ Created template from guide: {template_name}")
                     else:
                         print(f"⚠️ Failed to create template from guide for {template_name}")
                 
                 # For existing templates without guide data, preserve them
-                elif template_name in self.templates:
+                elif template_name in templates:
                     print(f"✅ Template {template_name} already exists in cache")
                 else:
                     print(f"⚠️ No guide data for {template_name}, preserving existing template if available")
             
-            print(f"🔍 Final template count: {len(self.templates)}")
-            print(f"🔍 Template names: {list(self.templates.keys())}")
+            self._publish(templates)
+            print(f"🔍 Final template count: {len(templates)}")
+            print(f"🔍 Template names: {list(templates.keys())}")
             
             # Save updated templates to cache
             self.save_template_cache()
-            print(f"✅ Updated template cache with {len(self.templates)} templates")
+            print(f"✅ Updated template cache with {len(templates)} templates")
             
         except Exception as e:
             print(f"❌ Error scanning templates: {e}")
@@ -503,5 +617,5 @@ class TemplateManager:
             print(f"❌ Error creating template from guide: {e}")
             return None
 
-# Global template manager instance
+# Global template manager instance (loads lazily on first use)
 template_manager = TemplateManager()
@@ -1,11 +1,125 @@
 # server.py
-import http.server, socketserver, os
-from http.server import SimpleHTTPRequestHandler
+"""
+Static/job file server for the Figma plugin (port 8001).
+Threaded, with strong ETags (If-None-Match -> 304), gzip for JSON (precompressed
+<file>.gz when fresh, otherwise compressed on the fly and cached), single-range
+HTTP Range requests and zero-copy socket.sendfile transfers. Jobs that were moved
+to the archive are still served at /out/<job_id>.json via the job store.
+/out/<job_id>.json always returns the v1 job layout for older readers (v2 jobs are
+expanded with job_schema.expand_job); add ?schema=2 to get the compact stored form.
+
+/img/<path under static/images>?w=1080&h=1440[&fit=cover|contain][&fmt=auto|jpeg|png|webp][&v=<version>]
+returns a resized derivative from the disk cache in orchestrator/image_cache.py. Only
+URLs whose v matches the source's current version are cached long-term; others are
+revalidated by ETag. POST /bundle {"assets": [ids or URLs], "w": 1080, "h": 1440}
+returns many images in one uncompressed zip, with their byte ranges and versions in
+the X-Bundle-Manifest header.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+import threading
+import zipfile
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
 
 PORT = 8001
-os.chdir(os.path.dirname(__file__))
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+GZIP_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+GZIP_MIN_BYTES = 1024
+JOB_PATH_RE = re.compile(r"^/out/([\w-]+)\.json$")
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMAGE_ROOT = os.path.realpath("static/images")
+IMAGE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", str(30 * 86400)))
+IMAGE_URL_PREFIX = "/static/images/"
+BUNDLE_MAX_ASSETS = int(os.getenv("BUNDLE_MAX_ASSETS", "200"))
+
+
+class _LRU:
+    """Small thread-safe LRU keyed by (path, mtime_ns, size) so stale entries never match."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_ETAGS = _LRU(4096)
+_GZIPPED = _LRU(int(os.getenv("SERVER_GZIP_CACHE_ENTRIES", "128")))
+# v1 bodies of v2 job files; b'' marks a file that is served as-is (v1, or still being written)
+_LEGACY_JOBS = _LRU(int(os.getenv("SERVER_LEGACY_JOB_CACHE_ENTRIES", "32")))
+
+
+def _file_etag(path: str, st: os.stat_result) -> str:
+    """Strong ETag: content hash, cached until the file's mtime/size change."""
+    key = (path, st.st_mtime_ns, st.st_size)
+    etag = _ETAGS.get(key)
+    if etag is None:
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:20]}"'
+        _ETAGS.put(key, etag)
+    return etag
+
+
+def _image_version(src: str) -> str:
+    """Short content hash of an image source, the `v` of versioned /img/ URLs ('' if missing)."""
+    if not src:
+        return ''
+    from orchestrator import image_cache
+    return image_cache.source_hash(src)[:12]
+
+
+def _legacy_job_body(path: str, st: os.stat_result) -> bytes:
+    """v1-shaped JSON for a v2 job file, cached until the file changes; b'' to serve the file as-is."""
+    key = (path, st.st_mtime_ns, st.st_size)
+    body = _LEGACY_JOBS.get(key)
+    if body is None:
+        body = b''
+        try:
+            with open(path, 'rb') as f:
+                job = json.load(f)
+        except ValueError:
+            job = None  # still being streamed by the job writer
+        if isinstance(job, dict) and job.get("schema_version", 1) >= 2:
+            from orchestrator.job_schema import expand_job
+            body = json.dumps(expand_job(job), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        _LEGACY_JOBS.put(key, body)
+    return body
+
+
+def _gzip_etag(etag: str) -> str:
+    # Different representation, different strong validator
+    return etag[:-1] + '-gz"'
+
 
 class CORSRequestHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
     def end_headers(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
@@ -15,14 +129,299 @@ class CORSRequestHandler(SimpleHTTPRequestHandler):
 
     def do_OPTIONS(self):
         self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self._serve(head_only=False)
+
+    def do_HEAD(self):
+        self._serve(head_only=True)
+
+    # -- helpers -------------------------------------------------------
+
+    def _not_modified(self, *etags: str) -> bool:
+        inm = self.headers.get('If-None-Match')
+        if not inm:
+            return False
+        tags = [t.strip() for t in inm.split(',')]
+        return '*' in tags or any(e in tags for e in etags)
+
+    def _accepts_gzip(self) -> bool:
+        return 'gzip' in (self.headers.get('Accept-Encoding') or '')
+
+    def _send_304(self, etag: str):
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _wants_v2(self) -> bool:
+        return parse_qs(urlsplit(self.path).query).get('schema') == ['2']
+
+    def _send_bytes(self, body: bytes, ctype: str, etag: str, head_only: bool, extra=None):
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def _serve(self, head_only: bool):
+        if self.path.startswith('/img/'):
+            return self._serve_image(head_only)
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            # Directory listings / index.html keep the stock behaviour
+            return super().do_HEAD() if head_only else super().do_GET()
+        if not os.path.isfile(path):
+            return self._serve_stored_job(head_only)
+
+        st = os.stat(path)
+        if JOB_PATH_RE.match(urlsplit(self.path).path) and not self._wants_v2():
+            legacy = _legacy_job_body(path, st)
+            if legacy:
+                return self._send_json(legacy, head_only)
+        etag = _file_etag(path, st)
+        ctype = self.guess_type(path)
+        revalidate = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding',
+                      'Last-Modified': self.date_time_string(int(st.st_mtime))}
+
+        want_gzip = (self._accepts_gzip() and not self.headers.get('Range')
+                     and ctype.startswith(GZIP_TYPES) and st.st_size >= GZIP_MIN_BYTES)
+        if self._not_modified(etag, _gzip_etag(etag)):
+            return self._send_304(_gzip_etag(etag) if want_gzip else etag)
+
+        if want_gzip:
+            body = self._gzipped(path, st)
+            return self._send_bytes(body, ctype, _gzip_etag(etag), head_only,
+                                    dict(revalidate, **{'Content-Encoding': 'gzip'}))
+
+        start, end = 0, st.st_size - 1
+        status = HTTPStatus.OK
+        rng = self.headers.get('Range')
+        if rng and st.st_size:
+            parsed = self._parse_range(rng, st.st_size)
+            if parsed is None:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header('Content-Range', f'bytes */{st.st_size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if parsed:
+                start, end = parsed
+                status = HTTPStatus.PARTIAL_CONTENT
+
+        length = max(0, end - start + 1)
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        if status == HTTPStatus.PARTIAL_CONTENT:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{st.st_size}')
+        for k, v in revalidate.items():
+            self.send_header(k, v)
         self.end_headers()
+        if not head_only and length:
+            self._sendfile(path, start, length)
+
+    def _sendfile(self, path: str, start: int, length: int):
+        with open(path, 'rb') as f:
+            self.wfile.flush()
+            # Zero-copy where the OS supports it (falls back to send() otherwise)
+            self.connection.sendfile(f, start, length)
+
+    @staticmethod
+    def _image_source(rel: str):
+        """Real path of a static/images file, or None (missing, or outside IMAGE_ROOT)."""
+        src = os.path.realpath(os.path.join(IMAGE_ROOT, rel))
+        if not src.startswith(IMAGE_ROOT + os.sep) or not os.path.isfile(src):
+            return None
+        return src
+
+    def _image_file(self, rel: str, width=None, height=None, fit: str = 'cover', fmt: str = 'auto'):
+        """(path, content type, etag) for a static/images file or its derivative; None if the
+        source does not exist. Raises ValueError for bad derivative parameters."""
+        src = self._image_source(rel)
+        if not src:
+            return None
+        from orchestrator import image_cache
+        if width and height and image_cache.available():
+            try:
+                return image_cache.get_derivative_cache().get(src, int(width), int(height), fit, fmt)
+            except ValueError:
+                raise
+            except Exception as e:
+                print(f"❌ Image derivative failed for {rel}: {e}")
+        return src, self.guess_type(src), _file_etag(src, os.stat(src))
+
+    def _serve_image(self, head_only: bool):
+        """Resized derivative of a static/images file; the original when Pillow is unavailable."""
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        rel = unquote(parts.path[len('/img/'):])
+        try:
+            found = self._image_file(rel, query.get('w'), query.get('h'),
+                                     query.get('fit', 'cover'), query.get('fmt', 'auto'))
+        except ValueError as e:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        if not found:
+            self.send_error(HTTPStatus.NOT_FOUND, "Image not found")
+            return
+        path, ctype, etag = found
+        if self._not_modified(etag):
+            return self._send_304(etag)
+        size = os.path.getsize(path)
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(size))
+        self.send_header('ETag', etag)
+        if query.get('v') and query['v'] == _image_version(self._image_source(rel)):
+            # The URL names this exact source content, so it can never go stale
+            self.send_header('Cache-Control', f'public, max-age={IMAGE_MAX_AGE}, immutable')
+        else:
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if not head_only and size:
+            self._sendfile(path, 0, size)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/bundle':
+            self.send_error(HTTPStatus.NOT_FOUND, "Not found")
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            assets = request.get('assets') or []
+            if not isinstance(assets, list) or len(assets) > BUNDLE_MAX_ASSETS:
+                raise ValueError(f"assets must be a list of at most {BUNDLE_MAX_ASSETS} ids/URLs")
+            body, manifest = self._build_bundle(assets, request.get('w'), request.get('h'),
+                                                request.get('fit', 'cover'), request.get('fmt', 'auto'))
+        except ValueError as e:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Bundle-Manifest', json.dumps(manifest, separators=(',', ':')))
+        self.send_header('Access-Control-Expose-Headers', 'X-Bundle-Manifest')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _build_bundle(self, assets, width, height, fit: str, fmt: str):
+        """
+        Uncompressed (STORED) zip of the requested images plus a manifest mapping each
+        asset id/URL to the byte range of its data inside the zip, so clients can slice
+        the response buffer directly.
+        """
+        buf = io.BytesIO()
+        entries, missing = [], []
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zf:
+            for i, asset in enumerate(dict.fromkeys(str(a) for a in assets)):
+                rel = unquote(urlsplit(asset).path)
+                rel = rel[len(IMAGE_URL_PREFIX):] if rel.startswith(IMAGE_URL_PREFIX) else rel.lstrip('/')
+                found = self._image_file(rel, width, height, fit, fmt)
+                if not found:
+                    missing.append(asset)
+                    continue
+                path, ctype, etag = found
+                version = _image_version(self._image_source(rel))
+                info = zipfile.ZipInfo(f"{i:04d}{os.path.splitext(path)[1]}", date_time=(1980, 1, 1, 0, 0, 0))
+                with open(path, 'rb') as f:
+                    zf.writestr(info, f.read())
+                entries.append((asset, info, ctype, etag, version))
+        body = buf.getvalue()
+        manifest = {'assets': {}, 'missing': missing}
+        for asset, info, ctype, etag, version in entries:
+            # Data starts after the 30-byte local header, file name and local extra field
+            name_len, extra_len = struct.unpack('<HH', body[info.header_offset + 26:info.header_offset + 30])
+            offset = info.header_offset + 30 + name_len + extra_len
+            manifest['assets'][asset] = {'name': info.filename, 'offset': offset, 'length': info.file_size,
+                                         'content_type': ctype, 'etag': etag.strip('"'), 'version': version}
+        return body, manifest
+
+    @staticmethod
+    def _parse_range(header: str, size: int):
+        """(start, end) for one satisfiable range, False to ignore the header, None if unsatisfiable."""
+        m = RANGE_RE.match(header.strip())
+        if not m or (not m.group(1) and not m.group(2)):
+            return False  # malformed or multi-range: serve the whole file
+        if not m.group(1):
+            suffix = int(m.group(2))
+            if suffix == 0:
+                return None
+            return max(0, size - suffix), size - 1
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+        if start >= size or start > end:
+            return None
+        return start, end
+
+    @staticmethod
+    def _gzipped(path: str, st: os.stat_result) -> bytes:
+        key = (path, st.st_mtime_ns, st.st_size)
+        body = _GZIPPED.get(key)
+        if body is not None:
+            return body
+        pre = path + '.gz'
+        try:
+            if os.stat(pre).st_mtime_ns >= st.st_mtime_ns:
+                with open(pre, 'rb') as f:
+                    body = f.read()
+        except OSError:
+            body = None
+        if body is None:
+            with open(path, 'rb') as f:
+                body = gzip.compress(f.read(), compresslevel=6)
+        _GZIPPED.put(key, body)
+        return body
+
+    def _serve_stored_job(self, head_only: bool):
+        """/out/<job_id>.json for jobs that only live in the job store / archive."""
+        m = JOB_PATH_RE.match(self.path.split('?', 1)[0])
+        job = None
+        if m:
+            try:
+                from orchestrator.storage import load_job
+                job = load_job(m.group(1))
+            except Exception as e:
+                print(f"❌ Job store lookup failed for {m.group(1)}: {e}")
+        if not job:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        if not self._wants_v2():
+            from orchestrator.job_schema import expand_job
+            job = expand_job(job)
+        self._send_json(json.dumps(job, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), head_only)
+
+    def _send_json(self, body: bytes, head_only: bool):
+        """Serve a generated JSON body with a content ETag (revalidated, gzipped when accepted)."""
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        if self._not_modified(etag, _gzip_etag(etag)):
+            return self._send_304(etag)
+        extra = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if self._accepts_gzip():
+            return self._send_bytes(gzip.compress(body, compresslevel=6), 'application/json', _gzip_etag(etag),
+                                    head_only, dict(extra, **{'Content-Encoding': 'gzip'}))
+        self._send_bytes(body, 'application/json', etag, head_only, extra)
+
 
 if __name__ == "__main__":
-    with socketserver.TCPServer(("", PORT), CORSRequestHandler) as httpd:
+    ThreadingHTTPServer.allow_reuse_address = True
+    with ThreadingHTTPServer(("", PORT), CORSRequestHandler) as httpd:
+        httpd.daemon_threads = True
         print(f"🚀 CORS-enabled server running at http://localhost:{PORT}")
         print(f"📁 Serving files from: {os.getcwd()}")
         print(f"🔒 CORS headers enabled for all origins")
+        print("⚡ Threaded, with ETag/304, gzip and Range support")
+        print(f"🖼️ Image derivatives at http://localhost:{PORT}/img/<file>?w=&h=")
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
-            print("\n🛑 Server stopped by user")
\ No newline at end of file
+            print("\n🛑 Server stopped by user")
@@ -0,0 +1,58 @@
+import pytest
+
+from orchestrator.compliance import ComplianceMatcher, get_matcher, screen_claims, validate_claim
+
+
+@pytest.mark.parametrize("text", [
+    "Cures dry skin", "Cured in a week", "Curing redness overnight", "A cure for dullness",
+    "Diagnosing skin issues", "Diagnosed by experts", "Treats acne", "Treating breakouts",
+    "Heals on contact", "Healing balm", "Mitigating irritation",
+])
+def test_inflected_banned_words_are_caught(text):
+    assert not get_matcher().is_clean(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Treatment-grade texture",  # the screen is word-bounded, not a prefix match
+    "Secure the glow",
+    "Healthy-looking skin",
+    "Curated botanicals",
+    "Dermatologist tested",
+])
+def test_unrelated_words_pass(text):
+    assert get_matcher().is_clean(text)
+
+
+def test_match_reports_phrase_and_span():
+    (match,) = get_matcher().screen("Gentle, curing formula")
+    assert match.phrase == "cure"
+    assert "Gentle, curing formula"[match.start:match.end] == "curing"
+
+
+def test_multi_word_phrases_tolerate_whitespace():
+    (match,) = get_matcher().screen("Clinically\n  proven results")
+    assert match.phrase == "clinically proven"
+
+
+def test_longest_phrase_wins():
+    matcher = ComplianceMatcher(["prevent", "prevent disease"])
+    assert [m.phrase for m in matcher.screen("Helps prevent disease")] == ["prevent disease"]
+
+
+def test_formulation_banned_claims_are_added():
+    formulation = {"banned_claims": ["anti-aging", "  Reverses   wrinkles "]}
+    assert not validate_claim("An anti-aging serum", formulation)
+    assert not validate_claim("Reverses wrinkles fast", formulation)
+    assert validate_claim("Reverses wrinkles fast", None)
+
+
+def test_screen_claims_batch():
+    results = screen_claims(["Soothes skin", "Cures acne"])
+    assert results[0] == []
+    assert [m.phrase for m in results[1]] == ["cure"]
+
+
+def test_empty_matcher_is_clean():
+    matcher = ComplianceMatcher([])
+    assert matcher.is_clean("Cures everything")
+    assert matcher.screen("Cures everything") == []
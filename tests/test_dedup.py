@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from orchestrator import claims
+from orchestrator.dedup import NearDuplicateIndex, jaccard, normalize_claim, shingles
+
+BASE = "Clinically proven to reduce redness in 7 days"
+
+
+def test_normalize_drops_case_and_punctuation():
+    assert normalize_claim("  Clinically Proven: reduce   redness!! ") == "clinically proven reduce redness"
+
+
+def test_shingles_ignore_word_order():
+    # Per-token shingles: reordered words are the same claim to the index
+    assert shingles("Dogs bite men") == shingles("Men bite dogs")
+    index = NearDuplicateIndex()
+    assert index.add("Dogs bite men")
+    assert index.find("Men bite dogs") == "Dogs bite men"
+
+
+def test_punctuation_and_case_variants_are_duplicates():
+    index = NearDuplicateIndex()
+    assert index.add(BASE)
+    assert not index.add("clinically proven to reduce REDNESS in 7 days!!")
+    assert index.find("Clinically Proven: reduce redness in 7 days.") == BASE
+    assert len(index) == 1
+
+
+def test_distinct_claims_are_kept():
+    index = NearDuplicateIndex()
+    assert index.add(BASE)
+    assert index.add("Gentle enough for everyday use")
+    assert index.find("Fragrance-free and dermatologist tested") is None
+    assert len(index) == 2
+
+
+def test_threshold():
+    near = "Clinically proven to reduce redness in 14 days"
+    assert 0.7 <= jaccard(shingles(BASE), shingles(near)) < 0.95
+    loose = NearDuplicateIndex(threshold=0.7)
+    loose.add(BASE)
+    assert loose.find(near) == BASE
+    strict = NearDuplicateIndex(threshold=0.95)
+    strict.add(BASE)
+    assert strict.find(near) is None
+
+
+def test_history_is_consulted_after_index():
+    history = SimpleNamespace(find=lambda text: "delivered" if "hydrating" in text else None)
+    index = NearDuplicateIndex(history=history)
+    assert index.find("Deeply hydrating formula") == "delivered"
+    assert not index.add("Deeply hydrating formula")
+    assert index.add(BASE)
+
+
+def test_empty_text_is_never_indexed():
+    index = NearDuplicateIndex()
+    assert not index.add("  !! ")
+    assert index.find("") is None
+    assert len(index) == 0
+
+
+def test_generated_claims_are_not_indexed(monkeypatch):
+    # Only the caller indexes claims it keeps; generation just reads the shared index
+    monkeypatch.setattr(claims, "load_brand_bundle", lambda name: SimpleNamespace(brand_name=name))
+    monkeypatch.setattr(claims, "knowledge_signature", lambda name: "")
+    monkeypatch.setattr(claims, "_compile_claims_prompt", lambda *args: ("claims", "style"))
+    monkeypatch.setattr(claims, "_llm_json_logged", lambda *args, **kwargs: {"claims": [
+        {"claim": BASE}, {"claim": BASE + "!"}, {"claim": "Gentle enough for everyday use"}, {"claim": "Dogs bite men"},
+    ]})
+    cfg = {"brand": {"name": "Test"}, "angles": []}
+    index = NearDuplicateIndex()
+    index.add("Men bite dogs")
+
+    out = claims.generate_claims_by_angle(cfg, target_per_angle=4, dedup_index=index)
+
+    assert [c["claim"] for c in out["general"]] == [BASE, "Gentle enough for everyday use"]
+    assert len(index) == 1
@@ -0,0 +1,60 @@
+import threading
+
+from orchestrator.compliance import ComplianceMatcher
+from orchestrator.pipeline import ComplianceStage
+
+
+def _items(*claims):
+    return [{"claim": c} for c in claims]
+
+
+def _fix(batch):
+    return [dict(item, claim=item["claim"].replace("cures", "soothes")) for item, _ in batch]
+
+
+def test_repaired_claims_keep_their_positions():
+    release = threading.Event()
+
+    def repair(batch):
+        release.wait(5)
+        return _fix(batch)
+
+    stage = ComplianceStage(ComplianceMatcher(["cure"]), ["claim"], repair=repair)
+    first = stage.submit(_items("Calm skin", "cures redness", "Soft glow"))
+    # The clean claim behind the pending rewrite is held back
+    assert first == [(0, {"claim": "Calm skin"})]
+    release.set()
+    rest = stage.drain()
+    assert rest == [(1, {"claim": "soothes redness"}), (2, {"claim": "Soft glow"})]
+    assert stage.dropped == 0
+
+
+def test_finished_repairs_are_merged_on_submit():
+    release = threading.Event()
+
+    def repair(batch):
+        release.wait(5)
+        return _fix(batch)
+
+    stage = ComplianceStage(ComplianceMatcher(["cure"]), ["claim"], repair=repair)
+    assert stage.submit(_items("cures acne")) == []
+    release.set()
+    ((_, future),) = stage._pending
+    future.result()
+    assert stage.submit(_items("Fresh look")) == [(0, {"claim": "soothes acne"}), (1, {"claim": "Fresh look"})]
+    assert stage.drain() == []
+
+
+def test_failed_rewrites_leave_a_gap():
+    stage = ComplianceStage(ComplianceMatcher(["cure"]), ["claim"], repair=lambda batch: [it for it, _ in batch])
+    out = stage.submit(_items("cures acne", "Fresh look")) + stage.drain()
+    assert out == [(1, {"claim": "Fresh look"})]
+    assert stage.dropped == 1
+
+
+def test_without_repair_violators_are_dropped_immediately():
+    stage = ComplianceStage(ComplianceMatcher(["cure"]), ["claim"])
+    assert stage.submit(_items("Calm skin", "cures acne", "Fresh look")) == [
+        (0, {"claim": "Calm skin"}), (2, {"claim": "Fresh look"})]
+    assert stage.dropped == 1
+    assert stage.drain() == []
@@ -0,0 +1,58 @@
+from orchestrator.field_limits import element_limits
+from orchestrator.prompt_cache import requirements_content_hash, requirements_hash
+from orchestrator.template_requirements import compile_requirements, compiled_requirements, precompiled
+
+
+def _requirements():
+    requirements = {
+        "template_name": "Template-Test",
+        "elements": [
+            {"name": "#HEADLINE", "max_chars": 40, "description": "Main line", "required": True},
+            {"name": "#SUBHEAD", "max_chars": 80, "description": "Support", "required": False},
+        ],
+        "metadata": {"prompt_guidance": "Keep it short"},
+    }
+    requirements["compiled"] = compile_requirements(requirements)
+    return requirements
+
+
+def test_artifact_is_served_while_it_matches():
+    requirements = _requirements()
+    assert compiled_requirements(requirements) is requirements["compiled"]
+    assert requirements_hash(requirements) == requirements["compiled"]["fingerprint"]
+    assert requirements_hash(requirements) == requirements_content_hash(requirements)
+    assert element_limits(requirements) == {"#HEADLINE": 40, "#SUBHEAD": 80}
+
+
+def test_output_schema():
+    schema = _requirements()["compiled"]["output_schema"]
+    assert schema["required"] == ["claim", "#HEADLINE", "#SUBHEAD"]
+    assert schema["properties"]["#HEADLINE"] == {"type": "string", "maxLength": 40, "description": "Main line"}
+    assert schema["additionalProperties"] is True
+
+
+def test_reduced_elements_are_recompiled():
+    # e.g. retemplate asking only for the fields an item is missing
+    requirements = _requirements()
+    partial = dict(requirements, elements=requirements["elements"][1:])
+    assert precompiled(partial) is None
+    assert element_limits(partial) == {"#SUBHEAD": 80}
+    assert "#HEADLINE" not in compiled_requirements(partial)["prompt_block"]
+    assert requirements_hash(partial) == requirements_content_hash(partial) != requirements_hash(requirements)
+
+
+def test_in_place_edits_are_detected():
+    requirements = _requirements()
+    requirements["elements"][0]["max_chars"] = 30
+    assert precompiled(requirements) is None
+    assert element_limits(requirements)["#HEADLINE"] == 30
+    requirements = _requirements()
+    requirements["metadata"]["prompt_guidance"] = "Be bold"
+    assert "Be bold" in compiled_requirements(requirements)["prompt_block"]
+
+
+def test_dicts_without_artifact_compile_on_demand():
+    requirements = {"elements": [{"name": "#HEADLINE", "max_chars": 50}]}
+    assert precompiled(requirements) is None
+    assert compiled_requirements(requirements)["char_limits"] == {"#HEADLINE": 50}
+    assert requirements_hash({}) == ""